@@ -8,6 +8,7 @@
 #include <chrono>
 #include <thread>
 #include <math.h>
+#include <cstdint>
 
 
 char dandere2x::separator() {
@@ -49,3 +50,42 @@ void dandere2x::wait_for_file(const std::string &name) {
         }
     }
 }
+
+
+// Whether vector files (pframe, residual, correction, fade) are written in the binary format rather than as text.
+// Set once from main's arguments.
+static bool binary_vectors = false;
+
+void dandere2x::set_binary_vectors(bool binary) {
+    binary_vectors = binary;
+}
+
+//write a little-endian integer of 'size' bytes.
+static void write_le(std::ofstream &out, uint32_t value, int size) {
+    for (int byte = 0; byte < size; byte++)
+        out.put((char) ((value >> (8 * byte)) & 0xFF));
+}
+
+// Write a list of vector values into output_file, either one value per line, or in the binary format
+// (see D2xPython's vector_utils.py):
+//      "D2XV" | version (uint16) = 1 | dtype (uint16) = 2 (int32) | count (uint32) | count * int32
+// Save it as '.temp' initially so D2xPython doesn't read it before it's done writing.
+void dandere2x::write_vectors(const std::string &output_file, const std::vector<int> &values) {
+    if (binary_vectors) {
+        std::ofstream out(output_file + ".temp", std::ios::binary);
+        out.write("D2XV", 4);
+        write_le(out, 1, 2);
+        write_le(out, 2, 2);
+        write_le(out, (uint32_t) values.size(), 4);
+        for (int value : values)
+            write_le(out, (uint32_t) value, 4);
+        out.close();
+    } else {
+        std::ofstream out(output_file + ".temp");
+        for (int value : values)
+            out << value << "\n";
+        out.close();
+    }
+
+    std::rename((output_file + ".temp").c_str(), output_file.c_str());
+}
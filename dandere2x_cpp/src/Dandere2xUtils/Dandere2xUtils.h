@@ -10,6 +10,7 @@
 #include <string>
 #include <iostream>
 #include <fstream>
+#include <vector>
 
 namespace dandere2x {
 
@@ -21,6 +22,10 @@ namespace dandere2x {
 
     void wait_for_file(const std::string &name);
 
+    void set_binary_vectors(bool binary);
+
+    void write_vectors(const std::string &output_file, const std::vector<int> &values);
+
 }
 
 #endif //DANDERE2X_DANDERE2XUTILS_H
@@ -0,0 +1,72 @@
+//
+//Licensed under the GNU General Public License Version 3 (GNU GPL v3),
+//    available at: https://www.gnu.org/licenses/gpl-3.0.txt
+
+#include "VectorJournal.h"
+#include <iostream>
+
+
+// Open the journal if it already exists (i.e when resuming a session), otherwise create it with an empty index.
+VectorJournal::VectorJournal(const std::string &journal_file, int frame_count) {
+    this->frame_count = frame_count;
+
+    if (!is_valid_journal(journal_file)) {
+        std::ofstream create(journal_file, std::ios::binary | std::ios::trunc);
+        std::vector<char> empty(header_size + (frame_count + 1) * index_entry_size, 0);
+        create.write(empty.data(), empty.size());
+        create.close();
+    }
+
+    journal.open(journal_file, std::ios::in | std::ios::out | std::ios::binary);
+
+    // The header goes in last, so D2xPython doesn't read the index before it fully exists.
+    journal.seekp(0);
+    journal.write("D2XJ", 4);
+    write_le(1, 2);
+    write_le(0, 2);
+    write_le((uint64_t) frame_count, 4);
+    write_le(0, 4);
+    journal.flush();
+}
+
+
+void VectorJournal::append(int frame, const std::vector<int> &values) {
+    if (frame < 0 || frame > frame_count) {
+        std::cout << "frame " << frame << " is out of the journal's range, not saving it" << std::endl;
+        return;
+    }
+
+    journal.seekp(0, std::ios::end);
+    uint64_t offset = (uint64_t) journal.tellp();
+
+    for (int value : values)
+        write_le((uint32_t) value, 4);
+    journal.flush();
+
+    journal.seekp(header_size + frame * index_entry_size);
+    write_le(offset, 8);
+    write_le((uint64_t) values.size(), 4);
+    write_le(1, 4);
+    journal.flush();
+}
+
+
+void VectorJournal::write_le(uint64_t value, int size) {
+    for (int byte = 0; byte < size; byte++)
+        journal.put((char) ((value >> (8 * byte)) & 0xFF));
+}
+
+
+bool VectorJournal::is_valid_journal(const std::string &journal_file) {
+    std::ifstream existing(journal_file, std::ios::binary);
+    if (!existing.good())
+        return false;
+
+    unsigned char header[header_size] = {0};
+    existing.read((char *) header, header_size);
+    if (existing.gcount() != header_size || std::string((char *) header, 4) != "D2XJ")
+        return false;
+
+    uint32_t existing_frame_count = header[8] | (header[9] << 8) | (header[10] << 16) | ((uint32_t) header[11] << 24);
+    return existing_frame_count == (uint32_t) frame_count;
+}
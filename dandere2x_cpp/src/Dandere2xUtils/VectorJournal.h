@@ -0,0 +1,51 @@
+//
+//Licensed under the GNU General Public License Version 3 (GNU GPL v3),
+//    available at: https://www.gnu.org/licenses/gpl-3.0.txt
+
+#ifndef DANDERE2X_VECTORJOURNAL_H
+#define DANDERE2X_VECTORJOURNAL_H
+
+#include <string>
+#include <vector>
+#include <fstream>
+#include <cstdint>
+
+#include "VectorSink.h"
+
+/**
+ * Description:
+ *
+ * Rather than creating (and having D2xPython poll for, then delete) a vector file for every frame, every frame's
+ * vectors of one data type (pframe, residual, correction, fade) are appended into a single journal file.
+ *
+ * Layout (little-endian, see D2xPython's vector_journal.py):
+ *
+ *  - header:  "D2XJ" | version (uint16) = 1 | reserved (uint16) | frame_count (uint32) | reserved (uint32)
+ *  - index:   (frame_count + 1) fixed size entries, one per frame:
+ *             offset (uint64) | count (uint32) | ready (uint32)
+ *  - records: int32 arrays, appended in the order they're computed.
+ *
+ * A record is written before it's index entry, and 'ready' is set last, so D2xPython can find frame x's vectors
+ * in O(1) and never sees a half written record.
+ */
+class VectorJournal : public VectorSink {
+
+public:
+    VectorJournal(const std::string &journal_file, int frame_count);
+
+    void append(int frame, const std::vector<int> &values) override;
+
+private:
+    std::fstream journal;
+    int frame_count;
+
+    static const int header_size = 16;
+    static const int index_entry_size = 16;
+
+    void write_le(uint64_t value, int size);
+
+    bool is_valid_journal(const std::string &journal_file);
+};
+
+
+#endif //DANDERE2X_VECTORJOURNAL_H
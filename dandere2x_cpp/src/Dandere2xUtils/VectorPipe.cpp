@@ -0,0 +1,32 @@
+//
+//Licensed under the GNU General Public License Version 3 (GNU GPL v3),
+//    available at: https://www.gnu.org/licenses/gpl-3.0.txt
+
+#include "VectorPipe.h"
+#include <cstdio>
+
+
+VectorPipe::VectorPipe(uint32_t record_type) {
+    this->record_type = record_type;
+}
+
+//append a little-endian uint32 to buffer.
+static void write_le(std::vector<unsigned char> &buffer, uint32_t value) {
+    for (int byte = 0; byte < 4; byte++)
+        buffer.push_back((unsigned char) ((value >> (8 * byte)) & 0xFF));
+}
+
+// Build the entire record first, so it's written to stdout in one go.
+void VectorPipe::append(int frame, const std::vector<int> &values) {
+    std::vector<unsigned char> record;
+    record.reserve(12 + values.size() * 4);
+
+    write_le(record, (uint32_t) frame);
+    write_le(record, record_type);
+    write_le(record, (uint32_t) values.size());
+    for (int value : values)
+        write_le(record, (uint32_t) value);
+
+    std::fwrite(record.data(), 1, record.size(), stdout);
+    std::fflush(stdout);
+}
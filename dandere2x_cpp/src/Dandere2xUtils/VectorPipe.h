@@ -0,0 +1,41 @@
+//
+//Licensed under the GNU General Public License Version 3 (GNU GPL v3),
+//    available at: https://www.gnu.org/licenses/gpl-3.0.txt
+
+#ifndef DANDERE2X_VECTORPIPE_H
+#define DANDERE2X_VECTORPIPE_H
+
+#include <cstdint>
+#include <vector>
+
+#include "VectorSink.h"
+
+/**
+ * Description:
+ *
+ * Streams vectors to D2xPython over stdout, rather than through the filesystem. Every vector type shares stdout,
+ * so each record is framed (little-endian, see D2xPython's vector_stream.py):
+ *
+ *      frame (int32) | type (uint32) | count (uint32) | count * int32
+ *
+ * When streaming, anything else written to std::cout must be redirected (main sends it to stderr).
+ */
+class VectorPipe : public VectorSink {
+
+public:
+    // record types, shared with vector_stream.py
+    static const uint32_t pframe = 1;
+    static const uint32_t residual = 2;
+    static const uint32_t correction = 3;
+    static const uint32_t fade = 4;
+
+    explicit VectorPipe(uint32_t record_type);
+
+    void append(int frame, const std::vector<int> &values) override;
+
+private:
+    uint32_t record_type;
+};
+
+
+#endif //DANDERE2X_VECTORPIPE_H
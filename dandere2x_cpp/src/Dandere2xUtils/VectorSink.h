@@ -0,0 +1,21 @@
+//
+//Licensed under the GNU General Public License Version 3 (GNU GPL v3),
+//    available at: https://www.gnu.org/licenses/gpl-3.0.txt
+
+#ifndef DANDERE2X_VECTORSINK_H
+#define DANDERE2X_VECTORSINK_H
+
+#include <vector>
+
+/**
+ * Somewhere a plugin's vectors can be sent to, other than their own file per frame (see VectorJournal, VectorPipe).
+ */
+class VectorSink {
+
+public:
+    virtual ~VectorSink() = default;
+
+    virtual void append(int frame, const std::vector<int> &values) = 0;
+};
+
+#endif //DANDERE2X_VECTORSINK_H
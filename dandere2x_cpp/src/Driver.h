@@ -12,6 +12,8 @@
 #include "Plugins/Fade/Fade.h"
 
 #include "Dandere2xUtils/Dandere2xUtils.h"
+#include "Dandere2xUtils/VectorJournal.h"
+#include "Dandere2xUtils/VectorPipe.h"
 #include "Image/DebugImage/DebugImage.h"
 
 
@@ -37,7 +39,8 @@ const int correction_block_size = 2;
 using namespace std::chrono;
 
 void driver_difference(string workspace, int resume_count, int frame_count,
-                       int block_size, int step_size, string extension_type)  {
+                       int block_size, int step_size, string extension_type, string vector_storage = "files",
+                       bool temporal_seeding = false)  {
 
 
     // Create pre-fixes for all the files needed to be accessed during dandere2x's runtime.
@@ -51,35 +54,75 @@ void driver_difference(string workspace, int resume_count, int frame_count,
     string fade_prefix = workspace + separator() + "fade_data" + separator() + "fade_";
     string compressed_static_prefix = workspace + separator() + "compressed_static" + separator() + "compressed_";
     string compressed_moving_prefix = workspace + separator() + "compressed_static" + separator() + "compressed_";
+    string scene_cut_prefix = workspace + separator() + "scene_cuts" + separator() + "cut_";
+
+    // Unless vectors are saved into their own files ("files"), every frame's vectors are either appended into one
+    // journal per data type ("journal"), or streamed to D2xPython over stdout ("pipe").
+    bool use_sinks = vector_storage != "files";
+    unique_ptr<VectorSink> p_data_sink, residual_sink, correction_sink, fade_sink;
+    if (vector_storage == "journal") {
+        p_data_sink.reset(new VectorJournal(
+                workspace + separator() + "pframe_data" + separator() + "pframe.journal", frame_count));
+        residual_sink.reset(new VectorJournal(
+                workspace + separator() + "residual_data" + separator() + "residual.journal", frame_count));
+        correction_sink.reset(new VectorJournal(
+                workspace + separator() + "correction_data" + separator() + "correction.journal", frame_count));
+        fade_sink.reset(new VectorJournal(
+                workspace + separator() + "fade_data" + separator() + "fade.journal", frame_count));
+    } else if (vector_storage == "pipe") {
+        p_data_sink.reset(new VectorPipe(VectorPipe::pframe));
+        residual_sink.reset(new VectorPipe(VectorPipe::residual));
+        correction_sink.reset(new VectorPipe(VectorPipe::correction));
+        fade_sink.reset(new VectorPipe(VectorPipe::fade));
+    }
+
    // DANDERE2x_CPP DRIVER STARTS HERE //
 
    // Before we start anything, we need to load the gensises image, image_1. This is because the first
    // Image is treated sort of differently in Dandere2x - it's the only image we can gurantee it is a 'i' frame,
    // And the entire image needs to be loaded.
-    shared_ptr<Image> image_1 = make_shared<Image>(image_prefix + to_string(1) + extension_type);
+   // When resuming, frame 1 isn't needed (and may already be deleted by D2xPython), so only the resume frame is.
+    shared_ptr<Image> image_1;
 
     // Dandere2x_cpp Handles the resume case by leaving everything empty, which serves as a signal to
     // Dandere2x_python simply draw a new frame at the resume frame.
     // Each plugin needs to have it's own 'resume' handling case.
     if (resume_count != 1) {
 
-        shared_ptr<Image> im2 = make_shared<Image>(image_prefix + to_string(resume_count + 1) + extension_type);
+        // The resume frame may not be extracted yet.
+        string resume_image_file = image_prefix + to_string(resume_count + 1) + extension_type;
+        dandere2x::wait_for_file(resume_image_file);
+        shared_ptr<Image> im2 = make_shared<Image>(resume_image_file);
 
         string p_data_file = p_data_prefix + to_string(resume_count) + ".txt";
         string residual_file = residual_data_prefix + to_string(resume_count) + ".txt";
         string correction_file = correction_prefix + to_string(resume_count) + ".txt";
         string fade_file = fade_prefix + to_string(resume_count) + ".txt";
 
-        write_empty(p_data_file);
-        write_empty(residual_file);
-        write_empty(correction_file);
-        write_empty(fade_file);
+        if (use_sinks) {
+            p_data_sink->append(resume_count, vector<int>());
+            residual_sink->append(resume_count, vector<int>());
+            correction_sink->append(resume_count, vector<int>());
+            fade_sink->append(resume_count, vector<int>());
+        } else {
+            write_empty(p_data_file);
+            write_empty(residual_file);
+            write_empty(correction_file);
+            write_empty(fade_file);
+        }
 
         image_1 = im2;
 
         resume_count++;
+    } else {
+        string image_1_file = image_prefix + to_string(1) + extension_type;
+        dandere2x::wait_for_file(image_1_file);
+        image_1 = make_shared<Image>(image_1_file);
     }
 
+    // The previous frame's matched blocks, which seed the next frame's search (if temporal_seeding is set).
+    vector<vector<Block>> previous_blocks;
+
     auto total_start = high_resolution_clock::now();
 
     // Note that if Dandere2x is a new session, resume_count = 0.
@@ -104,18 +147,40 @@ void driver_difference(string workspace, int resume_count, int frame_count,
         dandere2x::wait_for_file(image_2_compressed_static_file);
         dandere2x::wait_for_file(image_2_compressed_moving_file);
 
-        // load actual images themselves
-        shared_ptr<Image> image_2 = make_shared<Image>(image_2_file);
-        shared_ptr<Image> image_2_copy = make_shared<Image>(image_2_file); //load im_2 twice for 'corrections'
-        shared_ptr<Image> image_2_compressed_static = make_shared<Image>(image_2_compressed_static_file);
-        shared_ptr<Image> image_2_compressed_moving = make_shared<Image>(image_2_compressed_moving_file);
-
         // Create strings for the files we need to save for this computation iteration
         string p_data_file = p_data_prefix + to_string(x) + ".txt";
         string residual_file = residual_data_prefix + to_string(x) + ".txt";
         string correction_file = correction_prefix + to_string(x) + ".txt";
         string fade_file = fade_prefix + to_string(x) + ".txt";
 
+        // D2xPython's frame extractor marks hard cuts (scene_cuts.py), which share nothing with the previous frame.
+        // Skip the plugins and leave every vector empty, which D2xPython upscales as a whole new frame.
+        if (dandere2x::file_exists(scene_cut_prefix + to_string(x + 1))) {
+            cout << "Frame " << x << " is a scene cut, skipping" << endl;
+
+            if (use_sinks) {
+                p_data_sink->append(x, vector<int>());
+                residual_sink->append(x, vector<int>());
+                correction_sink->append(x, vector<int>());
+                fade_sink->append(x, vector<int>());
+            } else {
+                write_empty(p_data_file);
+                write_empty(residual_file);
+                write_empty(correction_file);
+                write_empty(fade_file);
+            }
+
+            image_1 = make_shared<Image>(image_2_file);
+            previous_blocks.clear();
+            continue;
+        }
+
+        // load actual images themselves
+        shared_ptr<Image> image_2 = make_shared<Image>(image_2_file);
+        shared_ptr<Image> image_2_copy = make_shared<Image>(image_2_file); //load im_2 twice for 'corrections'
+        shared_ptr<Image> image_2_compressed_static = make_shared<Image>(image_2_compressed_static_file);
+        shared_ptr<Image> image_2_compressed_moving = make_shared<Image>(image_2_compressed_moving_file);
+
         /**
          *  ## Compute Plugins ##
          */
@@ -131,7 +196,10 @@ void driver_difference(string workspace, int resume_count, int frame_count,
         // Find similar blocks between image_1 and image_2 and match them, and document which matched (p_data_file).
         // Document which blocks we could not find a match for, and add them to a list of missing blocks (residual_file)
         PFrame pframe = PFrame(image_1, image_2, image_2_compressed_static, image_2_compressed_moving, block_size, p_data_file, residual_file, step_size);
+        if (temporal_seeding && !previous_blocks.empty())
+            pframe.set_seeds(&previous_blocks);
         pframe.run();
+        previous_blocks = pframe.get_matched_blocks();
 
         // When finding similar blocks, there may be small blemishes left in as a result. Try our best
         // To find those errors, and replace them with nearby pixels. Use the original image as a reference
@@ -140,9 +208,15 @@ void driver_difference(string workspace, int resume_count, int frame_count,
         correction.run();
 
         // Save the results for Dandere2x_python to use
-        pframe.save();
-        fade.save();
-        correction.save();
+        if (use_sinks) {
+            pframe.save(*p_data_sink, *residual_sink, x);
+            fade.save(*fade_sink, x);
+            correction.save(*correction_sink, x);
+        } else {
+            pframe.save();
+            fade.save();
+            correction.save();
+        }
 
        // For Debugging. Create a folder called 'debug_frames' in workspace when testing this -
        // Enabling this will allow you to see what Dandere2x_Cpp is seeing when it finishes processing a frame.
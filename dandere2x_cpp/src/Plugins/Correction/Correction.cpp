@@ -38,19 +38,27 @@ void Correction::run() {
 }
 
 void Correction::save() {
-    std::ofstream out(this->correction_file + ".temp");
+    dandere2x::write_vectors(this->correction_file, get_vectors());
+}
+
+void Correction::save(VectorSink &correction_sink, int frame) {
+    correction_sink.append(frame, get_vectors());
+}
+
+std::vector<int> Correction::get_vectors() {
+    std::vector<int> values;
 
     for (int iter = 0; iter < blocks.size(); iter++) {
 
         if (blocks[iter].x_start != blocks[iter].y_start && blocks[iter].y_start != blocks[iter].y_end) {
-            out << blocks[iter].x_start << "\n" <<
-                   blocks[iter].y_start << "\n" <<
-                   blocks[iter].x_end << "\n" <<
-                   blocks[iter].y_end << std::endl;
+            values.push_back(blocks[iter].x_start);
+            values.push_back(blocks[iter].y_start);
+            values.push_back(blocks[iter].x_end);
+            values.push_back(blocks[iter].y_end);
         }
     }
-    out.close();
-    std::rename((this->correction_file + ".temp").c_str(), this->correction_file.c_str());
+
+    return values;
 
 }
 
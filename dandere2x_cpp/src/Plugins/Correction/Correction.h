@@ -14,6 +14,7 @@
 #include "Image/Image.h"
 #include "BlockMatch/DiamondSearch.h"
 #include "Dandere2xUtils/Dandere2xUtils.h"
+#include "Dandere2xUtils/VectorSink.h"
 
 /**
  * This can be seen as a second order approximation given the restrictions
@@ -53,6 +54,8 @@ public:
 
     void save();
 
+    void save(VectorSink &correction_sink, int frame);
+
 
 private:
     int step_size;
@@ -69,6 +72,8 @@ private:
 
     void draw_over();
 
+    std::vector<int> get_vectors();
+
     void match_block(int x, int y);
 
     void match_all_blocks();
@@ -13,15 +13,24 @@
 
 
 void Fade::save() {
-    std::ofstream out(this->fade_file + ".temp");
+    dandere2x::write_vectors(this->fade_file, get_vectors());
+}
+
+void Fade::save(VectorSink &fade_sink, int frame) {
+    fade_sink.append(frame, get_vectors());
+}
 
-    for (int iter = 0; iter < fade_blocks.size(); iter++)
-        out << fade_blocks[iter].x << "\n" <<
-               fade_blocks[iter].y << "\n" <<
-               fade_blocks[iter].scalar << std::endl;
+std::vector<int> Fade::get_vectors() {
+    std::vector<int> values;
+
+    // scalars are applied as ints (see draw_over), so they're saved as such.
+    for (int iter = 0; iter < fade_blocks.size(); iter++) {
+        values.push_back(fade_blocks[iter].x);
+        values.push_back(fade_blocks[iter].y);
+        values.push_back((int) fade_blocks[iter].scalar);
+    }
 
-    out.close();
-    std::rename((this->fade_file + ".temp").c_str(), this->fade_file.c_str());
+    return values;
 }
 
 /*
@@ -39,6 +39,8 @@
 #include <fstream>
 #include <Image/ImageUtils.h>
 #include "Image/SSIM/SSIM-MSE.h"
+#include "Dandere2xUtils/Dandere2xUtils.h"
+#include "Dandere2xUtils/VectorSink.h"
 
 using namespace std;
 
@@ -67,10 +69,15 @@ public:
 
     void save();
 
+    void save(VectorSink &fade_sink, int frame);
+
     void run();
 
 private:
 
+    std::vector<int> get_vectors();
+
+
     std::shared_ptr<Image> image1;
     std::shared_ptr<Image> image1_copy;
     std::shared_ptr<Image> image2;
@@ -26,10 +26,12 @@ PFrame::PFrame(std::shared_ptr<Image> image1, std::shared_ptr<Image> image2,
     this->image2_compressed_moving = image2_compressed_moving;
     this->step_size = step_size;
     this->max_checks = 128; //prevent diamond search from going on forever
+    this->min_mse = 1000; //a block found within this MSE ends the search early
     this->block_size = block_size;
     this->width = image1->width;
     this->height = image1->height;
     this->res = nullptr;
+    this->seeds = nullptr;
     this->p_frame_file = p_frame_file;
     this->residual_file = residual_file;
     this->matched_blocks.resize(this->width / block_size, std::vector<Block>(this->height / block_size));
@@ -98,6 +100,18 @@ void PFrame::save() {
     }
 }
 
+// Same as above, but sending the vectors to the session's journals / pipe rather than into their own files.
+void PFrame::save(VectorSink &p_frame_sink, VectorSink &residual_sink, int frame) {
+    if (this->matched_blocks_count != 0) {
+        create_residual();
+        residual_sink.append(frame, this->res->get_vectors());
+        p_frame_sink.append(frame, get_vectors());
+    } else {
+        residual_sink.append(frame, std::vector<int>());
+        p_frame_sink.append(frame, std::vector<int>());
+    }
+}
+
 
 void PFrame::create_residual() {
     this->res = std::make_shared<Residual>(matched_blocks, block_size, image2);
@@ -184,13 +198,13 @@ void PFrame::match_block(int x, int y) {
     if (stationary_ssim >= min_ssim_static) {
         matched_blocks[x][y] = Block(x * block_size, y * block_size, x * block_size, y * block_size, stationary_ssim);
         this->matched_blocks_count++;
-    } else {
-        // If the MSE found at the stationary location isn't good enough, conduct a diamond search looking
-        // for the blocks match nearby.
+    } else if (seeds == nullptr || !match_block_from_seeds(x, y, min_ssim_moving)) {
+        // If the MSE found at the stationary location isn't good enough (and the block didn't move the way it's
+        // seeds did), conduct a diamond search looking for the blocks match nearby.
         Block result = DiamondSearch::diamond_search_iterative_super(*image2, *image1,
                                                                      x * block_size, y * block_size,
                                                                      x * block_size, y * block_size,
-                                                                     1000, block_size, step_size, max_checks);
+                                                                     min_mse, block_size, step_size, max_checks);
 
 //        Block result = ExhaustiveSearch::exhaustive_search(*image2, *image1, x * block_size, y * block_size, block_size);
 
@@ -210,6 +224,63 @@ void PFrame::match_block(int x, int y) {
 
 
 
+void PFrame::set_seeds(const std::vector<std::vector<Block>> *previous_blocks) {
+    this->seeds = previous_blocks;
+}
+
+const std::vector<std::vector<Block>> &PFrame::get_matched_blocks() const {
+    return matched_blocks;
+}
+
+/**
+ * Before diamond searching for a block, try the vectors the block itself, then it's left, right, top and bottom
+ * neighbours, moved by in the previous frame. In a pan (or anything moving steadily) blocks keep moving the same way,
+ * so this usually finds the block in one or two MSE evaluations, rather than a full diamond search.
+ *
+ * A seed is used if it's within min_mse (where diamond search would stop too), and passes the same check as a
+ * diamond searched block. Returns false if no seed is good enough, so the block is diamond searched as usual.
+ */
+bool PFrame::match_block_from_seeds(int x, int y, double min_ssim_moving) {
+    static const int neighbours[5][2] = {{0, 0}, {-1, 0}, {1, 0}, {0, -1}, {0, 1}};
+
+    for (const auto &neighbour : neighbours) {
+        int seed_x = x + neighbour[0];
+        int seed_y = y + neighbour[1];
+
+        if (seed_x < 0 || seed_y < 0 || seed_x >= (int) seeds->size() || seed_y >= (int) (*seeds)[seed_x].size())
+            continue;
+
+        const Block &seed = (*seeds)[seed_x][seed_y];
+        int delta_x = seed.x_end - seed.x_start;
+        int delta_y = seed.y_end - seed.y_start;
+
+        // Blocks only get accepted as moving if they moved along both axis (see match_block).
+        if (!seed.valid || delta_x == 0 || delta_y == 0)
+            continue;
+
+        int x_end = x * block_size + delta_x;
+        int y_end = y * block_size + delta_y;
+
+        if (x_end < 0 || y_end < 0 || x_end + (int) block_size > width || y_end + (int) block_size > height)
+            continue;
+
+        double sum = ImageUtils::mse(*image2, *image1, x * block_size, y * block_size, x_end, y_end, block_size);
+        if (sum > min_mse)
+            continue;
+
+        double block_ssim = SSIM::ssim(*image1, *image2, x * block_size, y * block_size, x_end, y_end, block_size);
+        if (block_ssim >= min_ssim_moving) {
+            matched_blocks[x][y] = Block(x * block_size, y * block_size, x_end, y_end, sum);
+            this->matched_blocks_count++;
+            this->moving_blocks_count++;
+            return true;
+        }
+    }
+
+    return false;
+}
+
+
 //write all the matched blocks into a text file.
 // Save it as '.temp' initially so D2xPython doesn't read it before
 // it's done writing.
@@ -217,8 +288,12 @@ void PFrame::match_block(int x, int y) {
 // If the item is a duplicate prediction (i.e (0,0) -> (0,0))
 // We can save computational time by simply not saving it
 void PFrame::write(std::string output_file) {
+    dandere2x::write_vectors(output_file, get_vectors());
+}
 
-    std::ofstream out(output_file + ".temp");
+std::vector<int> PFrame::get_vectors() {
+
+    std::vector<int> values;
 
     for (int x = 0; x < width / block_size; x++) {
         for (int y = 0; y < height / block_size; y++) {
@@ -226,18 +301,13 @@ void PFrame::write(std::string output_file) {
                 //matched_blocks[x][y].x_start != matched_blocks[x][y].x_end &&
                 //matched_blocks[x][y].y_start != matched_blocks[x][y].y_end ) {
 
-                out <<
-                    matched_blocks[x][y].x_start << "\n" <<
-                    matched_blocks[x][y].y_start << "\n" <<
-                    matched_blocks[x][y].x_end << "\n" <<
-                    matched_blocks[x][y].y_end << std::endl;
+                values.push_back(matched_blocks[x][y].x_start);
+                values.push_back(matched_blocks[x][y].y_start);
+                values.push_back(matched_blocks[x][y].x_end);
+                values.push_back(matched_blocks[x][y].y_end);
             }
         }
     }
 
-    out.close();
-
-    rename((output_file + ".temp").c_str(), output_file.c_str());
-
-
+    return values;
 }
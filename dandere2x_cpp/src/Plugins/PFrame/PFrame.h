@@ -14,6 +14,7 @@
 #include "BlockMatch/DiamondSearch.h"
 #include "Image/Image.h"
 #include "Dandere2xUtils/Dandere2xUtils.h"
+#include "Dandere2xUtils/VectorSink.h"
 #include "Plugins/PFrame/Residual/Residual.h"
 
 
@@ -63,9 +64,17 @@ public:
 
     void save();
 
+    void save(VectorSink &p_frame_sink, VectorSink &residual_sink, int frame);
+
+    // Seed each block's search with where it (and it's neighbours) moved in the previous frame.
+    void set_seeds(const std::vector<std::vector<Block>> *previous_blocks);
+
+    const std::vector<std::vector<Block>> &get_matched_blocks() const;
+
 private:
     int step_size;
     int max_checks;
+    double min_mse;
     unsigned int block_size;
     int width;
     int height;
@@ -77,6 +86,7 @@ private:
     std::string residual_file;
 
     std::vector<std::vector<Block>> matched_blocks;
+    const std::vector<std::vector<Block>> *seeds;
     std::shared_ptr<Image> image1;
     std::shared_ptr<Image> image2;
     std::shared_ptr<Image> image2_compressed_static;
@@ -93,8 +103,12 @@ private:
 
     inline void match_block(int x, int y);
 
+    bool match_block_from_seeds(int x, int y, double min_ssim_moving);
+
     void write(std::string output_file);
 
+    std::vector<int> get_vectors();
+
 };
 
 
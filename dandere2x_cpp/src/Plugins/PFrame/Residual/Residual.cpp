@@ -28,18 +28,20 @@ void Residual::run() {
 }
 
 void Residual::write(std::string output_file) {
-    //create a temp file
-    std::ofstream out(output_file + ".temp");
+    dandere2x::write_vectors(output_file, get_vectors());
+}
+
+std::vector<int> Residual::get_vectors() {
+    std::vector<int> values;
 
-    //write vectors to temp file
     for (int x = 0; x < difference_blocks->list.size(); x++) {
-        out << difference_blocks->list[x].x_start << "\n" <<
-            difference_blocks->list[x].y_start << "\n" <<
-            difference_blocks->list[x].x_end << "\n" <<
-            difference_blocks->list[x].y_end << std::endl;
+        values.push_back(difference_blocks->list[x].x_start);
+        values.push_back(difference_blocks->list[x].y_start);
+        values.push_back(difference_blocks->list[x].x_end);
+        values.push_back(difference_blocks->list[x].y_end);
     }
-    out.close();
-    rename((output_file + ".temp").c_str(), output_file.c_str());
+
+    return values;
 
 }
 
@@ -17,6 +17,7 @@
 #include "Image/Image.h"
 #include "BlockMatch/Block.h"
 #include "ResidualBlocks.h"
+#include "Dandere2xUtils/Dandere2xUtils.h"
 
 
 /**
@@ -71,6 +72,8 @@ public:
 
     void write(std::string output_file);
 
+    std::vector<int> get_vectors();
+
 private:
 
     std::vector<std::vector<bool>> occupied_pixel;
@@ -2,6 +2,11 @@
 #include "Plugins/Fade/Fade.h"
 #include "Image/DebugImage/DebugImage.h"
 
+#ifdef _WIN32
+#include <io.h>
+#include <fcntl.h>
+#endif
+
 
 
 /*
@@ -29,6 +34,18 @@ int main(int argc, char **argv) {
     string run_type = "r";// 'n' or 'r'
     int resume_frame = 200;
     string extension_type = ".jpg";
+    string vector_format = "text"; // 'text' or 'binary'
+    string vector_storage = "files"; // 'files', 'journal' or 'pipe'
+    bool temporal_seeding = false; // seed block searches with the previous frame's vectors
+
+    // When streaming vectors over stdout (vector_storage, argv[9]), stdout is reserved for vectors - everything else
+    // goes to stderr instead. This needs to happen before anything is printed.
+    if (!debug && argc > 9 && string(argv[9]) == "pipe") {
+        cout.rdbuf(cerr.rdbuf());
+#ifdef _WIN32
+        _setmode(_fileno(stdout), _O_BINARY);
+#endif
+    }
 
     cout << "Dandere2x CPP vDSSIM 1.0" << endl;
 
@@ -41,6 +58,14 @@ int main(int argc, char **argv) {
         run_type = argv[5];
         resume_frame = atoi(argv[6]);
         extension_type = argv[7];
+
+        // optional, for the sake of older D2xPython versions that don't pass it.
+        if (argc > 8)
+            vector_format = argv[8];
+        if (argc > 9)
+            vector_storage = argv[9];
+        if (argc > 10)
+            temporal_seeding = atoi(argv[10]) != 0;
     }
 
     cout << "Settings" << endl;
@@ -51,11 +76,18 @@ int main(int argc, char **argv) {
     cout << "run_type: " << run_type << endl;
     cout << "ResumeFrame (if valid): " << resume_frame << endl;
     cout << "extension_type: " << extension_type << endl;
+    cout << "vector_format: " << vector_format << endl;
+    cout << "vector_storage: " << vector_storage << endl;
+    cout << "temporal_seeding: " << temporal_seeding << endl;
+
+    dandere2x::set_binary_vectors(vector_format == "binary");
 
     if (run_type == "n")
-        driver_difference(workspace, 1, frame_count, block_size, step_size, extension_type);
+        driver_difference(workspace, 1, frame_count, block_size, step_size, extension_type,
+                          vector_storage, temporal_seeding);
     else if (run_type == "r")
-        driver_difference(workspace, resume_frame, frame_count, block_size, step_size, extension_type);
+        driver_difference(workspace, resume_frame, frame_count, block_size, step_size, extension_type,
+                          vector_storage, temporal_seeding);
 
     return 0;
 }
@@ -0,0 +1,137 @@
+"""
+Benchmark: vectors computed per second by dandere2x_cpp vs the numpy block matcher (block_matcher/), on the same
+frames, and how often the two agree.
+
+Usage (from the src directory):
+    python -m benchmarks.block_matcher_vectors -W 1920 -H 1080 -b 30 -f 30 [-t] [-e path/to/dandere2x_cpp]
+
+A synthetic clip (a flat background, a sprite moving across it and a square changing color, so there's a mix of
+stationary, moving and residual blocks) is written as a dandere2x workspace, then both matchers compute every
+frame's vectors. Every block of every frame gets exactly one vector (pframe or residual), so vectors/s is blocks
+matched per second. Both timings include decoding the frames' jpegs. -t seeds both matchers' searches with the
+previous frame's vectors (context.temporal_seeding).
+"""
+import argparse
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+
+import imageio
+import numpy as np
+
+from dandere2x.dandere2x_service.core.block_matcher.pframe import draw_over, match_blocks, pframe_vectors, \
+    residual_vectors, seed_offsets
+from dandere2x.dandere2xlib.utils.vector_utils import get_vectors_from_file_and_wait
+from dandere2x.dandere2xlib.utils.yaml_utils import load_executable_paths_yaml
+
+
+def make_workspace(workspace: str, width: int, height: int, frame_count: int, random: np.random.RandomState):
+    for directory in ["inputs", "compressed_static", "pframe_data", "residual_data", "correction_data", "fade_data"]:
+        os.makedirs(os.path.join(workspace, directory))
+
+    # A static, mostly flat background (as in most anime), a textured sprite moving across it, and a square changing
+    # color every few frames, which has to be upscaled as residuals.
+    y, x = np.mgrid[0:height, 0:width]
+    background = np.stack([96 + 40 * (x // 160 % 2) + 20 * (y // 120 % 3),
+                           160 - 30 * (x // 240 % 2),
+                           120 + 50 * np.sin(y / 180.0)], axis=2).astype(np.float64)
+    sprite = 128 + 100 * np.sin(np.mgrid[0:150, 0:150, 0:3].sum(axis=0) / 9.0)
+
+    for frame in range(1, frame_count + 1):
+        image = background.copy()
+
+        sprite_x, sprite_y = (40 + 6 * frame) % (width - 150), (30 + 4 * frame) % (height - 150)
+        image[sprite_y: sprite_y + 150, sprite_x: sprite_x + 150] = sprite
+
+        if frame % 3 == 0:
+            square_x, square_y = random.randint(0, width - 120), random.randint(0, height - 120)
+            image[square_y: square_y + 120, square_x: square_x + 120] = random.randint(0, 255, 3)
+
+        image = np.clip(image, 0, 255).astype(np.uint8)
+        imageio.imwrite(os.path.join(workspace, "inputs", "frame%d.jpg" % frame), image, quality=95)
+        imageio.imwrite(os.path.join(workspace, "compressed_static", "compressed_%d.jpg" % frame), image, quality=85)
+
+
+def run_cpp(executable: str, workspace: str, frame_count: int, block_size: int, step_size: int,
+            temporal_seeding: bool) -> float:
+    start = time.time()
+    subprocess.run([executable, workspace, str(frame_count), str(block_size), str(step_size), "r", "1", ".jpg",
+                    "binary", "files", str(int(temporal_seeding))], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+    return time.time() - start
+
+
+def run_numpy(workspace: str, frame_count: int, block_size: int, step_size: int,
+              temporal_seeding: bool) -> (float, dict):
+    vectors = {}
+    seeds = None
+    start = time.time()
+
+    image_previous = imageio.imread(os.path.join(workspace, "inputs", "frame1.jpg"))
+    for x in range(1, frame_count):
+        image_next = np.array(imageio.imread(os.path.join(workspace, "inputs", "frame%d.jpg" % (x + 1))))
+        image_compressed = imageio.imread(os.path.join(workspace, "compressed_static", "compressed_%d.jpg" % (x + 1)))
+
+        positions, ends, matched = match_blocks(image_previous, image_next, image_compressed, block_size, step_size,
+                                                seeds=seeds)
+        draw_over(image_previous, image_next, positions, ends, matched, block_size)
+
+        if matched.any():
+            vectors[x] = (pframe_vectors(positions, ends, matched), residual_vectors(positions, matched))
+        else:
+            vectors[x] = (np.array([], dtype=np.int32), np.array([], dtype=np.int32))
+
+        image_previous = image_next
+        if temporal_seeding:
+            seeds = seed_offsets(positions, ends, matched)
+
+    return time.time() - start, vectors
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-W", "--width", type=int, default=1920)
+    parser.add_argument("-H", "--height", type=int, default=1080)
+    parser.add_argument("-b", "--block_size", type=int, default=30)
+    parser.add_argument("-s", "--step_size", type=int, default=4)
+    parser.add_argument("-f", "--frames", type=int, default=30)
+    parser.add_argument("-t", "--temporal_seeding", action="store_true")
+    parser.add_argument("-e", "--executable", type=str, default=None,
+                        help="dandere2x_cpp executable (defaults to the one in executable_paths.yaml)")
+    args = parser.parse_args()
+
+    executable = args.executable or load_executable_paths_yaml()["dandere2x_cpp"]
+    workspace = tempfile.mkdtemp()
+
+    try:
+        make_workspace(workspace, args.width, args.height, args.frames, np.random.RandomState(0))
+
+        cpp_time = run_cpp(executable, workspace, args.frames, args.block_size, args.step_size, args.temporal_seeding)
+        numpy_time, numpy_vectors = run_numpy(workspace, args.frames, args.block_size, args.step_size,
+                                              args.temporal_seeding)
+
+        frames_agreeing, pframe_vectors_found, residual_vectors_found = 0, 0, 0
+        for x, (pframe, residual) in numpy_vectors.items():
+            cpp_pframe = get_vectors_from_file_and_wait(os.path.join(workspace, "pframe_data", "pframe_%d.txt" % x))
+            cpp_residual = get_vectors_from_file_and_wait(
+                os.path.join(workspace, "residual_data", "residual_%d.txt" % x))
+            frames_agreeing += np.array_equal(pframe, cpp_pframe) and np.array_equal(residual, cpp_residual)
+            pframe_vectors_found += len(cpp_pframe) // 4
+            residual_vectors_found += len(cpp_residual) // 4
+    finally:
+        shutil.rmtree(workspace, ignore_errors=True)
+
+    vectors = (args.width // args.block_size) * (args.height // args.block_size) * (args.frames - 1)
+
+    print("%dx%d, block size %d, %d frames (%d vectors)" % (args.width, args.height, args.block_size, args.frames,
+                                                            vectors))
+    print("%-14s %10s %12s" % ("matcher", "seconds", "vectors/s"))
+    print("%-14s %10.3f %12.0f" % ("dandere2x_cpp", cpp_time, vectors / cpp_time))
+    print("%-14s %10.3f %12.0f" % ("numpy", numpy_time, vectors / numpy_time))
+    print("dandere2x_cpp found %d pframe and %d residual vectors" % (pframe_vectors_found, residual_vectors_found))
+    print("frames with identical vectors: %d / %d" % (frames_agreeing, len(numpy_vectors)))
+
+
+if __name__ == "__main__":
+    main()
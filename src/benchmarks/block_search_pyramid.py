@@ -0,0 +1,93 @@
+"""
+Benchmark: residual blocks left over, and matching time, of the numpy block matcher's diamond search vs it's
+pyramid (coarse-to-fine) search, on a clip with large motion.
+
+Usage (from the src directory):
+    python -m benchmarks.block_search_pyramid -W 1920 -H 1080 -b 30 -f 20 -m 24
+
+The clip is a flat background with textured sprites moving -m pixels a frame (in both directions), as in fast
+action scenes. Every block that isn't matched becomes a residual which has to be upscaled, so fewer residuals is
+less upscaling work.
+"""
+import argparse
+import io
+import time
+
+import imageio
+import numpy as np
+
+from dandere2x.dandere2x_service.core.block_matcher.pframe import draw_over, match_blocks
+
+
+def make_clip(width: int, height: int, frame_count: int, motion: int):
+    """ Yield (frame, frame re-compressed as a jpeg) for every frame of the clip. """
+    y, x = np.mgrid[0:height, 0:width]
+    background = np.stack([96 + 40 * (x // 160 % 2) + 20 * (y // 120 % 3),
+                           160 - 30 * (x // 240 % 2),
+                           120 + 50 * np.sin(y / 180.0)], axis=2).astype(np.float64)
+
+    sprite_y, sprite_x = np.mgrid[0:180, 0:180]
+    sprite = np.stack([128 + 60 * np.sin(sprite_x / 11.0), 128 + 60 * np.cos(sprite_y / 13.0),
+                       128 + 60 * np.sin((sprite_x + sprite_y) / 17.0)], axis=2)
+
+    # About one sprite per 960x540 of frame, as too much changing makes frames too different to bother matching.
+    sprite_count = max(width * height // (960 * 540), 1)
+
+    for frame in range(1, frame_count + 1):
+        image = background.copy()
+
+        for sprite_index in range(sprite_count):
+            left = (100 + 300 * sprite_index + motion * frame) % (width - 180)
+            top = (80 + 150 * sprite_index + (motion // 2) * frame) % (height - 180)
+            image[top: top + 180, left: left + 180] = sprite
+
+        image = np.clip(image, 0, 255).astype(np.uint8)
+
+        compressed = io.BytesIO()
+        imageio.imwrite(compressed, image, format="jpg", quality=85)
+        yield image, np.asarray(imageio.imread(compressed.getvalue(), format="jpg"))
+
+
+def run(frames: list, block_size: int, step_size: int, search: str):
+    start = time.time()
+    residuals, moving = 0, 0
+
+    image_previous = frames[0][0].copy()
+    for image, image_compressed in frames[1:]:
+        image_next = image.copy()
+
+        positions, ends, matched = match_blocks(image_previous, image_next, image_compressed, block_size, step_size,
+                                                search=search)
+        draw_over(image_previous, image_next, positions, ends, matched, block_size)
+
+        residuals += (~matched).sum() if matched.any() else len(matched)
+        moving += (matched & (ends != positions).any(axis=1)).sum()
+        image_previous = image_next
+
+    return time.time() - start, residuals, moving
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-W", "--width", type=int, default=1920)
+    parser.add_argument("-H", "--height", type=int, default=1080)
+    parser.add_argument("-b", "--block_size", type=int, default=30)
+    parser.add_argument("-s", "--step_size", type=int, default=4)
+    parser.add_argument("-f", "--frames", type=int, default=20)
+    parser.add_argument("-m", "--motion", type=int, default=24, help="pixels the sprites move each frame")
+    args = parser.parse_args()
+
+    frames = list(make_clip(args.width, args.height, args.frames, args.motion))
+    blocks = (args.width // args.block_size) * (args.height // args.block_size) * (args.frames - 1)
+
+    print("%dx%d, block size %d, %d frames, motion %d px/frame (%d blocks)" %
+          (args.width, args.height, args.block_size, args.frames, args.motion, blocks))
+    print("%-8s %10s %12s %14s" % ("search", "seconds", "residuals", "moving blocks"))
+
+    for search in ["diamond", "pyramid"]:
+        seconds, residuals, moving = run(frames, args.block_size, args.step_size, search)
+        print("%-8s %10.3f %12d %14d" % (search, seconds, residuals, moving))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Benchmark: CPU time burnt by the threads waiting on Dandere2xController's current frame (MinDiskUsage, Status and
+AbstractUpscaler.join), polling get_current_frame as they used to vs blocking in wait_for_frame.
+
+Usage (from the src directory):
+    python -m benchmarks.controller_idle_cpu -f 50 -i 0.1
+
+A producer thread stands in for merge.py, advancing the current frame every -i seconds (a slow upscaler), while the
+three waiters wait on every frame. CPU time is the whole process's, so it's what the waiters (and the producer, which
+does next to nothing) cost, as a percentage of one core.
+"""
+import argparse
+import threading
+import time
+
+from dandere2x.dandere2x_service.dandere2x_service_controller import Dandere2xController
+
+
+def polling_waiter(controller: Dandere2xController, frame_count: int, sleep: float):
+    """ How MinDiskUsage (sleep = .00001) and Status (sleep = .00001) used to wait. """
+    for x in range(1, frame_count):
+        while x >= controller.get_current_frame():
+            time.sleep(sleep)
+
+
+def polling_join(controller: Dandere2xController, frame_count: int):
+    """ How AbstractUpscaler.join used to wait. """
+    while controller.get_current_frame() < frame_count - 1:
+        time.sleep(0.05)
+
+
+def blocking_waiter(controller: Dandere2xController, frame_count: int):
+    for x in range(1, frame_count):
+        controller.wait_for_frame(x + 1)
+
+
+def blocking_join(controller: Dandere2xController, frame_count: int):
+    controller.wait_for_frame(frame_count - 1)
+
+
+def run(waiters: list, frame_count: int, interval: float) -> (float, float):
+    """ Returns the (wall, cpu) seconds of advancing through every frame with 'waiters' waiting on them. """
+    controller = Dandere2xController()
+    threads = [threading.Thread(target=waiter, args=(controller, frame_count) + args) for waiter, args in waiters]
+
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+
+    for thread in threads:
+        thread.start()
+
+    for frame in range(2, frame_count + 1):
+        time.sleep(interval)
+        controller.update_frame_count(frame)
+
+    for thread in threads:
+        thread.join()
+
+    return time.perf_counter() - wall_start, time.process_time() - cpu_start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-f", "--frames", type=int, default=50)
+    parser.add_argument("-i", "--interval", type=float, default=0.1, help="seconds between frames")
+    args = parser.parse_args()
+
+    polling = [(polling_waiter, (.00001,)), (polling_waiter, (.00001,)), (polling_join, ())]
+    blocking = [(blocking_waiter, ()), (blocking_waiter, ()), (blocking_join, ())]
+
+    print("%d frames, one every %.3f seconds, 3 waiting threads" % (args.frames, args.interval))
+    print("%-10s %10s %12s %12s" % ("waiting", "seconds", "cpu seconds", "% of a core"))
+
+    for name, waiters in [("polling", polling), ("blocking", blocking)]:
+        wall, cpu = run(waiters, args.frames, args.interval)
+        print("%-10s %10.3f %12.3f %12.1f" % (name, wall, cpu, 100 * cpu / wall))
+
+
+if __name__ == "__main__":
+    main()
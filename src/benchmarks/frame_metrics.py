@@ -0,0 +1,57 @@
+"""
+Benchmark: scoring every block of a frame against the same block of another frame, with frame_metrics (block sums
+over the whole frame) vs block_metrics (gathering every block), and checking they agree.
+
+Usage (from the src directory):
+    python -m benchmarks.frame_metrics -W 1920 -H 1080 -b 30
+"""
+import argparse
+import time
+
+import numpy as np
+
+from dandere2x.dandere2x_service.core.block_matcher.pframe import get_block_positions
+from dandere2x.dandere2xlib.metrics.block_metrics import block_mse, block_ssim_mse
+from dandere2x.dandere2xlib.metrics.frame_metrics import frame_block_mse, frame_block_ssim_mse
+
+
+def time_call(function, repeats: int) -> float:
+    """ The average milliseconds a call to 'function' takes. """
+    function()
+    start = time.perf_counter()
+    for _ in range(repeats):
+        function()
+    return (time.perf_counter() - start) / repeats * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-W", "--width", type=int, default=1920)
+    parser.add_argument("-H", "--height", type=int, default=1080)
+    parser.add_argument("-b", "--block_size", type=int, default=30)
+    parser.add_argument("-r", "--repeats", type=int, default=10)
+    args = parser.parse_args()
+
+    random = np.random.RandomState(0)
+    image_a = random.randint(0, 256, (args.height, args.width, 3)).astype(np.uint8)
+    image_b = np.clip(image_a + random.randint(-20, 20, image_a.shape), 0, 255).astype(np.uint8)
+
+    positions = get_block_positions(args.width, args.height, args.block_size)
+    print("%dx%d, block size %d (%d blocks)" % (args.width, args.height, args.block_size, len(positions)))
+    print("%-10s %16s %16s %20s" % ("metric", "block_metrics ms", "frame_metrics ms", "max relative error"))
+
+    metrics = [("mse", block_mse, frame_block_mse), ("ssim_mse", block_ssim_mse, frame_block_ssim_mse)]
+    for name, gathered, whole_frame in metrics:
+        expected = gathered(image_a, positions, image_b, positions, args.block_size)
+        actual = whole_frame(image_a, image_b, args.block_size).T.ravel()
+
+        gathered_ms = time_call(lambda: gathered(image_a, positions, image_b, positions, args.block_size),
+                                args.repeats)
+        whole_frame_ms = time_call(lambda: whole_frame(image_a, image_b, args.block_size), args.repeats)
+
+        print("%-10s %16.2f %16.2f %20.2e" % (name, gathered_ms, whole_frame_ms,
+                                              np.max(np.abs(actual - expected) / np.abs(expected))))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""
+Benchmark: frames/s piping merged frames into ffmpeg as rawvideo (each frame's rgb24 pixels) vs image2pipe (each
+frame encoded as a quality 100 jpeg), see pipe_thread.py - and rawvideo written zero-copy from the frame's buffer (see
+buffer_io.py) vs copied into bytes (frame.tobytes()) and through a buffered stdin. Then, image2pipe's frames/s with
+1 up to -e jpeg encoders encoding frames at once, written in order as Pipe.run does.
+
+Usage (from the src directory):
+    python -m benchmarks.pipe_format -W 3840 -H 2160 -f 60 -e 8
+
+Frames are piped into "ffmpeg -f <format> -i - -f null -", which decodes them (but doesn't encode a video), or into a
+process that just reads and discards stdin if ffmpeg isn't on the path - in which case image2pipe's numbers leave out
+ffmpeg decoding the jpegs again. Reports frames/s, how much was piped per frame, and the most memory python allocated
+piping a single frame (copies of it, and the encoded jpeg).
+"""
+import argparse
+import io
+import os
+import shutil
+import subprocess
+import sys
+import time
+import tracemalloc
+from collections import deque
+
+import numpy
+
+from dandere2x.dandere2xlib.utils.buffer_io import write_buffers
+from dandere2x.dandere2xlib.utils.session_executor import SessionExecutor
+from dandere2x.dandere2xlib.wrappers.frame.frame import Frame
+
+DISCARD_STDIN = "import sys\nbuffer = bytearray(1 << 20)\nwhile sys.stdin.buffer.readinto(buffer):\n    pass"
+
+
+def encode_jpeg(frame: Frame) -> io.BytesIO:
+    jpeg = io.BytesIO()
+    frame.get_pil_image().save(jpeg, format="jpeg", quality=100)
+    return jpeg
+
+
+def write_jpeg(stdin, frame: Frame) -> int:
+    return write_buffers(stdin.fileno(), [encode_jpeg(frame).getbuffer()])
+
+
+def write_raw(stdin, frame: Frame) -> int:
+    return write_buffers(stdin.fileno(), [numpy.ascontiguousarray(frame.frame, dtype=numpy.uint8)])
+
+
+def write_raw_copied(stdin, frame: Frame) -> int:
+    data = frame.frame.tobytes()
+    stdin.write(data)
+    return len(data)
+
+
+# (name, pipe format, how each frame's written to ffmpeg's stdin, whether stdin's buffered)
+METHODS = [("image2pipe", "image2pipe", write_jpeg, False),
+           ("raw, tobytes", "rawvideo", write_raw_copied, True),
+           ("raw, zero-copy", "rawvideo", write_raw, False)]
+
+
+def make_frames(width: int, height: int, count: int) -> list:
+    """ Gradients with a little noise, roughly as compressible as upscaled video frames. """
+    rng = numpy.random.default_rng(0)
+    gradient = numpy.add.outer(numpy.arange(height) * 255 // max(height - 1, 1),
+                               numpy.arange(width) * 255 // max(width - 1, 1)) // 2
+
+    frames = []
+    for x in range(count):
+        frame = Frame()
+        frame.create_new(width, height)
+        noise = rng.integers(0, 16, (height, width, 3))
+        frame.frame[:] = ((gradient[:, :, None] + noise + x) % 256).astype(numpy.uint8)
+        frames.append(frame)
+    return frames
+
+
+def sink_command(pipe_format: str, width: int, height: int, ffmpeg: str) -> list:
+    if ffmpeg is None:
+        return [sys.executable, "-c", DISCARD_STDIN]
+
+    command = [ffmpeg, "-loglevel", "error", "-f", pipe_format]
+    if pipe_format == "rawvideo":
+        command.extend(["-pix_fmt", "rgb24", "-s", "%dx%d" % (width, height)])
+    return command + ["-i", "-", "-f", "null", "-"]
+
+
+def pipe(frames: list, pipe_format: str, write, buffered: bool, ffmpeg: str) -> tuple:
+    """ Returns (seconds, bytes piped, most bytes python allocated writing the first frame) to pipe every frame. """
+    width, height = frames[0].width, frames[0].height
+    process = subprocess.Popen(sink_command(pipe_format, width, height, ffmpeg), stdin=subprocess.PIPE,
+                               bufsize=-1 if buffered else 0)
+
+    tracemalloc.start()
+    written = write(process.stdin, frames[0])
+    allocated = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    for frame in frames[1:]:
+        written += write(process.stdin, frame)
+
+    process.stdin.close()
+    process.wait()
+    return time.perf_counter() - start, written, allocated
+
+
+def pipe_jpegs(frames: list, encoders: int, ffmpeg: str) -> float:
+    """ Returns the seconds to pipe every frame as image2pipe, with 'encoders' frames encoded at once. """
+    process = subprocess.Popen(sink_command("image2pipe", frames[0].width, frames[0].height, ffmpeg),
+                               stdin=subprocess.PIPE, bufsize=0)
+    executor = SessionExecutor(io_workers=1, cpu_workers=encoders)
+    encoding = deque()
+
+    start = time.perf_counter()
+    for frame in frames:
+        encoding.append(executor.submit_cpu(encode_jpeg, frame))
+        if len(encoding) >= encoders:
+            write_buffers(process.stdin.fileno(), [encoding.popleft().result().getbuffer()])
+
+    while encoding:
+        write_buffers(process.stdin.fileno(), [encoding.popleft().result().getbuffer()])
+
+    process.stdin.close()
+    process.wait()
+    executor.shutdown()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-W", "--width", type=int, default=3840)
+    parser.add_argument("-H", "--height", type=int, default=2160)
+    parser.add_argument("-f", "--frames", type=int, default=60)
+    parser.add_argument("-e", "--encoders", type=int, default=os.cpu_count() or 1,
+                        help="the most jpeg encoders to try, one per core by default")
+    args = parser.parse_args()
+
+    ffmpeg = shutil.which("ffmpeg")
+    frames = make_frames(args.width, args.height, args.frames + 1)
+
+    print("%d %dx%d frames, piped into %s" % (args.frames, args.width, args.height,
+                                             "ffmpeg" if ffmpeg else "a process discarding them (no ffmpeg found)"))
+    print("%-16s %10s %10s %14s %16s" % ("method", "seconds", "frames/s", "MB per frame", "MB allocated"))
+
+    for name, pipe_format, write, buffered in METHODS:
+        seconds, written, allocated = pipe(frames, pipe_format, write, buffered, ffmpeg)
+        print("%-16s %10.2f %10.1f %14.2f %16.2f" % (name, seconds, args.frames / seconds,
+                                                     written / (args.frames + 1) / 1024 ** 2, allocated / 1024 ** 2))
+
+    print()
+    print("%-16s %10s %10s" % ("jpeg encoders", "seconds", "frames/s"))
+    for encoders in sorted({min(2 ** power, args.encoders) for power in range(args.encoders.bit_length() + 1)}):
+        seconds = pipe_jpegs(frames[1:], encoders, ffmpeg)
+        print("%-16d %10.2f %10.1f" % (encoders, seconds, args.frames / seconds))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Benchmark: upscaled pixels per frame, fixed block_size residuals vs quadtree residuals.
+
+Usage (from the src directory):
+    python -m benchmarks.quadtree_upscaled_pixels -i sample_clip.mkv -b 30 -q 97 -f 300
+
+dandere2x_cpp isn't needed - residual blocks are approximated by the stationary check dandere2x_cpp does first
+(is copying the block from the previous frame as good as compressing it at quality_minimum?), without the diamond
+search. Moving blocks are therefore counted as residuals in both columns, which is fine for comparing the two.
+"""
+import argparse
+import math
+import types
+
+import cv2
+import numpy as np
+
+from dandere2x.dandere2x_service.core.residual_plugins.packing import get_packed_image_size, pack_residual_rects
+from dandere2x.dandere2x_service.core.residual_plugins.quadtree import quadtree_residuals
+from dandere2x.dandere2xlib.wrappers.frame.frame import Frame
+
+
+def to_frame(image: np.ndarray) -> Frame:
+    frame = Frame()
+    frame.create_new(image.shape[1], image.shape[0])
+    frame.frame[:, :, :] = image
+    return frame
+
+
+def compress(image: np.ndarray, quality: int) -> np.ndarray:
+    _, encoded = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    return cv2.imdecode(encoded, cv2.IMREAD_COLOR)
+
+
+def residual_blocks(frame_next: np.ndarray, frame_previous: np.ndarray, frame_compressed: np.ndarray,
+                    block_size: int) -> list:
+    residuals = []
+    for y in range(0, frame_next.shape[0] - block_size + 1, block_size):
+        for x in range(0, frame_next.shape[1] - block_size + 1, block_size):
+            block_next = frame_next[y:y + block_size, x:x + block_size].astype(np.int32)
+            mse_stationary = np.mean((block_next - frame_previous[y:y + block_size, x:x + block_size]) ** 2)
+            mse_compressed = np.mean((block_next - frame_compressed[y:y + block_size, x:x + block_size]) ** 2)
+            if mse_stationary > mse_compressed:
+                residuals.extend([x, y, 0, 0])
+    return residuals
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-i", "--input", dest="input_file", required=True)
+    parser.add_argument("-b", "--block_size", dest="block_size", type=int, default=30)
+    parser.add_argument("-q", "--quality", dest="quality", type=int, default=97)
+    parser.add_argument("-m", "--min_block_size", dest="min_block_size", type=int, default=8)
+    parser.add_argument("-f", "--frames", dest="frames", type=int, default=300)
+    args = parser.parse_args()
+
+    bleed = 1
+    context = types.SimpleNamespace(service_request=types.SimpleNamespace(block_size=args.block_size),
+                                    quadtree_min_block_size=args.min_block_size)
+
+    capture = cv2.VideoCapture(args.input_file)
+    success, previous = capture.read()
+
+    print("frame,residual_blocks,fixed_pixels,quadtree_pixels")
+    fixed_total, quadtree_total = 0, 0
+
+    for frame_number in range(2, args.frames + 1):
+        success, current = capture.read()
+        if not success:
+            break
+
+        list_residual = residual_blocks(current, previous, compress(current, args.quality), args.block_size)
+        block_count = len(list_residual) // 4
+
+        # residual.py's fixed-size residual image (see Residual.make_residual_image).
+        fixed_pixels = 0
+        if block_count:
+            fixed_pixels = (int(math.sqrt(block_count) + 1) * (args.block_size + bleed * 2)) ** 2
+
+        rects = quadtree_residuals(context, to_frame(current), to_frame(previous),
+                                   to_frame(compress(current, args.quality)), list_residual)
+        quadtree_pixels = 0
+        if rects:
+            width, height = get_packed_image_size(pack_residual_rects(rects, bleed), bleed)
+            quadtree_pixels = width * height
+
+        fixed_total += fixed_pixels
+        quadtree_total += quadtree_pixels
+        print("%d,%d,%d,%d" % (frame_number, block_count, fixed_pixels, quadtree_pixels))
+
+        previous = current
+
+    capture.release()
+    print("total,,%d,%d" % (fixed_total, quadtree_total))
+    if fixed_total:
+        print("quadtree upscales %.1f%% of the fixed block pixels" % (100 * quadtree_total / fixed_total))
+
+
+if __name__ == "__main__":
+    main()
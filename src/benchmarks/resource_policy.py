@@ -0,0 +1,100 @@
+"""
+Benchmark: the throughput of an encode-like stage competing with upscaler-like programs for the cpu, with and without
+a resource policy (see resource_policy.py).
+
+Usage (from the src directory):
+    python -m benchmarks.resource_policy -s 5 -u 2
+
+The "encode" stage is a thread zlib compressing 1080p frames (which releases the GIL, like Pillow encoding jpegs), and
+the "upscalers" are -u programs spinning on the cpu for -s seconds, counting how much work they got done. Each
+scenario is a resource_policy section as it'd be written in output_options.yaml. Reports the frames the stage encoded
+per second, and the work the upscalers got through, relative to running alone.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import threading
+import time
+import zlib
+
+from dandere2x.dandere2xlib.utils.resource_policy import SessionResourcePolicy
+
+UPSCALER = "import time\n" \
+           "end, work = time.perf_counter() + %f, 0\n" \
+           "while time.perf_counter() < end:\n" \
+           "    work += sum(range(1000))\n" \
+           "print(work)"
+
+
+def scenarios(cores: list) -> list:
+    half = max(len(cores) // 2, 1)
+    encode_cores = ",".join(str(core) for core in cores[:half])
+    upscaler_cores = ",".join(str(core) for core in cores[half:] or cores)
+
+    return [
+        ("no policy", {}),
+        ("upscaler nice 19", {"processes": {"upscaler": {"nice": 19, "ionice": "idle"}}}),
+        ("encode nice -10", {"stages": {"encode": {"nice": -10}}}),
+        ("split cores", {"stages": {"encode": {"cpu_affinity": encode_cores}},
+                         "processes": {"upscaler": {"cpu_affinity": upscaler_cores}}}),
+    ]
+
+
+def encode(seconds: float, policy: SessionResourcePolicy, results: dict) -> None:
+    policy.stage("encode").apply_to_thread(threading.get_native_id(), "encode")
+
+    frame = os.urandom(1920 * 1080 * 3 // 4) * 4
+    frames = 0
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        zlib.compress(frame, 1)
+        frames += 1
+
+    results["frames"] = frames
+
+
+def run(seconds: float, upscalers: int, policy: SessionResourcePolicy, encoding: bool = True) -> tuple:
+    """ Returns (frames encoded per second, upscaler work) for 'seconds' with 'upscalers' upscalers running. """
+    processes = []
+    for _ in range(upscalers):
+        process = subprocess.Popen([sys.executable, "-c", UPSCALER % seconds], stdout=subprocess.PIPE)
+        policy.process("upscaler").apply_to_process(process.pid, "upscaler")
+        processes.append(process)
+
+    results = {"frames": 0}
+    if encoding:
+        thread = threading.Thread(target=encode, args=(seconds, policy, results))
+        thread.start()
+        thread.join()
+
+    work = sum(int(process.communicate()[0]) for process in processes)
+    return results["frames"] / seconds, work
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-s", "--seconds", type=float, default=5)
+    parser.add_argument("-u", "--upscalers", type=int, default=None,
+                        help="upscaler programs competing with the stage, one per core by default")
+    args = parser.parse_args()
+
+    cores = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else list(range(os.cpu_count()))
+    upscalers = args.upscalers if args.upscalers is not None else len(cores)
+    no_policy = SessionResourcePolicy.from_yaml({})
+
+    alone_fps, _ = run(args.seconds, 0, no_policy)
+    _, alone_work = run(args.seconds, upscalers, no_policy, encoding=False)
+
+    print("%d core(s), %d upscaler(s), %.1f seconds per scenario" % (len(cores), upscalers, args.seconds))
+    print("encode alone: %.1f frames/s, upscalers alone: %d work" % (alone_fps, alone_work))
+    print("%-18s %10s %16s %17s" % ("policy", "frames/s", "encode vs alone", "upscale vs alone"))
+
+    for name, section in scenarios(cores):
+        policy = SessionResourcePolicy.from_yaml(section)
+        fps, work = run(args.seconds, upscalers, policy)
+        print("%-18s %10.1f %15.0f%% %16.0f%%" % (name, fps, 100 * fps / alone_fps, 100 * work / alone_work))
+
+
+if __name__ == "__main__":
+    main()
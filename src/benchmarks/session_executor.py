@@ -0,0 +1,78 @@
+"""
+Benchmark: submitting min_disk_usage.py's per-frame deletes to the session executor's io pool, vs starting a thread
+per frame as it used to.
+
+Usage (from the src directory):
+    python -m benchmarks.session_executor -f 2000 -n 7
+
+Every "frame" deletes -n (empty) files in a temporary directory, like __delete_used_files does. Reports the wall
+time to get through every frame, and the most threads alive at once.
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+
+from dandere2x.dandere2xlib.utils.session_executor import SessionExecutor
+
+
+def delete_files(files: list):
+    for file in files:
+        os.remove(file)
+
+
+def make_frames(directory: str, frame_count: int, files_per_frame: int) -> list:
+    frames = []
+    for x in range(frame_count):
+        files = [os.path.join(directory, "%d_%d" % (x, y)) for y in range(files_per_frame)]
+        for file in files:
+            open(file, "w").close()
+        frames.append(files)
+    return frames
+
+
+def thread_per_frame(frames: list) -> int:
+    most_threads = 0
+    threads = []
+    for files in frames:
+        thread = threading.Thread(target=delete_files, args=(files,), daemon=True)
+        thread.start()
+        threads.append(thread)
+        most_threads = max(most_threads, threading.active_count())
+
+    for thread in threads:
+        thread.join()
+    return most_threads
+
+
+def executor(frames: list) -> int:
+    most_threads = 0
+    session_executor = SessionExecutor(io_workers=4, cpu_workers=2)
+    for files in frames:
+        session_executor.submit_io(delete_files, files)
+        most_threads = max(most_threads, threading.active_count())
+
+    session_executor.shutdown()
+    return most_threads
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-f", "--frames", type=int, default=2000)
+    parser.add_argument("-n", "--files", type=int, default=7, help="files deleted per frame")
+    args = parser.parse_args()
+
+    print("%d frames, %d files deleted per frame" % (args.frames, args.files))
+    print("%-18s %10s %14s" % ("deletes on", "seconds", "most threads"))
+
+    for name, method in [("thread per frame", thread_per_frame), ("executor", executor)]:
+        with tempfile.TemporaryDirectory() as directory:
+            frames = make_frames(directory, args.frames, args.files)
+            start = time.perf_counter()
+            most_threads = method(frames)
+            print("%-18s %10.3f %14d" % (name, time.perf_counter() - start, most_threads))
+
+
+if __name__ == "__main__":
+    main()
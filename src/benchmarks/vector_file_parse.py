@@ -0,0 +1,95 @@
+"""
+Benchmark: parse time per frame of dandere2x_cpp's vector files, text vs binary format.
+
+Usage (from the src directory):
+    python -m benchmarks.vector_file_parse -W 3840 -H 2160 -b 30 -f 200
+
+A 4K frame with block_size 30 is a 128x72 block grid. Every block gets a pframe vector (the worst case for pframe
+files) and a random fraction of them (-r) a residual vector. The 'text' column is the previous path (split the file
+on newlines, then int() every token as the residual plugins do), the 'binary' column loads the same vectors with
+get_vectors_from_file_and_wait. Both are read twice per frame, as Residual and Merge each read them.
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from dandere2x.dandere2xlib.utils.dandere2x_utils import get_list_from_file_and_wait
+from dandere2x.dandere2xlib.utils.vector_utils import get_vectors_from_file_and_wait, write_vector_file
+
+
+def make_vectors(width: int, height: int, block_size: int, residual_ratio: float, random: np.random.RandomState):
+    blocks_wide, blocks_high = width // block_size, height // block_size
+    block_x, block_y = np.meshgrid(np.arange(blocks_wide) * block_size, np.arange(blocks_high) * block_size)
+    block_x, block_y = block_x.ravel(), block_y.ravel()
+
+    offsets = random.randint(-8, 9, size=(2, len(block_x)))
+    pframe = np.stack([block_x, block_y, block_x + offsets[0], block_y + offsets[1]], axis=1).ravel()
+
+    residual_count = int(len(block_x) * residual_ratio)
+    chosen = random.choice(len(block_x), residual_count, replace=False)
+    slots = np.arange(residual_count)
+    slots_wide = int(np.sqrt(residual_count) + 1)
+    residual = np.stack([block_x[chosen], block_y[chosen], slots % slots_wide, slots // slots_wide], axis=1).ravel()
+
+    return pframe, residual
+
+
+def parse_text(vector_file: str) -> list:
+    text_list = get_list_from_file_and_wait(vector_file)
+    return [int(value) for value in text_list[:len(text_list) - 1]]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-W", "--width", dest="width", type=int, default=3840)
+    parser.add_argument("-H", "--height", dest="height", type=int, default=2160)
+    parser.add_argument("-b", "--block_size", dest="block_size", type=int, default=30)
+    parser.add_argument("-r", "--residual_ratio", dest="residual_ratio", type=float, default=0.25)
+    parser.add_argument("-f", "--frames", dest="frames", type=int, default=200)
+    args = parser.parse_args()
+
+    random = np.random.RandomState(0)
+    workspace = tempfile.mkdtemp()
+
+    frame_files = []
+    for frame in range(args.frames):
+        pframe, residual = make_vectors(args.width, args.height, args.block_size, args.residual_ratio, random)
+        files = {}
+        for binary in (False, True):
+            for name, values in (("pframe", pframe), ("residual", residual)):
+                vector_file = os.path.join(workspace, "%s_%d.%s" % (name, frame, "bin" if binary else "txt"))
+                write_vector_file(vector_file, values, binary=binary)
+                files.setdefault(binary, []).append(vector_file)
+        frame_files.append(files)
+
+    results = {}
+    for binary, parse in ((False, parse_text), (True, get_vectors_from_file_and_wait)):
+        start = time.perf_counter()
+        for files in frame_files:
+            # read twice, once for Residual and once for Merge.
+            for _ in range(2):
+                for vector_file in files[binary]:
+                    parse(vector_file)
+        results[binary] = (time.perf_counter() - start) / args.frames
+
+    text_size = sum(os.path.getsize(vector_file) for vector_file in frame_files[0][False])
+    binary_size = sum(os.path.getsize(vector_file) for vector_file in frame_files[0][True])
+
+    print("grid: %dx%d blocks, %d frames" % (args.width // args.block_size, args.height // args.block_size,
+                                             args.frames))
+    print("format,ms_per_frame,bytes_per_frame")
+    print("text,%.3f,%d" % (results[False] * 1000, text_size))
+    print("binary,%.3f,%d" % (results[True] * 1000, binary_size))
+    print("binary parses %.1fx faster" % (results[False] / results[True]))
+
+    for files in frame_files:
+        for vector_file in files[False] + files[True]:
+            os.remove(vector_file)
+    os.rmdir(workspace)
+
+
+if __name__ == "__main__":
+    main()
@@ -7,18 +7,24 @@ from typing import Type
 
 from dandere2x.dandere2x_service_request import Dandere2xServiceRequest, UpscalingEngineType
 from dandere2x.dandere2x_logger import set_dandere2x_logger
+from dandere2x.dandere2x_service.core.block_matcher.block_matcher import BlockMatcher
 from dandere2x.dandere2x_service.core.dandere2x_cpp import Dandere2xCppWrapper
 from dandere2x.dandere2x_service.core.merge import Merge
 from dandere2x.dandere2x_service.core.min_disk_usage import MinDiskUsage
 from dandere2x.dandere2x_service.core.residual import Residual
 from dandere2x.dandere2x_service.core.status_thread import Status
+from dandere2x.dandere2x_service.core.vector_store import VectorStore
 from dandere2x.dandere2x_service.core.waifu2x.abstract_upscaler import AbstractUpscaler
 from dandere2x.dandere2x_service.core.waifu2x.waifu2x_caffe import Waifu2xCaffe
 from dandere2x.dandere2x_service.core.waifu2x.waifu2x_converter_cpp import Waifu2xConverterCpp
 from dandere2x.dandere2x_service.core.waifu2x.waifu2x_ncnn_vulkan import Waifu2xNCNNVulkan
 from dandere2x.dandere2x_service.dandere2x_service_context import Dandere2xServiceContext
 from dandere2x.dandere2x_service.dandere2x_service_controller import Dandere2xController
+from dandere2x.dandere2xlib.utils.channel import Channel
 from dandere2x.dandere2xlib.utils.dandere2x_utils import file_exists
+from dandere2x.dandere2xlib.utils.session_executor import SessionExecutor
+from dandere2x.dandere2xlib.wrappers.ffmpeg.pipe_thread import Pipe
+from dandere2x.dandere2xlib.wrappers.frame.frame import Frame
 
 
 class Dandere2xServiceThread(threading.Thread):
@@ -42,18 +48,36 @@ class Dandere2xServiceThread(threading.Thread):
         # Class Specific
         self.context = Dandere2xServiceContext(service_request)
         self.controller = Dandere2xController()
+        if self.context.vector_storage == "pipe":
+            self.controller.vector_stream = VectorStore.create_stream(self.context)
+            self.controller.cancellation_token.add_callback(self.controller.vector_stream.close)
+        self.controller.executor = SessionExecutor(self.context.executor_io_workers,
+                                                   self.context.executor_cpu_workers + self.context.pipe_encoders,
+                                                   name=service_request.name,
+                                                   wait_workers=self.context.executor_wait_workers)
+        self.controller.cancellation_token.add_callback(
+            lambda: self.controller.executor.shutdown(wait=False, cancel_pending=True))
         self.threads_active = False
 
-        # Child-threads
+        # Child-threads. Merge hands merged frames to the ffmpeg pipe through a bounded channel (see channel.py), the
+        # rest wait on each other's files in the workspace.
         self.min_disk_demon = MinDiskUsage(self.context, self.controller)
         self.status_thread = Status(self.context, self.controller)
-        self.dandere2x_cpp_thread = Dandere2xCppWrapper(self.context, self.controller)
+        if self.context.block_matcher == "numpy":
+            self.dandere2x_cpp_thread = BlockMatcher(self.context, self.controller)
+        else:
+            self.dandere2x_cpp_thread = Dandere2xCppWrapper(self.context, self.controller,
+                                                            instances=self.context.dandere2x_cpp_instances)
 
         selected_waifu2x = self._get_upscale_engine(service_request.upscale_engine)
         self.waifu2x = selected_waifu2x(context=self.context, controller=self.controller)
 
         self.residual_thread = Residual(self.context, self.controller)
-        self.merge_thread = Merge(context=self.context, controller=self.controller)
+        self.merged_frames = Channel("merged frames", Frame, self.context.merged_frames_buffer,
+                                     self.controller.cancellation_token)
+        self.merge_thread = Merge(self.context, self.controller, self.merged_frames)
+        self.pipe_thread = Pipe(self.context.service_request.output_file, self.context, self.controller,
+                                self.merged_frames)
 
     def run(self):
         """
@@ -71,19 +95,51 @@ class Dandere2xServiceThread(threading.Thread):
         self.min_disk_demon.extract_initial_frames()
         self.__upscale_first_frame()
 
-        self.min_disk_demon.start()
-        self.dandere2x_cpp_thread.start()
-        self.merge_thread.start()
-        self.residual_thread.start()
-        self.waifu2x.start()
-        self.status_thread.start()
-
-        self.min_disk_demon.join()
-        self.dandere2x_cpp_thread.join()
-        self.merge_thread.join()
-        self.residual_thread.join()
-        self.waifu2x.join()
-        self.status_thread.join()
+        self._run_child_threads()
+
+    def _run_child_threads(self):
+        """
+        Start every child-thread (applying it's stage's resource policy), and wait for them all to stop. If one of
+        them failed the session, raises SessionFailedError once they all have.
+        """
+        child_threads = self.__get_child_threads()
+        for stage, thread in child_threads:
+            thread.start()
+            # Thread.start() only returns once the thread's running, so it's native_id is set.
+            self.context.resource_policy.stage(stage).apply_to_thread(thread.native_id, "stage " + stage)
+
+        for _, thread in child_threads:
+            thread.join()
+        self.controller.executor.shutdown()
+        self.log.info(self.merged_frames.describe())
+
+        if self.controller.get_failure() is not None:
+            self.log.error("Session failed, stopped every thread: %s" % str(self.controller.get_failure()))
+            self.controller.raise_if_failed()
+        elif self.controller.is_killed():
+            self.log.info("Session killed, stopped every thread.")
+
+    def __get_child_threads(self) -> list:
+        """ Every child-thread, with the stage it's resource policy is under (see resource_policy.py). """
+        return [("extract", self.min_disk_demon), ("match", self.dandere2x_cpp_thread),
+                ("residual", self.residual_thread), ("upscale", self.waifu2x), ("merge", self.merge_thread),
+                ("encode", self.pipe_thread), ("status", self.status_thread)]
+
+    def join(self, timeout=None):
+        """
+        Wait for the session to finish. A session that failed raises SessionFailedError here too, as an exception out
+        of run() wouldn't get past the thread otherwise.
+        """
+        super().join(timeout)
+        if not self.is_alive():
+            self.controller.raise_if_failed()
+
+    def kill(self):
+        """
+        Stop the session - every child-thread unwinds and every subprocess (dandere2x_cpp, waifu2x, ffmpeg) is killed.
+        """
+        self.log.info("Kill called.")
+        self.controller.kill()
 
     # todo, remove this dependency.
     def _get_upscale_engine(self, selected_engine: UpscalingEngineType) -> Type[AbstractUpscaler]:
@@ -0,0 +1,94 @@
+import logging
+import threading
+import time
+
+from dandere2x.dandere2x_service.core.block_matcher.pframe import draw_over, match_blocks, pframe_vectors, \
+    residual_vectors, seed_offsets
+from dandere2x.dandere2x_service.core.vector_store import VectorStore
+from dandere2x.dandere2x_service.dandere2x_service_context import Dandere2xServiceContext
+from dandere2x.dandere2x_service.dandere2x_service_controller import Dandere2xController
+from dandere2x.dandere2xlib.utils.scene_cuts import is_scene_cut
+from dandere2x.dandere2xlib.utils.thread_utils import cancel_on_error
+from dandere2x.dandere2xlib.utils.vector_stream import RECORD_TYPES
+from dandere2x.dandere2xlib.wrappers.frame.frame import Frame
+
+
+class BlockMatcher(threading.Thread):
+    """
+    An in-process alternative to Dandere2xCppWrapper (selected with context.block_matcher = "numpy"), computing
+    each frame's pframe and residual vectors with numpy rather than dandere2x_cpp, and saving them to the same
+    place dandere2x_cpp would.
+
+    Only the PFrame plugin is ported - fade and correction vectors are saved empty, which merge.py doesn't apply
+    anyways.
+    """
+
+    def __init__(self, context: Dandere2xServiceContext, controller: Dandere2xController):
+        threading.Thread.__init__(self, name="BlockMatcher")
+        self.context = context
+        self.controller = controller
+        self.log = logging.getLogger()
+
+        self.block_size = self.context.service_request.block_size
+        self.vectors = VectorStore(context, controller)
+
+    def join(self, timeout=None):
+        self.log.info("Thread joined")
+        threading.Thread.join(self, timeout)
+
+    @cancel_on_error
+    def run(self):
+        logger = logging.getLogger(__name__)
+
+        frame_previous = Frame()
+        frame_previous.load_from_string_controller(self.context.input_frames_dir + "frame" + str(1) + ".jpg",
+                                                   self.controller)
+
+        seeds = None
+        for x in range(1, self.context.frame_count):
+            frame_start = time.time()
+
+            frame_next = Frame()
+            frame_next.load_from_string_controller(self.context.input_frames_dir + "frame" + str(x + 1) + ".jpg",
+                                                   self.controller)
+
+            # Nothing carries over a hard cut, so don't bother searching, the whole frame is a residual.
+            if is_scene_cut(self.context.scene_cuts_dir, x + 1):
+                for data_type in ["residual", "pframe", "fade", "correction"]:
+                    self.vectors.save(data_type, x, [])
+
+                logger.debug("Frame %d is a scene cut, skipped matching" % x)
+                frame_previous = frame_next
+                seeds = None
+                continue
+
+            frame_compressed = Frame()
+            frame_compressed.load_from_string_controller(
+                self.context.compressed_static_dir + "compressed_" + str(x + 1) + ".jpg", self.controller)
+
+            positions, ends, matched = match_blocks(frame_previous.frame, frame_next.frame, frame_compressed.frame,
+                                                    self.block_size, self.context.step_size, seeds=seeds,
+                                                    search=self.context.block_search)
+            draw_over(frame_previous.frame, frame_next.frame, positions, ends, matched, self.block_size)
+
+            # If nothing matched, empty vectors signal merge.py to upscale the entire frame.
+            if matched.any():
+                self.vectors.save("residual", x, residual_vectors(positions, matched))
+                self.vectors.save("pframe", x, pframe_vectors(positions, ends, matched))
+            else:
+                self.vectors.save("residual", x, [])
+                self.vectors.save("pframe", x, [])
+
+            self.vectors.save("fade", x, [])
+            self.vectors.save("correction", x, [])
+
+            logger.debug("Matched %d of %d blocks for frame %d in %f seconds" %
+                         (matched.sum(), len(matched), x, time.time() - frame_start))
+
+            frame_previous = frame_next
+            if self.context.temporal_seeding:
+                seeds = seed_offsets(positions, ends, matched)
+
+        self.vectors.close()
+        if self.controller.vector_stream:
+            self.controller.vector_stream.close(RECORD_TYPES.values())
@@ -0,0 +1,87 @@
+"""
+dandere2x_cpp's 'super' diamond search (DiamondSearch.h), run for every block that needs searching at once - each
+iteration checks the diamond points of every block still searching in a single vectorized pass.
+"""
+import numpy as np
+
+from dandere2x.dandere2xlib.metrics.block_metrics import block_mse
+
+# A block found within this MSE ends the search early.
+MIN_MSE = 1000
+
+# The 16 points checked around the origin, as multiples of (step_size, step_size / 2), in DiamondSearch.h's order.
+# The order matters - ties between points go to the first one, as std::min_element's do.
+DIAMOND_STEPS = np.array([[1, 0], [0, 0], [0, 1], [0, 0], [-1, 0], [0, 0], [1, 0], [0, 0],
+                          [2, 0], [1, 1], [0, 2], [-1, 1], [-2, 0], [1, -1], [2, 0], [-1, -1]])
+DIAMOND_HALF_STEPS = np.array([[0, 0], [1, 1], [0, 0], [-1, 1], [0, 0], [1, -1], [0, 0], [0, 0],
+                               [0, 0], [0, 0], [0, 0], [0, 0], [0, 0], [0, 0], [0, 0], [0, 0]])
+
+
+def diamond_search(desired_image: np.ndarray, input_image: np.ndarray, positions: np.ndarray,
+                   block_size: int, step_size: int, max_checks: int = 128, min_mse: float = MIN_MSE):
+    """
+    Search input_image for each of desired_image's blocks at 'positions', starting at the block's own position.
+
+    Returns (ends, found): where each block was found in input_image, and whether the search found it at all.
+    """
+    height, width = desired_image.shape[:2]
+
+    origins = positions.copy()
+    ends = positions.copy()
+    steps = np.full(len(positions), step_size)
+    found = np.zeros(len(positions), dtype=bool)
+    searching = np.arange(len(positions))
+
+    for check in range(max_checks):
+        if not len(searching):
+            break
+
+        # Out of checks (or the step size is down to nothing), so settle on where the search is at.
+        settled = (steps[searching] <= 0) | (check == max_checks - 1)
+        ends[searching[settled]] = origins[searching[settled]]
+        found[searching[settled]] = True
+        searching = searching[~settled]
+        if not len(searching):
+            break
+
+        step = steps[searching][:, None, None]
+        points = origins[searching][:, None, :] + DIAMOND_STEPS * step + DIAMOND_HALF_STEPS * (step // 2)
+
+        legal = (points[:, :, 0] >= 0) & (points[:, :, 1] >= 0) & \
+                (points[:, :, 0] + block_size <= width) & (points[:, :, 1] + block_size <= height)
+
+        # No legal points to go to, the search failed.
+        stuck = ~legal.any(axis=1)
+        searching = searching[~stuck]
+        points, legal = points[~stuck], legal[~stuck]
+
+        # DiamondSearch.h's flag array is initialized as {true}, so it never checks the first point. It's a repeat
+        # of the seventh point, which it does check.
+        legal[:, 0] = False
+
+        mse = np.full(legal.shape, np.inf)
+        block, point = np.nonzero(legal)
+        mse[block, point] = block_mse(desired_image, positions[searching[block]],
+                                      input_image, points[block, point], block_size)
+
+        best = np.argmin(mse, axis=1)
+        best_mse = mse[np.arange(len(best)), best]
+        best_points = points[np.arange(len(best)), best]
+
+        # Good enough, stop here.
+        done = best_mse <= min_mse
+        ends[searching[done]] = best_points[done]
+        found[searching[done]] = True
+
+        # Far worse than good enough, give up.
+        abandoned = ~done & (best_mse >= min_mse * min_mse)
+
+        # If the origin is still the best point, narrow the search, otherwise move to the best point.
+        continuing = ~done & ~abandoned
+        stayed = continuing & (best_points == origins[searching]).all(axis=1)
+        steps[searching[stayed]] //= 2
+        origins[searching[continuing]] = best_points[continuing]
+
+        searching = searching[continuing]
+
+    return ends, found
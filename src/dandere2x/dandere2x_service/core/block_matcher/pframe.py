@@ -0,0 +1,156 @@
+"""
+The numpy counter-part of dandere2x_cpp's PFrame plugin (and the Residual class it uses) - find which blocks of the
+next frame can be taken from the previous frame, and which blocks need to be upscaled as residuals.
+"""
+import numpy as np
+
+from dandere2x.dandere2x_service.core.block_matcher.diamond_search import MIN_MSE, diamond_search
+from dandere2x.dandere2x_service.core.block_matcher.pyramid_search import pyramid_search
+from dandere2x.dandere2xlib.metrics.block_metrics import block_mse, block_ssim_mse, get_blocks, \
+    moving_block_ssim_mse, psnr
+from dandere2x.dandere2xlib.metrics.frame_metrics import frame_block_ssim_mse
+
+
+def get_block_positions(width: int, height: int, block_size: int) -> np.ndarray:
+    """ The top-left pixel of every block in a frame, in dandere2x_cpp's order (x-major, then y). """
+    block_x, block_y = np.meshgrid(np.arange(width // block_size), np.arange(height // block_size), indexing="ij")
+    return np.stack([block_x.ravel(), block_y.ravel()], axis=1) * block_size
+
+
+def match_blocks(image_previous: np.ndarray, image_next: np.ndarray, image_compressed: np.ndarray,
+                 block_size: int, step_size: int, max_checks: int = 128, seeds: np.ndarray = None,
+                 search: str = "diamond"):
+    """
+    Match every block of image_next to a block of image_previous, as PFrame::match_block does:
+
+        - A block's quality threshold is how well image_compressed (the frame re-compressed as a jpeg) scores against
+          image_next, so a match has to be at least as good as a lossy compression of the block.
+        - If the block in the same position meets the threshold, the block is stationary.
+        - Otherwise diamond search for it, and accept it if the block found meets the threshold.
+
+    If 'seeds' (see seed_offsets) is given, blocks try moving as they (or their neighbours) did in the previous
+    frame before being diamond searched, as PFrame::match_block_from_seeds does.
+
+    With search = "pyramid", blocks are searched for with pyramid_search rather than diamond search, and the blocks
+    it finds are judged by moving_block_ssim_mse - the block against the block it'll be copied from in merge.py.
+
+    Returns (positions, ends, matched) - for every block, where it's found in image_previous, and if it matched.
+    """
+    height, width = image_next.shape[:2]
+    positions = get_block_positions(width, height, block_size)
+    ends = positions.copy()
+    matched = np.zeros(len(positions), dtype=bool)
+
+    # If the frames are wildly different, don't bother trying to match blocks, they probably won't match anyways.
+    if psnr(image_previous, image_next) < 10:
+        return positions, ends, matched
+
+    threshold = frame_block_ssim_mse(image_next, image_compressed, block_size).T.ravel()
+    stationary = frame_block_ssim_mse(image_previous, image_next, block_size).T.ravel()
+    matched[:] = stationary >= threshold
+
+    if seeds is not None:
+        match_from_seeds(image_previous, image_next, positions, ends, matched, threshold, seeds, block_size)
+
+    searched = np.nonzero(~matched)[0]
+
+    if search == "pyramid":
+        search_ends = pyramid_search(image_next, image_previous, positions[searched], block_size)
+
+        moved = (search_ends != positions[searched]).any(axis=1)
+        searched, search_ends = searched[moved], search_ends[moved]
+
+        scores = moving_block_ssim_mse(image_next, positions[searched], image_previous, search_ends, block_size)
+    else:
+        search_ends, found = diamond_search(image_next, image_previous, positions[searched],
+                                            block_size, step_size, max_checks)
+
+        # Note dandere2x_cpp only accepts moving blocks that moved along both axis.
+        moved = found & (search_ends != positions[searched]).all(axis=1)
+        searched, search_ends = searched[moved], search_ends[moved]
+
+        scores = block_ssim_mse(image_previous, positions[searched], image_next, search_ends, block_size)
+
+    accepted = scores >= threshold[searched]
+
+    ends[searched[accepted]] = search_ends[accepted]
+    matched[searched[accepted]] = True
+
+    return positions, ends, matched
+
+
+def match_from_seeds(image_previous: np.ndarray, image_next: np.ndarray, positions: np.ndarray, ends: np.ndarray,
+                     matched: np.ndarray, threshold: np.ndarray, seeds: np.ndarray, block_size: int) -> None:
+    """
+    Try moving every unmatched block the way it, then it's left, right, top and bottom neighbours, moved in the
+    previous frame. In a pan (or anything moving steadily) blocks keep moving the same way, so this usually finds the
+    block in one or two MSE evaluations, rather than a full diamond search.
+
+    A seed is used if it's within MIN_MSE (where diamond search would stop too), and meets the block's threshold.
+    Blocks it's used for are marked in 'ends' and 'matched'.
+    """
+    height, width = image_next.shape[:2]
+    blocks_wide, blocks_high = width // block_size, height // block_size
+
+    grid = np.pad(seeds.reshape(blocks_wide, blocks_high, 2), ((1, 1), (1, 1), (0, 0)))
+    neighbours = [grid[1:-1, 1:-1], grid[:-2, 1:-1], grid[2:, 1:-1], grid[1:-1, :-2], grid[1:-1, 2:]]
+
+    for neighbour in neighbours:
+        blocks = np.nonzero(~matched)[0]
+        offsets = neighbour.reshape(-1, 2)[blocks]
+        seed_ends = positions[blocks] + offsets
+
+        # Blocks only get accepted as moving if they moved along both axis (see match_blocks).
+        usable = (offsets != 0).all(axis=1) & (seed_ends >= 0).all(axis=1) & \
+                 (seed_ends[:, 0] + block_size <= width) & (seed_ends[:, 1] + block_size <= height)
+        blocks, seed_ends = blocks[usable], seed_ends[usable]
+
+        close = block_mse(image_next, positions[blocks], image_previous, seed_ends, block_size) <= MIN_MSE
+        blocks, seed_ends = blocks[close], seed_ends[close]
+
+        scores = block_ssim_mse(image_previous, positions[blocks], image_next, seed_ends, block_size)
+        accepted = scores >= threshold[blocks]
+
+        ends[blocks[accepted]] = seed_ends[accepted]
+        matched[blocks[accepted]] = True
+
+
+def seed_offsets(positions: np.ndarray, ends: np.ndarray, matched: np.ndarray) -> np.ndarray:
+    """ How far every block moved (0, 0 if it didn't match), to seed the next frame's match_blocks with. """
+    return np.where(matched[:, None], ends - positions, 0)
+
+
+def draw_over(image_previous: np.ndarray, image_next: np.ndarray,
+              positions: np.ndarray, ends: np.ndarray, matched: np.ndarray, block_size: int) -> None:
+    """
+    Draw every matched block from image_previous over image_next, so errors carry over between frames (as they will
+    in merge.py), and image_next is matched against as it'll actually look.
+    """
+    height, width = image_next.shape[:2]
+    blocks_high, blocks_wide = height // block_size, width // block_size
+
+    grid = image_next[:blocks_high * block_size, :blocks_wide * block_size] \
+        .reshape(blocks_high, block_size, blocks_wide, block_size, 3)
+
+    blocks = get_blocks(image_previous, ends[matched], block_size).transpose(0, 2, 3, 1)
+    grid[positions[matched, 1] // block_size, :, positions[matched, 0] // block_size] = blocks
+
+
+def pframe_vectors(positions: np.ndarray, ends: np.ndarray, matched: np.ndarray) -> np.ndarray:
+    """ The pframe vectors of every matched block, (x_start, y_start, x_end, y_end) each. """
+    return np.concatenate([positions[matched], ends[matched]], axis=1).astype(np.int32).ravel()
+
+
+def residual_vectors(positions: np.ndarray, matched: np.ndarray) -> np.ndarray:
+    """
+    The residual vectors of every unmatched block - where the block is in the frame, and which (x, y) slot of the
+    residual image it goes in. Slots are handed out as dandere2x_cpp's ResidualBlocks does, which skips slot (0, 0).
+    """
+    missing = positions[~matched]
+    dimensions = int(np.sqrt(len(missing))) + 1
+
+    # The first row holds slots 1 to dimensions - 1, every row after it dimensions slots.
+    slots = np.arange(len(missing)) + 1
+    slot_x, slot_y = slots % dimensions, slots // dimensions
+
+    return np.stack([missing[:, 0], missing[:, 1], slot_x, slot_y], axis=1).astype(np.int32).ravel()
@@ -0,0 +1,78 @@
+"""
+Coarse-to-fine (pyramid) block search, for motion too large for diamond search's small steps to find.
+
+Blocks are searched exhaustively around their position on frames downsampled 'levels' times (1/4 of the size with
+the default 2 levels), where a small search range covers a large displacement cheaply. Each level up, the best
+displacement so far is doubled and refined around, ending at full resolution.
+"""
+import numpy as np
+
+from dandere2x.dandere2xlib.metrics.block_metrics import block_mse
+
+
+def downsample(image: np.ndarray) -> np.ndarray:
+    """ Halve an image's size, averaging every 2x2 pixels. """
+    height, width = image.shape[0] // 2, image.shape[1] // 2
+    pixels = image[:height * 2, :width * 2].reshape(height, 2, width, 2, 3).sum(axis=(1, 3), dtype=np.uint16)
+    return ((pixels + 2) // 4).astype(np.uint8)
+
+
+def pyramid_search(desired_image: np.ndarray, input_image: np.ndarray, positions: np.ndarray,
+                   block_size: int, levels: int = 2, search_range: int = 8) -> np.ndarray:
+    """
+    Search input_image for each of desired_image's blocks at 'positions'. The coarsest level is searched within
+    +/- search_range pixels (so +/- search_range * 2 ** levels pixels at full resolution), every finer level within
+    +/- 1 pixel of the previous level's best.
+
+    Returns where each block was found in input_image.
+    """
+    desired_pyramid, input_pyramid = [desired_image], [input_image]
+    for _ in range(levels):
+        desired_pyramid.append(downsample(desired_pyramid[-1]))
+        input_pyramid.append(downsample(input_pyramid[-1]))
+
+    displacements = np.zeros_like(positions)
+
+    for level in range(levels, -1, -1):
+        level_desired, level_input = desired_pyramid[level], input_pyramid[level]
+        height, width = level_desired.shape[:2]
+
+        level_block_size = max(block_size >> level, 1)
+        level_positions = np.minimum(positions >> level, [width - level_block_size, height - level_block_size])
+
+        radius = search_range if level == levels else 1
+        displacements = displacements * 2 if level != levels else displacements
+        displacements = _search(level_desired, level_input, level_positions, displacements, level_block_size,
+                                radius)
+
+    return positions + displacements
+
+
+def _search(desired_image: np.ndarray, input_image: np.ndarray, positions: np.ndarray, displacements: np.ndarray,
+            block_size: int, radius: int) -> np.ndarray:
+    """ Exhaustively search within 'radius' of each block's displacement, returning the best displacements. """
+    height, width = desired_image.shape[:2]
+
+    # Staying put is checked first, so ties don't move blocks for nothing.
+    offsets = [(0, 0)] + [(x, y) for y in range(-radius, radius + 1) for x in range(-radius, radius + 1)
+                          if (x, y) != (0, 0)]
+
+    best = displacements.copy()
+    best_mse = np.full(len(positions), np.inf)
+
+    for offset in offsets:
+        candidates = displacements + offset
+        ends = positions + candidates
+
+        legal = (ends >= 0).all(axis=1) & (ends[:, 0] + block_size <= width) & (ends[:, 1] + block_size <= height)
+        blocks = np.nonzero(legal)[0]
+
+        mse = block_mse(desired_image, positions[blocks], input_image, ends[blocks], block_size)
+        better = mse < best_mse[blocks]
+
+        best[blocks[better]] = candidates[blocks[better]]
+        best_mse[blocks[better]] = mse[better]
+
+    # Nowhere legal to go (the displacement from the coarser level doesn't fit at this one), so stay put.
+    best[np.isinf(best_mse)] = 0
+    return best
@@ -18,53 +18,162 @@ Purpose: Simply put, very expensive computations for Dandere2x are
 import logging
 import subprocess
 import threading
+from collections import deque
 
+from dandere2x.dandere2x_service.core.vector_store import VectorStore
 from dandere2x.dandere2x_service.dandere2x_service_context import Dandere2xServiceContext
 from dandere2x.dandere2x_service.dandere2x_service_controller import Dandere2xController
+from dandere2x.dandere2xlib.utils.process_supervisor import get_process_supervisor
+from dandere2x.dandere2xlib.utils.thread_utils import cancel_on_error
+from dandere2x.dandere2xlib.utils.vector_stream import RECORD_TYPES, iter_records
 from dandere2x.dandere2xlib.utils.yaml_utils import load_executable_paths_yaml
 
 
 class Dandere2xCppWrapper(threading.Thread):
     """
     A wrapper for the dandere2x_cpp module. It simply calls the module using information used from the context.
+
+    If 'instances' (context.dandere2x_cpp_instances by default) is above 1, frames are instead split into ranges, and
+    each range is matched by it's own dandere2x_cpp instance (see run_ranges).
     """
 
-    def __init__(self, context: Dandere2xServiceContext, controller: Dandere2xController):
+    def __init__(self, context: Dandere2xServiceContext, controller: Dandere2xController, instances: int = None):
         threading.Thread.__init__(self, name="Dandere2xCpp")
         self.context = context
         self.controller = controller
+        self.instances = instances if instances is not None else context.dandere2x_cpp_instances
 
         self.dandere2x_cpp_subprocess = None
         self.log = logging.getLogger()
 
-        dandere2x_cpp_dir = load_executable_paths_yaml()['dandere2x_cpp']
-        self.exec_command = [dandere2x_cpp_dir,
-                             self.context.service_request.workspace,
-                             str(self.context.frame_count),
-                             str(self.context.service_request.block_size),
-                             str(self.context.step_size),
-                             "r",
-                             str(1),
-                             ".jpg"]
+        self.dandere2x_cpp_dir = load_executable_paths_yaml()['dandere2x_cpp']
+        self.policy = context.resource_policy.process("dandere2x_cpp")
+        self.exec_command = self.get_exec_command(1, self.context.frame_count, self.context.vector_storage)
+
+    def get_exec_command(self, resume_frame: int, frame_count: int, vector_storage: str) -> list:
+        return [self.dandere2x_cpp_dir,
+                self.context.service_request.workspace,
+                str(frame_count),
+                str(self.context.service_request.block_size),
+                str(self.context.step_size),
+                "r",
+                str(resume_frame),
+                ".jpg",
+                self.context.vector_format,
+                vector_storage,
+                str(int(self.context.temporal_seeding))]
+
+    def get_ranges(self) -> list:
+        """ Split the frames dandere2x_cpp computes vectors for, [1, frame_count), into [start, end) ranges. """
+        range_size = self.context.dandere2x_cpp_range_size
+        return [(start, min(start + range_size, self.context.frame_count))
+                for start in range(1, self.context.frame_count, range_size)]
 
     def join(self, timeout=None):
         self.log.info("Thread joined")
         threading.Thread.join(self, timeout)
 
+    @cancel_on_error
     def run(self):
+        if self.instances > 1:
+            self.run_ranges()
+            return
+
         logger = logging.getLogger(__name__)
         logger.info(self.exec_command)
 
         console_output = open(self.context.log_dir + "dandere2x_cpp.txt", "w")
         console_output.write(str(self.exec_command))
-        self.dandere2x_cpp_subprocess = subprocess.Popen(self.exec_command, shell=False, stderr=console_output,
-                                                         stdout=console_output)
 
-        self.dandere2x_cpp_subprocess.wait()
+        if self.context.vector_storage == "pipe":
+            # dandere2x_cpp streams vectors over stdout (logging to stderr instead), which this thread demultiplexes
+            # into the controller's vector stream until dandere2x_cpp exits.
+            self.dandere2x_cpp_subprocess = subprocess.Popen(self.exec_command, shell=False, stderr=console_output,
+                                                             stdout=subprocess.PIPE)
+            self.controller.cancellation_token.register_process(self.dandere2x_cpp_subprocess)
+            self.policy.apply_to_process(self.dandere2x_cpp_subprocess.pid, "dandere2x_cpp")
+            self.controller.vector_stream.read_records(self.dandere2x_cpp_subprocess.stdout)
+            returncode = self.dandere2x_cpp_subprocess.wait()
+        else:
+            returncode = get_process_supervisor().run(self.exec_command, token=self.controller.cancellation_token,
+                                                      output=console_output, name="dandere2x_cpp",
+                                                      policy=self.policy).returncode
 
-        if self.dandere2x_cpp_subprocess.returncode == 0:
+        if returncode == 0:
             logger.info("D2xcpp finished correctly.")
-        elif self.dandere2x_cpp_subprocess.returncode != 0:
+        elif returncode != 0:
+            logger.error("D2xcpp ended unexpectedly.")
+            logger.error("Dandere2x will stop the current session.")
+            self.controller.fail("D2xcpp ended unexpectedly.")
+            raise Exception
+
+    def run_ranges(self):
+        """
+        Block matching frame x to x + 1 only needs those two frames, so frames are split into ranges of
+        context.dandere2x_cpp_range_size frames, and up to 'instances' dandere2x_cpp instances match ranges at
+        once. Each instance resumes ("r") at it's range's first frame and stops at it's last, so
+        the first frame of every range is upscaled in full, as when resuming a session.
+
+        Ranges are started in order, and a new range only starts once the oldest running one finishes, so the
+        instances running are always matching the frames merge.py needs next. A range also only starts once
+        min_disk_usage.py has extracted the frame it resumes from (see Dandere2xController.wait_for_extracted), as
+        resuming loads that frame straight away.
+
+        Every instance streams it's vectors over stdout, which this thread saves wherever context.vector_storage
+        says, so instances never write to the same files (or journals) at once.
+        """
+        logger = logging.getLogger(__name__)
+
+        vectors = VectorStore(self.context, self.controller)
+        vectors_lock = threading.Lock()
+        running = deque()
+
+        try:
+            for start, end in self.get_ranges():
+                if len(running) >= self.instances:
+                    self.__wait_on_range(*running.popleft())
+
+                # resuming at 'start' loads frame start + 1 as the frame to match the next frames against.
+                if not self.controller.wait_for_extracted(start + 1):
+                    return
+
+                exec_command = self.get_exec_command(start, end, "pipe")
+                logger.info(exec_command)
+
+                console_output = open(self.context.log_dir + "dandere2x_cpp_" + str(start) + ".txt", "w")
+                console_output.write(str(exec_command))
+
+                process = subprocess.Popen(exec_command, shell=False, stderr=console_output, stdout=subprocess.PIPE)
+                self.controller.cancellation_token.register_process(process)
+                self.policy.apply_to_process(process.pid, "dandere2x_cpp (frames %d - %d)" % (start, end - 1))
+                reader = threading.Thread(target=self.__save_records, args=(process.stdout, vectors, vectors_lock),
+                                          name="Dandere2xCppRange" + str(start))
+                reader.start()
+                running.append((process, reader))
+
+            while running:
+                self.__wait_on_range(*running.popleft())
+
+            logger.info("D2xcpp finished correctly.")
+        finally:
+            vectors.close()
+            if self.controller.vector_stream:
+                self.controller.vector_stream.close(RECORD_TYPES.values())
+
+    @staticmethod
+    def __save_records(stream, vectors: VectorStore, vectors_lock: threading.Lock):
+        for data_type, frame, values in iter_records(stream):
+            with vectors_lock:
+                vectors.save(data_type, frame, values)
+
+    def __wait_on_range(self, process: subprocess.Popen, reader: threading.Thread):
+        logger = logging.getLogger(__name__)
+
+        reader.join()
+        process.wait()
+
+        if process.returncode != 0:
             logger.error("D2xcpp ended unexpectedly.")
             logger.error("Dandere2x will stop the current session.")
+            self.controller.fail("D2xcpp ended unexpectedly.")
             raise Exception
@@ -0,0 +1,121 @@
+"""
+How many frames min_disk_usage.py extracts ahead of the frame merge.py is on.
+
+Frames extracted ahead are what dandere2x_cpp and residual.py can run ahead on, and residual images they make are the
+upscaler's queue. So:
+
+    - If the upscaler's queue runs low, the upscaler is about to starve, extract further ahead (i.e. through a burst
+      of high motion frames, which make larger residual images and are slower to get through).
+    - If the upscaler's queue is deep, the upscaler is what's holding things up, and frames extracted further ahead
+      would only wait on disk, so extract less far ahead.
+
+Either way, frames ahead are capped to what fits in free disk space (keeping lookahead_min_free_disk free) and a
+fraction of available memory (the frames are read back right after they're written, from the page cache if they
+still fit in memory - or straight from memory on a RAM disk workspace), and kept within
+[min_frames_ahead, max_frames_ahead].
+
+min_disk_usage.py only extracts more frames every min_disk_batch_size frames merge.py gets through, and merge.py only
+gets past frame x once frame x + 2 is extracted (it's the second frame frame x + 1's vectors are matched from). So a
+batch has to end at least 2 frames short of the frames extracted ahead when it started - which, for the first batch
+(starting at frame 1, rather than at the last frame extracted for), means min_frames_ahead has to be at least
+min_disk_batch_size + 3, or min_disk_usage.py and merge.py wait on each other forever.
+"""
+import logging
+import os
+import shutil
+
+import psutil
+
+from dandere2x.dandere2x_service.dandere2x_service_context import Dandere2xServiceContext
+
+
+class Lookahead:
+    """
+    Raises ValueError if context's min_disk_batch_size doesn't fit within it's min_frames_ahead (see above).
+    """
+
+    # Below / above this many residual images waiting to be upscaled, the upscaler is starving / backed up.
+    queue_low = 4
+    queue_high = 32
+
+    # Re-measure every this many frames, as counting the queue and disk space isn't free.
+    update_interval = 10
+
+    # How many frames past the end of a batch need to be extracted for merge.py to get to the end of it (see above).
+    frames_past_batch = 3
+
+    def __init__(self, context: Dandere2xServiceContext):
+        self.context = context
+        self.log = logging.getLogger(name=context.service_request.input_file)
+
+        self.minimum = context.min_frames_ahead
+        self.maximum = max(context.max_frames_ahead, context.min_frames_ahead)
+        self.frames_ahead = min(max(context.initial_frames_ahead, self.minimum), self.maximum)
+
+        if context.min_disk_batch_size + self.frames_past_batch > self.minimum:
+            raise ValueError("min_disk_batch_size (%d) has to be at most min_frames_ahead - %d (%d), or extracting "
+                             "frames and merging them wait on each other forever" %
+                             (context.min_disk_batch_size, self.frames_past_batch,
+                              self.minimum - self.frames_past_batch))
+
+        self.frames_since_update = 0
+
+    def update(self, extracted_frame: int, frames_ahead_now: int, frames: int = 1) -> int:
+        """
+        Re-measure (every update_interval frames) and return how many frames to extract ahead.
+
+        Args:
+            extracted_frame: The last frame extracted, used to measure the size of a frame on disk.
+            frames_ahead_now: How many extracted frames are currently ahead (on disk).
+            frames: How many frames merge.py got through since the last update.
+        """
+        self.frames_since_update += frames
+        if self.frames_since_update < self.update_interval:
+            return self.frames_ahead
+        self.frames_since_update = 0
+
+        queue_depth = self.get_queue_depth()
+        frames_ahead = self.frames_ahead
+
+        if queue_depth < self.queue_low:
+            frames_ahead = frames_ahead + max(frames_ahead // 2, 1)
+        elif queue_depth > self.queue_high:
+            frames_ahead = frames_ahead - max(frames_ahead // 4, 1)
+
+        frames_ahead = min(frames_ahead, self.get_budget(extracted_frame, frames_ahead_now))
+        frames_ahead = min(max(frames_ahead, self.minimum), self.maximum)
+
+        if frames_ahead != self.frames_ahead:
+            self.log.debug("Upscaler queue at %d residual images, extracting %d frames ahead (was %d)" %
+                           (queue_depth, frames_ahead, self.frames_ahead))
+        self.frames_ahead = frames_ahead
+
+        return frames_ahead
+
+    def get_queue_depth(self) -> int:
+        """ How many residual images are waiting to be upscaled. """
+        with os.scandir(self.context.residual_images_dir) as entries:
+            return sum(1 for entry in entries if entry.name.endswith(".jpg"))
+
+    def get_budget(self, extracted_frame: int, frames_ahead_now: int) -> int:
+        """ The most frames that can be ahead, given free disk space and available memory. """
+        frame_size = self.get_frame_size(extracted_frame)
+        if not frame_size:
+            return self.maximum
+
+        # The frames already ahead are already taking up disk space, so they count towards the budget.
+        free_disk = shutil.disk_usage(self.context.service_request.workspace).free - self.context.lookahead_min_free_disk
+        disk_budget = frames_ahead_now + max(free_disk, 0) // frame_size
+
+        available_memory = psutil.virtual_memory().available * self.context.lookahead_max_memory_fraction
+        memory_budget = int(available_memory // frame_size)
+
+        return min(disk_budget, memory_budget)
+
+    def get_frame_size(self, frame: int) -> int:
+        """ The bytes an extracted frame (and it's compressed copy) take up on disk, 0 if it's gone already. """
+        try:
+            return os.path.getsize(self.context.input_frames_dir + "frame" + str(frame) + ".jpg") + \
+                os.path.getsize(self.context.compressed_static_dir + "compressed_" + str(frame) + ".jpg")
+        except OSError:
+            return 0
@@ -21,8 +21,8 @@ Purpose: This class / thread is responsible for turning 'residual'
          
          An added responsibility of this class is to directly save
          the finished images into a 'finished' (no audio migrations)
-         video, which is done by using the pipe class to pipe frames
-         into ffmpeg. 
+         video, which is done by handing frames over to the pipe class
+         (the encode stage) to pipe into ffmpeg. 
          
 Comments / Notes: This is probably the most difficult to understand
                   dandere2x method due to it's overloaded nature, 
@@ -37,11 +37,12 @@ import threading
 
 from dandere2x.dandere2x_service.dandere2x_service_context import Dandere2xServiceContext
 from dandere2x.dandere2x_service.dandere2x_service_controller import Dandere2xController
-from dandere2x.dandere2xlib.utils.dandere2x_utils import get_lexicon_value, get_list_from_file_and_wait, wait_on_file
-from dandere2x.dandere2xlib.wrappers.ffmpeg.pipe_thread import Pipe
-from dandere2x.dandere2xlib.wrappers.frame.asyncframe import AsyncFrameRead
+from dandere2x.dandere2xlib.utils.channel import Channel
+from dandere2x.dandere2xlib.utils.dandere2x_utils import get_lexicon_value, wait_on_file
+from dandere2x.dandere2xlib.utils.thread_utils import cancel_on_error
 from dandere2x.dandere2xlib.wrappers.frame.frame import Frame
 from dandere2x.dandere2x_service.core.residual_plugins.pframe import pframe_image
+from dandere2x.dandere2x_service.core.vector_store import VectorStore
 
 class Merge(threading.Thread):
     """
@@ -52,7 +53,7 @@ class Merge(threading.Thread):
           as signalling to other parts of Dandere2x we've finished upscaling.
     """
 
-    def __init__(self, context: Dandere2xServiceContext, controller: Dandere2xController):
+    def __init__(self, context: Dandere2xServiceContext, controller: Dandere2xController, frames: Channel):
         # Threading Specific
         threading.Thread.__init__(self, name="MergeThread")
 
@@ -61,18 +62,21 @@ class Merge(threading.Thread):
         # load variables from context
         self.log = logging.getLogger(name=context.service_request.input_file)
 
-        # setup the pipe for merging
-        self.pipe = Pipe(self.context.service_request.output_file, context=context, controller=controller)
+        # residual.py re-packs dandere2x_cpp's residuals unless block packing is used.
+        self.residual_type = "residual" if self.context.residual_packing == "block" else "packed"
+        self.vectors = VectorStore(context, controller)
+
+        # merged frames go to the encode stage (pipe_thread.py) through here.
+        self.frames = frames
 
     def join(self, timeout=None):
         self.log.info("Join called.")
-        self.pipe.join()
         threading.Thread.join(self, timeout)
         self.log.info("Join finished.")
 
+    @cancel_on_error
     def run(self):
         self.log.info("Started")
-        self.pipe.start()
 
         # Load the genesis image + the first upscaled image.
         frame_previous = Frame()
@@ -85,7 +89,7 @@ class Merge(threading.Thread):
         frame_previous = Frame()
         frame_previous.load_from_string_controller(
             self.context.merged_dir + "merged_" + str(1) + ".jpg", self.controller)
-        self.pipe.save(frame_previous)
+        self.frames.put(frame_previous)
 
         current_upscaled_residuals = Frame()
         current_upscaled_residuals.load_from_string_controller(
@@ -105,14 +109,13 @@ class Merge(threading.Thread):
             # Pre-load the next iteration of the loop image ahead of time, if we're not on the last frame.
             if not last_frame:
                 """ 
-                By asynchronously loading frames ahead of time, this provides a small but meaningful
-                boost in performance when spanned over N frames. There's some code over head but 
-                it's well worth it. 
+                By asynchronously loading frames ahead of time (waiting on the session's wait pool, and decoding on
+                it's cpu pool), this provides a small but meaningful boost in performance when spanned over N frames.
+                There's some code over head but it's well worth it. 
                 """
-                background_frame_load = AsyncFrameRead(
-                    self.context.residual_upscaled_dir + "output_" + get_lexicon_value(6, x + 1) + ".png",
-                    self.controller)
-                background_frame_load.start()
+                background_frame_load = self.controller.executor.submit_wait(
+                    self.__load_frame,
+                    self.context.residual_upscaled_dir + "output_" + get_lexicon_value(6, x + 1) + ".png")
 
             ######################
             # Core Logic of Loop #
@@ -120,13 +123,10 @@ class Merge(threading.Thread):
 
             # Load the needed vectors to create the merged image.
 
-            prediction_data_list = get_list_from_file_and_wait(
-                self.context.pframe_data_dir + "pframe_" + str(x) + ".txt")
-            residual_data_list = get_list_from_file_and_wait(
-                self.context.residual_data_dir + "residual_" + str(x) + ".txt")
-            correction_data_list = get_list_from_file_and_wait(
-                self.context.correction_data_dir + "correction_" + str(x) + ".txt")
-            fade_data_list = get_list_from_file_and_wait(self.context.fade_data_dir + "fade_" + str(x) + ".txt")
+            prediction_data_list = self.vectors.load("pframe", x)
+            residual_data_list = self.vectors.load(self.residual_type, x)
+            correction_data_list = self.vectors.load("correction", x)
+            fade_data_list = self.vectors.load("fade", x)
 
             # Create the actual image itself.
             current_frame = self.make_merge_image(self.context, current_upscaled_residuals, frame_previous,
@@ -136,7 +136,7 @@ class Merge(threading.Thread):
             # Saving Area #
             ###############
             # Directly write the image to the ffmpeg pipe line.
-            self.pipe.save(current_frame)
+            self.frames.put(current_frame)
 
             # Manually write the image if we're preserving frames (this is for enthusiasts / debugging).
             # if self.preserve_frames:
@@ -149,9 +149,9 @@ class Merge(threading.Thread):
             # Assign variables for next iteration #
             #######################################
             if not last_frame:
-                # We need to wait until the next upscaled image exists before we move on.
-                while not background_frame_load.load_complete:
-                    wait_on_file(self.context.residual_upscaled_dir + "output_" + get_lexicon_value(6, x + 1) + ".png")
+                # We need to wait until the next upscaled image exists before we move on. The background load
+                # itself waits on the file, so simply wait for it's result.
+                current_upscaled_residuals = background_frame_load.result()
 
             """
             Now that we're all done with the current frame, the current `current_frame` is now the frame_previous
@@ -159,10 +159,20 @@ class Merge(threading.Thread):
             time, but this is an optimization that makes a substantial difference over N frames.
             """
             frame_previous = current_frame
-            current_upscaled_residuals = background_frame_load.loaded_image
             self.controller.update_frame_count(x)
 
-        self.pipe.kill()
+        self.vectors.close()
+        self.frames.close()
+
+    def __load_frame(self, input_image: str) -> Frame:
+        # Only decoding it takes one of the process' cpu slots, not waiting on the upscaler to write it.
+        wait_on_file(input_image, self.controller.cancellation_token)
+        return self.controller.executor.submit_cpu(self.__decode_frame, input_image).result()
+
+    def __decode_frame(self, input_image: str) -> Frame:
+        frame = Frame()
+        frame.load_from_string_controller(input_image, self.controller)
+        return frame
 
     @staticmethod
     def make_merge_image(context: Dandere2xServiceContext, frame_residual: Frame, frame_previous: Frame,
@@ -186,7 +196,7 @@ class Merge(threading.Thread):
         out_image.create_new(frame_previous.width, frame_previous.height)
 
         # If list_predictive is empty, then the residual frame is simply the newly produced image.
-        if not list_predictive:
+        if len(list_predictive) == 0:
             out_image.copy_image(frame_residual)
             return out_image
 
@@ -21,15 +21,15 @@ Purpose: This class is responsible for cleaning up files that are no
          to a minimum, thus allowing a smaller workspace. 
 ====================================================================="""
 
-import os
 import threading
-import time
 
 from colorlog import logging
 
+from dandere2x.dandere2x_service.core.lookahead import Lookahead
 from dandere2x.dandere2x_service.dandere2x_service_context import Dandere2xServiceContext
 from dandere2x.dandere2x_service.dandere2x_service_controller import Dandere2xController
-from dandere2x.dandere2xlib.utils.dandere2x_utils import get_lexicon_value
+from dandere2x.dandere2xlib.utils.file_sweeper import FileSweeper, frame_file_pattern
+from dandere2x.dandere2xlib.utils.thread_utils import cancel_on_error
 from dandere2x.dandere2xlib.wrappers.cv2.progressive_frame_extractor import ProgressiveFramesExtractorCV2
 
 
@@ -50,113 +50,86 @@ class MinDiskUsage(threading.Thread):
         self.log = logging.getLogger(name=context.service_request.input_file)
         self.context = context
         self.controller = controller
-        self.max_frames_ahead = self.context.max_frames_ahead
+        self.lookahead = Lookahead(context)
         self.frame_count = context.frame_count
         self.progressive_frame_extractor = ProgressiveFramesExtractorCV2(self.context.service_request.input_file,
                                                                          self.context.input_frames_dir,
                                                                          self.context.compressed_static_dir,
-                                                                         self.context.service_request.quality_minimum)
+                                                                         self.context.service_request.quality_minimum,
+                                                                         self.context.scene_cuts_dir,
+                                                                         self.context.scene_cut_threshold)
         self.start_frame = 1
+        self.sweeper = FileSweeper(controller.executor, self.__get_sweep_targets())
 
     def join(self, timeout=None):
         threading.Thread.join(self, timeout)
 
-    """
-    todo:
-    - Rather than extracting frame by frame, look into the applications of extracting every N frames rather than every
-      1 frame. I conjecture this would lessen the amount of times these functions are called, which should
-      increase performance.  
-    """
-
+    @cancel_on_error
     def run(self):
         """
         Waits on the 'signal_merged_count' to change, which originates from the merge.py class.
-        When it does, delete the used files and extract the needed frame.
+        Every time merge.py gets through another 'min_disk_batch_size' frames, delete the used files and extract
+        frames up to however far ahead the lookahead says.
         """
-        for x in range(self.start_frame, self.frame_count - self.context.max_frames_ahead + 1):
-            self.log.debug("Processing frame x: " + str(x))
+        extracted = self.progressive_frame_extractor.count - 1
+        batch_size = max(self.context.min_disk_batch_size, 1)
 
-            # wait for signal to get ahead of MinDiskUsage
-            while x >= self.controller.get_current_frame():
-                time.sleep(.00001)
+        x = self.start_frame
+        while x < self.frame_count - 1:
+            batch_end = min(x + batch_size, self.frame_count - 1)
+            self.log.debug("Processing frames %d to %d" % (x, batch_end - 1))
 
-            if not self.is_alive():
+            # wait for signal to get ahead of MinDiskUsage (or for the session to stop)
+            if not self.controller.wait_for_frame(batch_end):
                 self.progressive_frame_extractor.release_capture()
                 return
 
-            # when it does get ahead, extract the next frame
-            self.progressive_frame_extractor.next_frame()
-            self.__delete_used_files(x)
+            # when it does get ahead, extract up to the next 'frames_ahead' frames (if they aren't already)
+            frames_ahead = self.lookahead.update(extracted, extracted - batch_end, frames=batch_end - x)
+            while extracted < min(batch_end + frames_ahead, self.frame_count):
+                self.progressive_frame_extractor.next_frame()
+                extracted += 1
+                self.controller.update_extracted_count(extracted)
+
+            self.sweeper.sweep(batch_end - 1)
+            x = batch_end
 
         self.progressive_frame_extractor.release_capture()
 
     def extract_initial_frames(self):
         """
-        Extract 'max_frames_ahead' needed for Dandere2x to start with. Floors to frame_count if max_frames_ahead
-        is longer than the video itself.
+        Extract the lookahead's initial frames ahead needed for Dandere2x to start with. Floors to frame_count if
+        that's longer than the video itself.
         """
 
-        max_frames_ahead = min(self.context.max_frames_ahead, self.context.video_settings.frame_count)
+        frames_ahead = min(self.lookahead.frames_ahead, self.context.video_settings.frame_count)
 
-        for x in range(max_frames_ahead):
+        for x in range(frames_ahead):
             self.progressive_frame_extractor.next_frame()
 
-    def __delete_used_files(self, remove_before):
-        """
-        Delete the files produced by dandere2x up to index_to_remove.
-
-        Author: Tremex
-        """
-
-        # load context
-
-        pframe_data_dir = self.context.pframe_data_dir
-        residual_data_dir = self.context.residual_data_dir
-        correction_data_dir = self.context.correction_data_dir
-        fade_data_dir = self.context.fade_data_dir
-        input_frames_dir = self.context.input_frames_dir
-        compressed_static_dir = self.context.compressed_static_dir
-        residual_upscaled_dir = self.context.residual_upscaled_dir
-
-        # get the files to delete "_r(emove)"
-
-        index_to_remove = str(remove_before - 2)
-
-        prediction_data_file_r = pframe_data_dir + "pframe_" + index_to_remove + ".txt"
-        residual_data_file_r = residual_data_dir + "residual_" + index_to_remove + ".txt"
-        correction_data_file_r = correction_data_dir + "correction_" + index_to_remove + ".txt"
-        fade_data_file_r = fade_data_dir + "fade_" + index_to_remove + ".txt"
-        input_image_r = input_frames_dir + "frame" + index_to_remove + ".jpg"
-        compressed_file_static_r = compressed_static_dir + "compressed_" + index_to_remove + ".jpg"
-
-        # "mark" them
-        remove = [prediction_data_file_r, residual_data_file_r, correction_data_file_r,
-                  fade_data_file_r, input_image_r,  # upscaled_file_r,
-                  compressed_file_static_r]
-
-        upscaled_file_r = residual_upscaled_dir + "output_" + get_lexicon_value(6, int(remove_before)) + ".png"
-        remove.append(upscaled_file_r)
-
-        # remove
-        threading.Thread(target=self.__delete_files_from_list, args=(remove,), daemon=True, name="mindiskusage").start()
+        self.controller.update_extracted_count(self.progressive_frame_extractor.count - 1)
 
-    def __delete_files_from_list(self, files):
+    def __get_sweep_targets(self) -> list:
         """
-        Delete all the files in a given list.
+        The files dandere2x produces for each frame, and how far past a frame merge.py needs to be before they can be
+        deleted (see FileSweeper).
 
-        Author: Tremex.
+        Frame x's extracted (and compressed) images, scene cut marker and vectors are still needed until merge.py is
+        past frame x + 2, it's upscaled residuals only until it's past frame x.
         """
-        for item in files:
-            c = 0
-            while True:
-                if os.path.isfile(item):
-                    try:
-                        os.remove(item)
-                        break
-                    except OSError:
-                        c += 1
-                else:
-                    c += 1
-                if c == 20:
-                    break
-                time.sleep(0.1)
+        targets = [(self.context.input_frames_dir, frame_file_pattern("frame", ".jpg"), 2),
+                   (self.context.compressed_static_dir, frame_file_pattern("compressed_", ".jpg"), 2),
+                   (self.context.scene_cuts_dir, frame_file_pattern("cut_", ""), 2),
+                   (self.context.residual_upscaled_dir, frame_file_pattern("output_", "."), 0)]
+
+        # journaled / streamed vectors don't have a file per frame, so there's nothing to delete.
+        if self.context.vector_storage == "files":
+            targets += [(self.context.pframe_data_dir, frame_file_pattern("pframe_", ".txt"), 2),
+                        (self.context.residual_data_dir, frame_file_pattern("residual_", ".txt"), 2),
+                        (self.context.correction_data_dir, frame_file_pattern("correction_", ".txt"), 2),
+                        (self.context.fade_data_dir, frame_file_pattern("fade_", ".txt"), 2)]
+
+            if self.context.residual_packing != "block":
+                targets.append((self.context.residual_data_dir, frame_file_pattern("packed_", ".txt"), 2))
+
+        return targets
@@ -24,7 +24,15 @@ import threading
 
 from dandere2x.dandere2x_service.dandere2x_service_context import Dandere2xServiceContext
 from dandere2x.dandere2x_service.dandere2x_service_controller import Dandere2xController
-from dandere2x.dandere2xlib.utils.dandere2x_utils import get_lexicon_value, get_list_from_file_and_wait
+from dandere2x.dandere2x_service.core.residual_plugins.packing import RESIDUAL_RECT_SIZE, get_packed_image_size, \
+    pack_residual_rects
+from dandere2x.dandere2x_service.core.residual_plugins.quadtree import quadtree_residuals, reconstruct_frame
+from dandere2x.dandere2x_service.core.residual_plugins.regions import region_residuals
+from dandere2x.dandere2x_service.core.residual_statistics import ResidualStatistics
+from dandere2x.dandere2x_service.core.vector_store import VectorStore
+from dandere2x.dandere2xlib.utils.dandere2x_utils import get_lexicon_value
+from dandere2x.dandere2xlib.utils.scene_cuts import is_scene_cut
+from dandere2x.dandere2xlib.utils.thread_utils import cancel_on_error
 from dandere2x.dandere2xlib.wrappers.frame.frame import Frame, DisplacementVector
 
 
@@ -37,15 +45,25 @@ class Residual(threading.Thread):
         self.con = context
         self.controller = controller
         self.log = logging.getLogger(name=context.service_request.input_file)
+        self.statistics = ResidualStatistics(context)
+        self.vectors = VectorStore(context, controller)
 
     def join(self, timeout=None):
         self.log.info("Method called.")
         threading.Thread.join(self, timeout)
         self.log.info("Join finished.")
 
+    @cancel_on_error
     def run(self):
         self.log.info("Run called.")
 
+        # Quadtree packing compares frame x+1 against frame x as merge.py reconstructed it, which is carried over
+        # (and reconstructed again) between iterations.
+        frame_previous = Frame()
+        if self.con.residual_packing == "quadtree":
+            frame_previous.load_from_string_controller(self.con.input_frames_dir + "frame" + str(1) + ".jpg",
+                                                       self.controller)
+
         for x in range(1, self.con.frame_count):
 
             # Files needed to create a residual image
@@ -53,16 +71,37 @@ class Residual(threading.Thread):
             f1.load_from_string_controller(self.con.input_frames_dir + "frame" + str(x + 1) + ".jpg",
                                            self.controller)
             # Load the neccecary lists to compute this iteration of residual making
-            residual_data = get_list_from_file_and_wait(self.con.residual_data_dir + "residual_" + str(x) + ".txt")
+            residual_data = self.vectors.load("residual", x)
+
+            prediction_data = self.vectors.load("pframe", x)
 
-            prediction_data = get_list_from_file_and_wait(self.con.pframe_data_dir + "pframe_" + str(x) + ".txt")
+            self.statistics.record(x + 1, prediction_data, residual_data)
 
             # Create the output files..
             debug_output_file = self.con.debug_dir + "debug" + str(x + 1) + ".jpg"
             output_file = self.con.residual_images_dir + "output_" + get_lexicon_value(6, x) + ".jpg"
 
+            # A scene cut (which block matching skipped, leaving no vectors) is upscaled in full, so the frame is
+            # it's own residual image, as is.
+            scene_cut = len(residual_data) == 0 and len(prediction_data) == 0 and \
+                is_scene_cut(self.con.scene_cuts_dir, x + 1)
+
+            # Residuals that aren't dandere2x_cpp's fixed-size blocks are re-packed here, and the packed vectors are
+            # saved for merge.py to use in place of dandere2x_cpp's residual vectors.
+            list_residual = residual_data
+            if self.con.residual_packing != "block":
+                if not scene_cut:
+                    list_residual = self.pack_residuals(x, f1, frame_previous, residual_data, prediction_data)
+                self.vectors.save("packed", x, list_residual)
+
+                if self.con.residual_packing == "quadtree":
+                    frame_previous = reconstruct_frame(self.con, frame_previous, f1, prediction_data, list_residual)
+
             # Save to a temp folder so waifu2x-vulkan doesn't try reading it, then move it
-            out_image = self.make_residual_image(self.con, f1, residual_data, prediction_data)
+            if scene_cut:
+                out_image = f1
+            else:
+                out_image = self.make_residual_image(self.con, f1, list_residual, prediction_data)
 
             if out_image.get_res() == (1, 1):
                 """
@@ -80,10 +119,12 @@ class Residual(threading.Thread):
                 out_image.create_new(2, 2)
                 output_file = self.con.residual_upscaled_dir + "output_" + get_lexicon_value(6, x) + ".png"
                 out_image.save_image(output_file)
+                self.statistics.record_upscaled_pixels(x + 1, 0)
 
             else:
                 # This image has things to upscale, continue normally
                 out_image.save_image_temp(out_location=output_file, temp_location=self.con.temp_image)
+                self.statistics.record_upscaled_pixels(x + 1, out_image.width * out_image.height)
 
             # With this change the wrappers must be modified to not try deleting the non existing residual file
             if self.con.debug == 1:
@@ -91,6 +132,30 @@ class Residual(threading.Thread):
                                  list_predictive=prediction_data, list_residuals=residual_data,
                                  output_location=debug_output_file)
 
+        self.vectors.close()
+        if self.controller.vector_stream:
+            self.controller.vector_stream.close(["packed"])
+        self.statistics.save(self.con.statistics_dir)
+
+    def pack_residuals(self, x: int, frame_next: Frame, frame_previous: Frame, list_residual: list,
+                       list_predictive: list) -> list:
+        """
+        Convert dandere2x_cpp's residual vectors for frame x+1 into packed residual vectors (see packing.py) using
+        the selected context.residual_packing method.
+        """
+        if len(list_residual) == 0 or len(list_predictive) == 0:
+            return []
+
+        if self.con.residual_packing == "region":
+            return pack_residual_rects(region_residuals(self.con, list_residual), self.con.bleed)
+
+        frame_compressed = Frame()
+        frame_compressed.load_from_string_controller(
+            self.con.compressed_static_dir + "compressed_" + str(x + 1) + ".jpg", self.controller)
+
+        rects = quadtree_residuals(self.con, frame_next, frame_previous, frame_compressed, list_residual)
+        return pack_residual_rects(rects, self.con.bleed)
+
     @staticmethod
     def make_residual_image(context: Dandere2xServiceContext, raw_frame: Frame, list_residual: list,
                             list_predictive: list):
@@ -110,7 +175,7 @@ class Residual(threading.Thread):
 
         # Some conditions to check before making a residual image, in both cases, we don't need to do any actual
         # processing in the function call, if these conditions hold true.
-        if not list_residual and list_predictive:
+        if len(list_residual) == 0 and len(list_predictive) != 0:
             """
             If there are no items in 'list_residuals' but have list_predictives then the two frames are identical,
             so no residual image needed.
@@ -119,7 +184,7 @@ class Residual(threading.Thread):
             residual_image.create_new(1, 1)
             return residual_image
 
-        if not list_residual and not list_predictive:
+        if len(list_residual) == 0 and len(list_predictive) == 0:
             """ 
             If there are neither any predictive or inversions, then the frame is a brand new frame with no resemblence
             to previous frame. In this case, copy the entire frame over.
@@ -139,6 +204,23 @@ class Residual(threading.Thread):
         """
         bleed_frame = raw_frame.create_bleeded_image(buffer)
 
+        if context.residual_packing != "block":
+            """
+            Packed residuals can be of mixed sizes, and store their own (pixel) position within the residual image.
+            """
+            residual_image = Frame()
+            residual_image.create_new(*get_packed_image_size(list_residual, bleed))
+
+            for x in range(int(len(list_residual) / RESIDUAL_RECT_SIZE)):
+                x_1, y_1, x_2, y_2, width, height = \
+                    [int(value) for value in list_residual[x * RESIDUAL_RECT_SIZE: (x + 1) * RESIDUAL_RECT_SIZE]]
+
+                residual_image.copy_rect(bleed_frame, width + bleed * 2, height + bleed * 2,
+                                         x_1 + buffer - bleed, y_1 + buffer - bleed,
+                                         x_2 - bleed, y_2 - bleed)
+
+            return residual_image
+
         # size of output image is determined based off how many residuals there are
         image_size = int(math.sqrt(len(list_residual) / 4) + 1) * (block_size + bleed * 2)
         residual_image = Frame()
@@ -189,11 +271,11 @@ class Residual(threading.Thread):
         black_image = Frame()
         black_image.create_new(frame_base.width, frame_base.height)
 
-        if not list_predictive and not list_residuals:
+        if len(list_predictive) == 0 and len(list_residuals) == 0:
             out_image.save_image(output_location)
             return
 
-        if list_predictive and not list_residuals:
+        if len(list_predictive) != 0 and len(list_residuals) == 0:
             out_image.copy_image(frame_base)
             out_image.save_image(output_location)
             return
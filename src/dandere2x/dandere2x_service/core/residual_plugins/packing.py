@@ -0,0 +1,60 @@
+import math
+
+# Packed residuals are stored as 6 values per entry:
+#
+#   x_1, y_1  : where the region is located in the frame.
+#   x_2, y_2  : where the region's pixels (not including bleed) are located in the residual image.
+#   width, height : the size of the region.
+#
+# Unlike dandere2x_cpp's residual vectors, where every entry is a block_size block placed on a uniform grid, packed
+# residuals can be of mixed sizes, so positions in the residual image are stored in pixels rather than grid cells.
+RESIDUAL_RECT_SIZE = 6
+
+
+def pack_residual_rects(rects: list, bleed: int) -> list:
+    """
+    Place every rect in 'rects' (a list of (x, y, width, height) tuples) into a residual image using a simple shelf
+    packer - the tallest rects are placed first, left to right, starting a new row (shelf) whenever the current
+    one is full. Each rect is surrounded by its own 'bleed' border.
+
+    Returns a flat list of packed residual vectors (see RESIDUAL_RECT_SIZE).
+    """
+    if not rects:
+        return []
+
+    padded_area = sum((width + bleed * 2) * (height + bleed * 2) for _, _, width, height in rects)
+    widest = max(width for _, _, width, _ in rects) + bleed * 2
+    shelf_width = max(int(math.sqrt(padded_area)) + 1, widest)
+
+    list_packed = []
+    shelf_x, shelf_y, shelf_height = 0, 0, 0
+
+    for x, y, width, height in sorted(rects, key=lambda rect: (-rect[3], -rect[2], rect[1], rect[0])):
+        padded_width = width + bleed * 2
+        padded_height = height + bleed * 2
+
+        if shelf_x + padded_width > shelf_width:
+            shelf_x = 0
+            shelf_y += shelf_height
+            shelf_height = 0
+
+        list_packed.extend([x, y, shelf_x + bleed, shelf_y + bleed, width, height])
+
+        shelf_x += padded_width
+        shelf_height = max(shelf_height, padded_height)
+
+    return list_packed
+
+
+def get_packed_image_size(list_packed: list, bleed: int) -> tuple:
+    """ The (width, height) of the residual image needed to hold every vector in list_packed. """
+    width, height = 1, 1
+
+    for x in range(len(list_packed) // RESIDUAL_RECT_SIZE):
+        _, _, x_2, y_2, rect_width, rect_height = \
+            [int(value) for value in list_packed[x * RESIDUAL_RECT_SIZE: (x + 1) * RESIDUAL_RECT_SIZE]]
+
+        width = max(width, x_2 + rect_width + bleed)
+        height = max(height, y_2 + rect_height + bleed)
+
+    return width, height
@@ -1,3 +1,4 @@
+from dandere2x.dandere2x_service.core.residual_plugins.packing import RESIDUAL_RECT_SIZE
 from dandere2x.dandere2x_service.dandere2x_service_context import Dandere2xServiceContext
 
 # This is the inversion (sort of) function of what Dandere2x_cpp's pframe does (which is more commented).
@@ -27,28 +28,24 @@ def pframe_image(context: Dandere2xServiceContext,
     block_size = context.service_request.block_size
     bleed = context.bleed
 
-    for x in range(int(len(list_predictive) / 4)):
-        """
-        Neat optimization trick - there's no need for pframe to copy over a block if the vectors
-        point to the same place. In merge.py we just need to load the previous frame into the current frame
-        to reach this optimization.
-        """
-
-        if int(list_predictive[x * 4 + 0]) != int(list_predictive[x * 4 + 1]) \
-                or \
-                int(list_predictive[x * 4 + 2]) != int(list_predictive[x * 4 + 3]):
-            # load the vector
-            vector = DisplacementVector(int(list_predictive[x * 4 + 0]),
-                                        int(list_predictive[x * 4 + 1]),
-                                        int(list_predictive[x * 4 + 2]),
-                                        int(list_predictive[x * 4 + 3]))
-
-            # apply the vector
-            frame_next.copy_block(frame_previous, block_size * scale_factor,
-                                  vector.x_2 * scale_factor,
-                                  vector.y_2 * scale_factor,
-                                  vector.x_1 * scale_factor,
-                                  vector.y_1 * scale_factor)
+    for vector in get_moving_vectors(list_predictive):
+        frame_next.copy_block(frame_previous, block_size * scale_factor,
+                              vector.x_2 * scale_factor,
+                              vector.y_2 * scale_factor,
+                              vector.x_1 * scale_factor,
+                              vector.y_1 * scale_factor)
+
+    if context.residual_packing != "block":
+        # packed residuals (see packing.py) store their own size and pixel position within frame_residual.
+        for x in range(int(len(list_residual) / RESIDUAL_RECT_SIZE)):
+            x_1, y_1, x_2, y_2, width, height = \
+                [int(value) for value in list_residual[x * RESIDUAL_RECT_SIZE: (x + 1) * RESIDUAL_RECT_SIZE]]
+
+            frame_next.copy_rect(frame_residual, width * scale_factor, height * scale_factor,
+                                 x_2 * scale_factor, y_2 * scale_factor,
+                                 x_1 * scale_factor, y_1 * scale_factor)
+
+        return frame_next
 
     for x in range(int(len(list_residual) / 4)):
         # load every element in the list into a vector
@@ -65,3 +62,21 @@ def pframe_image(context: Dandere2xServiceContext,
                               vector.y_1 * scale_factor)
 
     return frame_next
+
+
+def get_moving_vectors(list_predictive: list) -> list:
+    """
+    list_predictive's vectors, as DisplacementVectors, leaving out the ones that point to the same place, i.e
+    (x,y) -> (x,y).
+
+    Neat optimization trick - there's no need to copy over a block if the vectors point to the same place. merge.py
+    (and quadtree.py's reconstruct_frame) start every frame as a copy of the previous frame, so it's already there.
+    """
+    vectors = []
+    for x in range(int(len(list_predictive) / 4)):
+        x_1, y_1, x_2, y_2 = [int(value) for value in list_predictive[x * 4: (x + 1) * 4]]
+
+        if x_1 != x_2 or y_1 != y_2:
+            vectors.append(DisplacementVector(x_1, y_1, x_2, y_2))
+
+    return vectors
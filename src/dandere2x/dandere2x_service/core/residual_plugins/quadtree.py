@@ -0,0 +1,93 @@
+import numpy as np
+
+from dandere2x.dandere2x_service.core.residual_plugins.packing import RESIDUAL_RECT_SIZE
+from dandere2x.dandere2x_service.core.residual_plugins.pframe import get_moving_vectors
+from dandere2x.dandere2x_service.dandere2x_service_context import Dandere2xServiceContext
+from dandere2x.dandere2xlib.wrappers.frame.frame import Frame
+
+
+def quadtree_residuals(context: Dandere2xServiceContext, frame_next: Frame, frame_previous: Frame,
+                       frame_compressed: Frame, list_residual: list) -> list:
+    """
+    dandere2x_cpp only works in block_size blocks, so one small change within a block forces the entire block to
+    be upscaled. This recursively splits every residual block into quadrants (30 -> 15 -> 8 ... ) and only keeps the
+    quadrants that actually changed, stopping once quadrants would be smaller than context.quadtree_min_block_size.
+
+    A quadrant is considered unchanged if copying it from the same position in frame_previous is at least as
+    accurate as frame_compressed (the frame compressed at quality_minimum) - the same bar dandere2x_cpp uses to
+    accept a stationary block. Since merge.py starts every frame as a copy of the previous frame, unchanged quadrants
+    need no vector at all - which is why frame_previous has to be the previous frame as merge.py reconstructed it
+    (see reconstruct_frame), not as it was extracted, or skipped quadrants' errors would build up unchecked.
+
+    Returns a list of (x, y, width, height) rects that need to be upscaled.
+    """
+    block_size = context.service_request.block_size
+    min_block_size = context.quadtree_min_block_size
+
+    rects = []
+    for x in range(int(len(list_residual) / 4)):
+        rects.extend(_split_block(frame_next, frame_previous, frame_compressed,
+                                  int(list_residual[x * 4 + 0]), int(list_residual[x * 4 + 1]),
+                                  block_size, min_block_size))
+    return rects
+
+
+def _split_block(frame_next: Frame, frame_previous: Frame, frame_compressed: Frame,
+                 x: int, y: int, size: int, min_block_size: int) -> list:
+
+    if _is_unchanged(frame_next, frame_previous, frame_compressed, x, y, size):
+        return []
+
+    # Odd sized blocks (i.e 15) are split into overlapping quadrants (8, 8), the overlap is simply drawn twice.
+    quadrant_size = (size + 1) // 2
+    if quadrant_size < min_block_size:
+        return [(x, y, size, size)]
+
+    quadrants = []
+    for delta_y in (0, size - quadrant_size):
+        for delta_x in (0, size - quadrant_size):
+            quadrants.extend(_split_block(frame_next, frame_previous, frame_compressed,
+                                          x + delta_x, y + delta_y, quadrant_size, min_block_size))
+
+    # If every quadrant changed, upscaling the parent is cheaper (one bleed rather than four).
+    if len(quadrants) == 4 and all(width == quadrant_size for _, _, width, _ in quadrants):
+        return [(x, y, size, size)]
+
+    return quadrants
+
+
+def _is_unchanged(frame_next: Frame, frame_previous: Frame, frame_compressed: Frame, x: int, y: int, size: int):
+    block_next = frame_next.frame[y:y + size, x:x + size].astype(np.int32)
+
+    mse_stationary = np.mean((block_next - frame_previous.frame[y:y + size, x:x + size]) ** 2)
+    mse_compressed = np.mean((block_next - frame_compressed.frame[y:y + size, x:x + size]) ** 2)
+
+    return mse_stationary <= mse_compressed
+
+
+def reconstruct_frame(context: Dandere2xServiceContext, frame_previous: Frame, frame_next: Frame,
+                      list_predictive: list, list_packed: list) -> Frame:
+    """
+    frame_next as merge.py will reconstruct it (before upscaling) from frame_previous's reconstruction: a copy of
+    frame_previous, with list_predictive's moving blocks (see pframe.get_moving_vectors) moved over from
+    frame_previous, and list_packed's rects (packed residuals, see packing.py) taken from frame_next.
+    """
+    # Without predictive vectors (a scene cut, or nothing matched) merge.py takes the whole frame as it's residual.
+    if len(list_predictive) == 0:
+        return frame_next
+
+    block_size = context.service_request.block_size
+
+    frame_reconstructed = Frame()
+    frame_reconstructed.create_new(frame_previous.width, frame_previous.height)
+    frame_reconstructed.copy_image(frame_previous)
+
+    for vector in get_moving_vectors(list_predictive):
+        frame_reconstructed.copy_block(frame_previous, block_size, vector.x_2, vector.y_2, vector.x_1, vector.y_1)
+
+    for x in range(int(len(list_packed) / RESIDUAL_RECT_SIZE)):
+        x_1, y_1, _, _, width, height = \
+            [int(value) for value in list_packed[x * RESIDUAL_RECT_SIZE: (x + 1) * RESIDUAL_RECT_SIZE]]
+        frame_reconstructed.copy_rect(frame_next, width, height, x_1, y_1, x_1, y_1)
+
+    return frame_reconstructed
@@ -0,0 +1,41 @@
+import numpy as np
+
+from dandere2x.dandere2x_service.dandere2x_service_context import Dandere2xServiceContext
+
+
+def region_residuals(context: Dandere2xServiceContext, list_residual: list) -> list:
+    """
+    Every residual block dandere2x_cpp produces carries it's own bleed, so a 4x4 cluster of adjacent residual blocks
+    becomes 16 separately bleeded blocks. This merges adjacent residual blocks into rectangular regions, so each
+    region is upscaled (and later copied back in merge.py) as one piece, sharing a single bleed.
+
+    Regions are found greedily - starting from the top-left-most residual block not yet in a region, extend right
+    as far as possible, then extend down for as long as every block in the row below is also a residual.
+
+    Returns a list of (x, y, width, height) rects that need to be upscaled.
+    """
+    block_size = context.service_request.block_size
+    blocks_wide = context.width // block_size
+    blocks_high = context.height // block_size
+
+    unassigned = np.zeros([blocks_high, blocks_wide], dtype=bool)
+    for x in range(int(len(list_residual) / 4)):
+        unassigned[int(list_residual[x * 4 + 1]) // block_size, int(list_residual[x * 4 + 0]) // block_size] = True
+
+    rects = []
+    for block_y, block_x in zip(*np.nonzero(unassigned)):
+        if not unassigned[block_y, block_x]:
+            continue
+
+        width = 1
+        while block_x + width < blocks_wide and unassigned[block_y, block_x + width]:
+            width += 1
+
+        height = 1
+        while block_y + height < blocks_high and unassigned[block_y + height, block_x:block_x + width].all():
+            height += 1
+
+        unassigned[block_y:block_y + height, block_x:block_x + width] = False
+        rects.append((int(block_x) * block_size, int(block_y) * block_size, width * block_size, height * block_size))
+
+    return rects
@@ -0,0 +1,117 @@
+import logging
+import os
+
+import numpy as np
+
+from dandere2x.dandere2x_service.dandere2x_service_context import Dandere2xServiceContext
+from dandere2x.dandere2xlib.wrappers.frame.frame import Frame
+
+
+class ResidualStatistics:
+    """
+    Records how much of each frame dandere2x was able to recycle, so block_size / quality_minimum choices can be
+    tuned against real savings data.
+
+    For every frame, the following is recorded:
+        - predictive: blocks recycled from a different position of the previous frame.
+        - identity: blocks recycled from the same position of the previous frame, i.e (x,y) -> (x,y).
+        - residual: blocks that couldn't be recycled, and need to be upscaled by waifu2x.
+        - residual_fraction: the fraction of the frame's area covered by residual blocks.
+        - upscaled_pixels: the size (in pixels) of the residual image sent to waifu2x.
+
+    A heatmap counting how often each block position ended up being a residual is kept alongside the time series.
+    """
+
+    def __init__(self, context: Dandere2xServiceContext):
+        self.log = logging.getLogger(name=context.service_request.input_file)
+        self.block_size = context.service_request.block_size
+        self.frame_count = context.frame_count
+
+        self.blocks_wide = context.width // self.block_size
+        self.blocks_high = context.height // self.block_size
+        self.blocks_per_frame = self.blocks_wide * self.blocks_high
+        self.frame_pixels = context.width * context.height
+
+        self.time_series = np.zeros(self.frame_count, dtype=[("frame", np.int32),
+                                                              ("predictive", np.int32),
+                                                              ("identity", np.int32),
+                                                              ("residual", np.int32),
+                                                              ("residual_fraction", np.float32),
+                                                              ("upscaled_pixels", np.int64)])
+        self.time_series["frame"] = np.arange(1, self.frame_count + 1)
+        self.heatmap = np.zeros([self.blocks_high, self.blocks_wide], dtype=np.int32)
+
+        # The first frame is always upscaled in it's entirety.
+        self._record_full_frame(1)
+
+    def record(self, frame_number: int, list_predictive: list, list_residual: list) -> None:
+        """
+        Record the statistics for frame 'frame_number', using the vectors dandere2x_cpp produced to create it
+        from frame 'frame_number - 1'.
+        """
+
+        if len(list_predictive) == 0 and len(list_residual) == 0:
+            # No resemblance to the previous frame, so the entire frame gets upscaled.
+            self._record_full_frame(frame_number)
+            return
+
+        predictive_vectors = self._to_vectors(list_predictive)
+        residual_vectors = self._to_vectors(list_residual)
+
+        identity_count = int(np.count_nonzero((predictive_vectors[:, 0] == predictive_vectors[:, 2]) &
+                                              (predictive_vectors[:, 1] == predictive_vectors[:, 3])))
+        residual_count = len(residual_vectors)
+
+        row = self.time_series[frame_number - 1]
+        row["predictive"] = len(predictive_vectors) - identity_count
+        row["identity"] = identity_count
+        row["residual"] = residual_count
+        row["residual_fraction"] = min(residual_count / self.blocks_per_frame, 1.0)
+
+        block_x = np.clip(residual_vectors[:, 0] // self.block_size, 0, self.blocks_wide - 1)
+        block_y = np.clip(residual_vectors[:, 1] // self.block_size, 0, self.blocks_high - 1)
+        np.add.at(self.heatmap, (block_y, block_x), 1)
+
+    def record_upscaled_pixels(self, frame_number: int, upscaled_pixels: int) -> None:
+        self.time_series[frame_number - 1]["upscaled_pixels"] = upscaled_pixels
+
+    def save(self, output_dir: str) -> None:
+        """
+        Save the per-frame time series (as both .npy and .csv) and the residual heatmap (as both .npy and a
+        greyscale .png, brighter meaning that block was a residual more often) into output_dir.
+        """
+        self.log.info("Saving residual statistics to %s" % output_dir)
+
+        np.save(os.path.join(output_dir, "residual_statistics.npy"), self.time_series)
+        np.savetxt(os.path.join(output_dir, "residual_statistics.csv"), self.time_series,
+                   fmt=["%d", "%d", "%d", "%d", "%.4f", "%d"], delimiter=",",
+                   header=",".join(self.time_series.dtype.names), comments="")
+
+        np.save(os.path.join(output_dir, "residual_heatmap.npy"), self.heatmap)
+
+        if self.heatmap.size == 0:
+            return
+
+        # scale each block position back up to block_size pixels so the heatmap overlays the video.
+        normalized = (self.heatmap * 255 // max(int(self.heatmap.max()), 1)).astype(np.uint8)
+        expanded = np.kron(normalized, np.ones([self.block_size, self.block_size], dtype=np.uint8))
+
+        heatmap_image = Frame()
+        heatmap_image.create_new(expanded.shape[1], expanded.shape[0])
+        heatmap_image.frame[:, :, :] = expanded[:, :, np.newaxis]
+        heatmap_image.save_image(os.path.join(output_dir, "residual_heatmap.png"))
+
+    def _record_full_frame(self, frame_number: int) -> None:
+        row = self.time_series[frame_number - 1]
+        row["predictive"] = 0
+        row["identity"] = 0
+        row["residual"] = self.blocks_per_frame
+        row["residual_fraction"] = 1.0
+        row["upscaled_pixels"] = self.frame_pixels
+        self.heatmap += 1
+
+    @staticmethod
+    def _to_vectors(list_vectors: list) -> np.ndarray:
+        """ Convert a list of vectors read from dandere2x_cpp into a (N, 4) array. """
+        vector_count = len(list_vectors) // 4
+        return np.array(list_vectors[:vector_count * 4], dtype=np.int32).reshape(vector_count, 4)
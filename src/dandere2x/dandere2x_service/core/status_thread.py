@@ -8,6 +8,7 @@ import time
 # Also, in a very niche case the GUI didn't catch up with the deletion of files, so it ceased updating
 from dandere2x.dandere2x_service.dandere2x_service_context import Dandere2xServiceContext
 from dandere2x.dandere2x_service.dandere2x_service_controller import Dandere2xController
+from dandere2x.dandere2xlib.utils.thread_utils import cancel_on_error
 
 
 class Status(threading.Thread):
@@ -25,6 +26,7 @@ class Status(threading.Thread):
         threading.Thread.join(self, timeout)
         self.log.info("Join finished.")
 
+    @cancel_on_error
     def run(self):
         self.log.info("Run called.")
         last_10 = [0]
@@ -50,8 +52,8 @@ class Status(threading.Thread):
 
             now = time.time()
 
-            while x >= self.controller.get_current_frame():
-                time.sleep(.00001)
+            if not self.controller.wait_for_frame(x + 1):
+                return
 
             later = time.time()
             difference = float(later - now)
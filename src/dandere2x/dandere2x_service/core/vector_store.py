@@ -0,0 +1,79 @@
+import numpy as np
+
+from dandere2x.dandere2x_service.dandere2x_service_context import Dandere2xServiceContext
+from dandere2x.dandere2x_service.dandere2x_service_controller import Dandere2xController
+from dandere2x.dandere2xlib.utils.vector_journal import VectorJournal
+from dandere2x.dandere2xlib.utils.vector_stream import VectorStream
+from dandere2x.dandere2xlib.utils.vector_utils import get_vectors_from_file_and_wait, write_vector_file
+
+
+class VectorStore:
+    """
+    Where the vectors for each frame (dandere2x_cpp's pframe, residual, correction and fade vectors, as well as
+    residual.py's packed residuals) are loaded from and saved to, depending on context.vector_storage:
+
+        - "files":   one vector file per frame per data type, i.e pframe_data/pframe_<x>.txt
+        - "journal": one append-only journal per data type, i.e pframe_data/pframe.journal (see vector_journal.py)
+        - "pipe":    streamed from dandere2x_cpp's stdout into controller.vector_stream (see vector_stream.py)
+
+    Each thread should use it's own VectorStore.
+    """
+
+    def __init__(self, context: Dandere2xServiceContext, controller: Dandere2xController):
+        self.context = context
+        self.controller = controller
+        self.journals = {}
+
+        # data_type -> (directory, file prefix)
+        self.locations = {"pframe": (context.pframe_data_dir, "pframe"),
+                          "residual": (context.residual_data_dir, "residual"),
+                          "correction": (context.correction_data_dir, "correction"),
+                          "fade": (context.fade_data_dir, "fade"),
+                          "packed": (context.residual_data_dir, "packed")}
+
+    def load(self, data_type: str, frame: int) -> np.ndarray:
+        """ Load frame's vectors of data_type, waiting for them to exist. """
+        if self.context.vector_storage == "pipe":
+            return self.controller.vector_stream.get(data_type, frame)
+
+        if self.context.vector_storage == "journal":
+            return self.__get_journal(data_type).read_and_wait(frame, self.controller.cancellation_token)
+
+        return get_vectors_from_file_and_wait(self.get_vector_file(data_type, frame),
+                                              self.controller.cancellation_token)
+
+    def save(self, data_type: str, frame: int, values) -> None:
+        if self.context.vector_storage == "pipe":
+            self.controller.vector_stream.put(data_type, frame, np.asarray(values, dtype=np.int32))
+            return
+
+        if self.context.vector_storage == "journal":
+            self.__get_journal(data_type).append(frame, values)
+            return
+
+        write_vector_file(self.get_vector_file(data_type, frame), values,
+                          binary=self.context.vector_format == "binary")
+
+    def get_vector_file(self, data_type: str, frame: int) -> str:
+        directory, prefix = self.locations[data_type]
+        return directory + prefix + "_" + str(frame) + ".txt"
+
+    @staticmethod
+    def create_stream(context: Dandere2xServiceContext) -> VectorStream:
+        """
+        Create the VectorStream for a "pipe" session. residual.py and merge.py both read pframe vectors, and
+        residual vectors too, unless merge.py reads residual.py's packed residuals instead.
+        """
+        residual_readers = 2 if context.residual_packing == "block" else 1
+        return VectorStream({"pframe": 2, "residual": residual_readers, "correction": 1, "fade": 1, "packed": 1})
+
+    def close(self) -> None:
+        for journal in self.journals.values():
+            journal.close()
+        self.journals = {}
+
+    def __get_journal(self, data_type: str) -> VectorJournal:
+        if data_type not in self.journals:
+            directory, prefix = self.locations[data_type]
+            self.journals[data_type] = VectorJournal(directory + prefix + ".journal", self.context.frame_count)
+        return self.journals[data_type]
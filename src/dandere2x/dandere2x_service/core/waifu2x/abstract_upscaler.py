@@ -19,13 +19,14 @@ Purpose:
 import logging
 import os
 import sys
-import time
 from abc import ABC, abstractmethod
 from threading import Thread
 
 from dandere2x.dandere2x_service.dandere2x_service_context import Dandere2xServiceContext
 from dandere2x.dandere2x_service.dandere2x_service_controller import Dandere2xController
 from dandere2x.dandere2xlib.utils.dandere2x_utils import get_lexicon_value, wait_on_file, file_exists
+from dandere2x.dandere2xlib.utils.process_supervisor import ProcessResult, get_process_supervisor
+from dandere2x.dandere2xlib.utils.thread_utils import cancel_on_error
 from dandere2x.dandere2xlib.wrappers.frame.frame import Frame
 
 
@@ -43,9 +44,23 @@ class AbstractUpscaler(Thread, ABC):
         self.context = context
         self.controller = controller
         self.log = logging.getLogger()
+        self.supervisor = get_process_supervisor()
 
         self.upscale_command = self._construct_upscale_command()
 
+    def _run_engine(self, exec_command: list, console_output, cwd: str = None, restarts: int = 0, timeout=None,
+                    check: bool = False) -> ProcessResult:
+        """
+        Run the upscaling engine's 'exec_command' on the process supervisor, writing it's output into console_output
+        and killing it if the session's cancelled (see process_supervisor.py). Crashes are restarted up to 'restarts'
+        times, and if 'check', still crashing after that raises ProcessError. It runs with the session's "upscaler"
+        resource policy.
+        """
+        return self.supervisor.run(exec_command, token=self.controller.cancellation_token, check=check,
+                                   output=console_output, cwd=cwd, timeout=timeout, restarts=restarts,
+                                   name=self.__class__.__name__,
+                                   policy=self.context.resource_policy.process("upscaler"))
+
     # todo - not verifying if program even exists.
     def verify_upscaling_works(self) -> None:
         """
@@ -82,6 +97,7 @@ class AbstractUpscaler(Thread, ABC):
         os.remove(test_file)
         os.remove(test_file_upscaled)
 
+    @cancel_on_error
     def run(self) -> None:
         """
         Every upscaler essentially works like this (more or less):
@@ -93,16 +109,15 @@ class AbstractUpscaler(Thread, ABC):
         to keep the variation of upscalers consistent across variations.
         """
         self.log.info("Run called.")
-        remove_thread = RemoveUpscaledFiles(context=self.context, controller=self.controller)
-        remove_thread.start()
+        remove_upscaled_files = RemoveUpscaledFiles(context=self.context, controller=self.controller)
+        self.controller.executor.submit_thread(remove_upscaled_files.run)
 
-        while not self.check_if_done():
+        while self.controller.is_alive() and not self.check_if_done():
             self.repeated_call()
 
     def join(self, timeout=None) -> None:
         self.log.info("Join called.")
-        while not self.check_if_done():
-            time.sleep(0.05)
+        self.controller.wait_for_frame(self.context.frame_count - 1, timeout)
 
         self.log.info("Join finished.")
 
@@ -139,11 +154,13 @@ class AbstractUpscaler(Thread, ABC):
         pass
 
 
-class RemoveUpscaledFiles(Thread):
-    def __init__(self, context: Dandere2xServiceContext, controller: Dandere2xController):
-        Thread.__init__(self, name="Remove Upscale Files Thread")
-        super().__init__()
+class RemoveUpscaledFiles:
+    """
+    Deletes each residual image once it's been upscaled, so the upscaler doesn't upscale it twice. Runs for the whole
+    session, blocked on the upscaler most of the time, on a thread of it's own (SessionExecutor.submit_thread).
+    """
 
+    def __init__(self, context: Dandere2xServiceContext, controller: Dandere2xController):
         self.context = context
         self.controller = controller
 
@@ -153,18 +170,16 @@ class RemoveUpscaledFiles(Thread):
             self.list_of_names.append("output_" + get_lexicon_value(6, x) + ".jpg")
 
     # todo, fix this a bit. This isn't scalable / maintainable
+    @cancel_on_error
     def run(self) -> None:
         for x in range(len(self.list_of_names)):
             name = self.list_of_names[x]
             residual_file = self.context.residual_images_dir + name.replace(".png", ".jpg")
             residual_upscaled_file = self.context.residual_upscaled_dir + name.replace(".jpg", ".png")
 
-            wait_on_file(residual_upscaled_file)
+            wait_on_file(residual_upscaled_file, self.controller.cancellation_token)
 
             if os.path.exists(residual_file):
                 os.remove(residual_file)
             else:
                 pass
-
-    def join(self, timeout=None):
-        Thread.join(self, timeout)
@@ -0,0 +1,83 @@
+import os
+from typing import List
+
+from dandere2x.dandere2x_service.dandere2x_service_context import Dandere2xServiceContext
+from dandere2x.dandere2x_service.dandere2x_service_controller import Dandere2xController
+from dandere2x.dandere2xlib.utils.dandere2x_utils import rename_file
+from dandere2x.dandere2xlib.utils.file_watcher import FileReadyWatcher
+from dandere2x.dandere2xlib.utils.thread_utils import cancel_on_error
+
+
+class OutputNameReconciler:
+    """
+    Some upscaling engines name the files they upscale differently than dandere2x expects, i.e waifu2x-ncnn-vulkan
+    upscales "output_000001.jpg" into "output_000001.jpg.png", where dandere2x expects "output_000001.png". This renames
+    every file in residual_upscaled_dir ending in 'engine_suffix' to end in ".png" instead.
+
+    It only renames the files the watcher says were finished (or moved into) the directory (see
+    FileReadyWatcher.watch_directory), in whatever order the engine finishes them, so it never re-scans the directory
+    - other than once at the start, for files finished before it was watching, and if the watcher lost events (or
+    there's no inotify, where it lists the directory every max_poll_interval instead). Files that can't be renamed yet
+    (i.e the engine hasn't released it's handle on Windows) are retried every max_poll_interval. It runs until merge.py
+    is done with every frame, or the session's cancelled, on a thread of it's own (SessionExecutor.submit_thread)
+    rather than holding an io slot for the whole session.
+    """
+
+    def __init__(self, context: Dandere2xServiceContext, controller: Dandere2xController, engine_suffix: str):
+        self.context = context
+        self.controller = controller
+        self.directory = context.residual_upscaled_dir
+        self.engine_suffix = engine_suffix
+
+    @cancel_on_error
+    def run(self) -> None:
+        token = self.controller.cancellation_token
+        events = FileReadyWatcher.instance().watch_directory(self.directory)
+
+        # Merge finishing the last frame, or the session being cancelled, needs to wake up the wait for files.
+        def wake(*_):
+            events.wake()
+
+        self.controller.add_progress_callback(wake)
+        token.add_callback(wake)
+        try:
+            # Watched before listing, so a file finished in between is at worst renamed (or found renamed) twice.
+            retry = self.reconcile(os.listdir(self.directory))
+
+            while not self.is_done():
+                token.raise_if_cancelled()
+
+                timeout = None if events.watching and not retry else FileReadyWatcher.max_poll_interval
+                names = events.get(timeout)
+                if names is None:
+                    names = os.listdir(self.directory)
+
+                retry = self.reconcile(retry + names)
+        finally:
+            self.controller.remove_progress_callback(wake)
+            token.remove_callback(wake)
+            events.close()
+
+    def reconcile(self, names: List[str]) -> List[str]:
+        """
+        Rename every file in 'names' still named the engine's way. Returns the names that couldn't be renamed yet.
+        """
+        retry = []
+
+        for name in names:
+            if not name.endswith(self.engine_suffix) or not name.startswith("output_"):
+                continue
+
+            path = os.path.join(self.directory, name)
+            try:
+                rename_file(path, path[:-len(self.engine_suffix)] + ".png")
+            except FileNotFoundError:
+                # Already renamed, i.e it was both listed and had an event.
+                pass
+            except PermissionError:
+                retry.append(name)
+
+        return retry
+
+    def is_done(self) -> bool:
+        return self.controller.get_current_frame() >= self.context.frame_count - 1
@@ -18,15 +18,14 @@ Purpose:
 ====================================================================="""
 import copy
 import subprocess
-import time
 from threading import Thread
 
 from dandere2x.context import Context
 
 from dandere2x.dandere2xlib import get_options_from_section
-from dandere2x.dandere2xlib.utils.dandere2x_utils import rename_file_wait, get_lexicon_value, file_exists, \
-    rename_file, wait_on_either_file
+from dandere2x.dandere2xlib.utils.dandere2x_utils import rename_file_wait
 from ..waifu2x.abstract_upscaler import AbstractUpscaler
+from ..waifu2x.output_name_reconciler import OutputNameReconciler
 
 
 class RealSRNCNNVulkan(AbstractUpscaler, Thread):
@@ -53,15 +52,12 @@ class RealSRNCNNVulkan(AbstractUpscaler, Thread):
 
     # override
     def run(self, timeout=None) -> None:
-        fix_w2x_ncnn_vulkan_names = Thread(target=self.__fix_waifu2x_ncnn_vulkan_names,
-                                           name="Waifu2xNCNNVulkan Fix Names")
-        fix_w2x_ncnn_vulkan_names.start()
+        # RealSR-ncnn-vulkan upscales "output_000001.jpg" into "output_000001.jpg.png".
+        self.controller.executor.submit_thread(OutputNameReconciler(self.context, self.controller, ".jpg.png").run)
         super().run()
 
     def join(self, timeout=None) -> None:
-
-        while self.controller.is_alive() and not self.check_if_done():
-            time.sleep(0.05)
+        self.controller.wait_for_frame(self.context.frame_count - 1, timeout)
 
     def repeated_call(self) -> None:
         """ Call the "upscale folder" command. """
@@ -122,43 +118,3 @@ class RealSRNCNNVulkan(AbstractUpscaler, Thread):
 
         waifu2x_vulkan_upscale_frame_command.extend(["-o", "[output_file]"])
         return waifu2x_vulkan_upscale_frame_command
-
-    def __fix_waifu2x_ncnn_vulkan_names(self):
-        """
-        Waifu2x-ncnn-vulkan will accept a file as "file.jpg" and output as "file.jpg.png".
-
-        Unfortunately, dandere2x wouldn't recognize this, so this function renames each name to the correct naming
-        convention. This function will iteratiate through every file needing to be upscaled waifu2x-ncnn-vulkan,
-        and change it's name after it's done saving
-
-        Comments:
-
-        - There's a really complicated try / except that exists because, even though a file may exist,
-          the file handle may still be used by waifu2x-ncnn-vulkan (it hasn't released it yet). As a result,
-          we need to try / except it until it's released, allowing us to rename it.
-
-        """
-
-        file_names = []
-        for x in range(self.start_frame, self.frame_count):
-            file_names.append("output_" + get_lexicon_value(6, x))
-
-        for file in file_names:
-            dirty_name = self.residual_upscaled_dir + file + ".jpg.png"
-            clean_name = self.residual_upscaled_dir + file + ".png"
-
-            # TODO - IMPLEMENT WITH CONTROLLER
-            wait_on_either_file(clean_name, dirty_name, self.controller)
-
-            if not self.controller.is_alive():
-                return
-
-            if file_exists(clean_name):
-                pass
-
-            elif file_exists(dirty_name):
-                while file_exists(dirty_name):
-                    try:
-                        rename_file(dirty_name, clean_name)
-                    except PermissionError:
-                        pass
@@ -18,7 +18,6 @@ Purpose: Caffe implementation of abstract_upscaler
 ====================================================================="""
 import copy
 import os
-import subprocess
 from threading import Thread
 
 from dandere2x.dandere2xlib.utils.dandere2x_utils import get_operating_system
@@ -31,7 +30,6 @@ class Waifu2xCaffe(AbstractUpscaler, Thread):
 
     def __init__(self, context: Dandere2xServiceContext, controller: Dandere2xController):
         # implementation specific
-        self.active_waifu2x_subprocess = None
         self.waifu2x_caffe_path = load_executable_paths_yaml()['waifu2x_caffe']
 
         assert get_operating_system() != "win32" or os.path.exists(self.waifu2x_caffe_path), \
@@ -54,9 +52,7 @@ class Waifu2xCaffe(AbstractUpscaler, Thread):
                 exec_command[x] = self.context.residual_upscaled_dir
 
         console_output.write(str(exec_command))
-        self.active_waifu2x_subprocess = subprocess.Popen(exec_command, shell=False, stderr=console_output,
-                                                          stdout=console_output)
-        self.active_waifu2x_subprocess.wait()
+        self._run_engine(exec_command, console_output, restarts=self.context.upscaler_restarts, check=True)
 
     # override
     def upscale_file(self, input_image: str, output_image: str) -> None:
@@ -73,9 +69,7 @@ class Waifu2xCaffe(AbstractUpscaler, Thread):
                 exec_command[x] = output_image
 
         console_output.write(str(exec_command))
-        self.active_waifu2x_subprocess = subprocess.Popen(exec_command, shell=False, stderr=console_output,
-                                                          stdout=console_output)
-        self.active_waifu2x_subprocess.wait()
+        self._run_engine(exec_command, console_output, timeout=self.context.upscale_file_timeout)
 
     # override
     def _construct_upscale_command(self) -> list:
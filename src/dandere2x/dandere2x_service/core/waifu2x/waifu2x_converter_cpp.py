@@ -18,14 +18,13 @@ Purpose:
 ====================================================================="""
 import copy
 import os
-import subprocess
 from pathlib import Path
 from threading import Thread
 
-from dandere2x.dandere2xlib.utils.dandere2x_utils import get_lexicon_value, file_exists, \
-    rename_file, wait_on_either_file, get_operating_system
+from dandere2x.dandere2xlib.utils.dandere2x_utils import get_operating_system
 from dandere2x.dandere2xlib.utils.yaml_utils import load_executable_paths_yaml, get_options_from_section
 from ..waifu2x.abstract_upscaler import AbstractUpscaler
+from ..waifu2x.output_name_reconciler import OutputNameReconciler
 from dandere2x.dandere2x_service.dandere2x_service_context import Dandere2xServiceContext
 from dandere2x.dandere2x_service.dandere2x_service_controller import Dandere2xController
 
@@ -34,7 +33,6 @@ class Waifu2xConverterCpp(AbstractUpscaler, Thread):
 
     def __init__(self, context: Dandere2xServiceContext, controller: Dandere2xController):
         # implementation specific
-        self.active_waifu2x_subprocess = None
         self.waifu2x_converter_cpp_path = load_executable_paths_yaml()['waifu2x_converter_cpp']
         self.waifu2x_converter_cpp_parent = Path(self.waifu2x_converter_cpp_path).parent
 
@@ -46,9 +44,11 @@ class Waifu2xConverterCpp(AbstractUpscaler, Thread):
 
     # override
     def run(self, timeout=None) -> None:
-        fix_names_thread = Thread(target=self.__fix_waifu2x_converter_cpp_names,
-                                  name="Waifu2x Converter CPP Fix Names")
-        fix_names_thread.start()
+        # Waifu2x-Conveter-Cpp (legacy) names it's outputs i.e "output_000001_[NS-L1][x2.000000].png".
+        # TODO, update waifu2x-conveter-cpp from legacy to newer to eliminate this renaming.
+        engine_suffix = "_[NS-L%d][x%d.000000].png" % (self.context.service_request.denoise_level,
+                                                       self.context.service_request.scale_factor)
+        self.controller.executor.submit_thread(OutputNameReconciler(self.context, self.controller, engine_suffix).run)
         super().run()
 
     # override
@@ -65,9 +65,8 @@ class Waifu2xConverterCpp(AbstractUpscaler, Thread):
                 exec_command[x] = self.context.residual_upscaled_dir
 
         console_output.write(str(exec_command))
-        self.active_waifu2x_subprocess = subprocess.Popen(exec_command, shell=False, stderr=console_output,
-                                                          stdout=console_output, cwd=self.waifu2x_converter_cpp_parent)
-        self.active_waifu2x_subprocess.wait()
+        self._run_engine(exec_command, console_output, cwd=str(self.waifu2x_converter_cpp_parent),
+                         restarts=self.context.upscaler_restarts, check=True)
 
     # override
     def upscale_file(self, input_image: str, output_image: str) -> None:
@@ -83,9 +82,8 @@ class Waifu2xConverterCpp(AbstractUpscaler, Thread):
             if exec_command[x] == "[output_file]":
                 exec_command[x] = output_image
 
-        self.active_waifu2x_subprocess = subprocess.Popen(exec_command, shell=False, stderr=console_output,
-                                                          stdout=console_output, cwd=self.waifu2x_converter_cpp_parent)
-        self.active_waifu2x_subprocess.wait()
+        self._run_engine(exec_command, console_output, cwd=str(self.waifu2x_converter_cpp_parent),
+                         timeout=self.context.upscale_file_timeout)
 
     # override
     def _construct_upscale_command(self) -> list:
@@ -104,32 +102,3 @@ class Waifu2xConverterCpp(AbstractUpscaler, Thread):
         waifu2x_converter_cpp_upscale_command.extend(["-o", "[output_file]"])
 
         return waifu2x_converter_cpp_upscale_command
-
-    # TODO, update waifu2x-conveter-cpp from legacy to newer to eliminate this subthread.
-    def __fix_waifu2x_converter_cpp_names(self):
-        """
-            Waifu2x-Conveter-Cpp (legacy) will output the file names in a format that needs to be fixed for
-            dandere2x to work. I believe this is fixed in later versions, hence the TODO
-        """
-
-        file_names = []
-        for x in range(1, self.context.frame_count):
-            file_names.append("output_" + get_lexicon_value(6, x))
-
-        for file in file_names:
-            dirty_name = self.context.residual_upscaled_dir + file + '_[NS-L' + str(
-                self.context.service_request.denoise_level) + '][x' + str(
-                self.context.service_request.scale_factor) + '.000000]' + ".png"
-            clean_name = self.context.residual_upscaled_dir + file + ".png"
-
-            wait_on_either_file(clean_name, dirty_name)
-
-            if file_exists(clean_name):
-                pass
-
-            elif file_exists(dirty_name):
-                while file_exists(dirty_name):
-                    try:
-                        rename_file(dirty_name, clean_name)
-                    except PermissionError:
-                        pass
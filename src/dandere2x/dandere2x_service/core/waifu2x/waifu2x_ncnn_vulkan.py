@@ -18,23 +18,21 @@ Purpose:
 ====================================================================="""
 import copy
 import os
-import subprocess
 from threading import Thread
 
 from dandere2x.dandere2x_service.dandere2x_service_context import Dandere2xServiceContext
 from dandere2x.dandere2x_service.dandere2x_service_controller import Dandere2xController
 
-from dandere2x.dandere2xlib.utils.dandere2x_utils import rename_file_wait, get_lexicon_value, file_exists, \
-    rename_file, wait_on_either_file, get_operating_system
+from dandere2x.dandere2xlib.utils.dandere2x_utils import rename_file_wait, get_operating_system
 from dandere2x.dandere2xlib.utils.yaml_utils import get_options_from_section, load_executable_paths_yaml
 from ..waifu2x.abstract_upscaler import AbstractUpscaler
+from ..waifu2x.output_name_reconciler import OutputNameReconciler
 
 
 class Waifu2xNCNNVulkan(AbstractUpscaler, Thread):
 
     def __init__(self, context: Dandere2xServiceContext, controller: Dandere2xController):
         # implementation specific
-        self.active_waifu2x_subprocess = None
         self.waifu2x_vulkan_path = load_executable_paths_yaml()['waifu2x_vulkan']
 
         assert get_operating_system() != "win32" or os.path.exists(self.waifu2x_vulkan_path), \
@@ -45,9 +43,8 @@ class Waifu2xNCNNVulkan(AbstractUpscaler, Thread):
 
     # override
     def run(self, timeout=None) -> None:
-        fix_w2x_ncnn_vulkan_names = Thread(target=self.__fix_waifu2x_ncnn_vulkan_names,
-                                           name="Waifu2xNCNNVulkan Fix Names")
-        fix_w2x_ncnn_vulkan_names.start()
+        # Waifu2x-ncnn-vulkan upscales "output_000001.jpg" into "output_000001.jpg.png".
+        self.controller.executor.submit_thread(OutputNameReconciler(self.context, self.controller, ".jpg.png").run)
         super().run()
 
     # override
@@ -64,10 +61,8 @@ class Waifu2xNCNNVulkan(AbstractUpscaler, Thread):
                 exec_command[x] = self.context.residual_upscaled_dir
 
         console_output.write(str(exec_command))
-        self.active_waifu2x_subprocess = subprocess.Popen(args=exec_command, shell=False,
-                                                          stderr=console_output, stdout=console_output,
-                                                          cwd=os.path.dirname(self.waifu2x_vulkan_path))
-        self.active_waifu2x_subprocess.wait()
+        self._run_engine(exec_command, console_output, cwd=os.path.dirname(self.waifu2x_vulkan_path),
+                         restarts=self.context.upscaler_restarts, check=True)
 
     # override
     def upscale_file(self, input_image: str, output_image: str) -> None:
@@ -92,10 +87,8 @@ class Waifu2xNCNNVulkan(AbstractUpscaler, Thread):
                     exec_command[x] = output_image
 
             console_output.write(str(exec_command))
-            self.active_waifu2x_subprocess = subprocess.Popen(exec_command,
-                                                              shell=False, stderr=console_output, stdout=console_output,
-                                                              cwd=os.path.dirname(self.waifu2x_vulkan_path))
-            self.active_waifu2x_subprocess.wait()
+            self._run_engine(exec_command, console_output, cwd=os.path.dirname(self.waifu2x_vulkan_path),
+                             timeout=self.context.upscale_file_timeout)
 
             if not os.path.exists(output_image):
                 self.log.info("Could not upscale first frame: printing %s console log" % __name__)
@@ -124,39 +117,3 @@ class Waifu2xNCNNVulkan(AbstractUpscaler, Thread):
 
         waifu2x_vulkan_upscale_frame_command.extend(["-o", "[output_file]"])
         return waifu2x_vulkan_upscale_frame_command
-
-    def __fix_waifu2x_ncnn_vulkan_names(self):
-        """
-        Waifu2x-ncnn-vulkan will accept a file as "file.jpg" and output as "file.jpg.png".
-
-        Unfortunately, dandere2x wouldn't recognize this, so this function renames each name to the correct naming
-        convention. This function will iteratiate through every file needing to be upscaled waifu2x-ncnn-vulkan,
-        and change it's name after it's done saving
-
-        Comments:
-
-        - There's a really complicated try / except that exists because, even though a file may exist,
-          the file handle may still be used by waifu2x-ncnn-vulkan (it hasn't released it yet). As a result,
-          we need to try / except it until it's released, allowing us to rename it.
-
-        """
-
-        file_names = []
-        for x in range(1, self.context.frame_count):
-            file_names.append("output_" + get_lexicon_value(6, x))
-
-        for file in file_names:
-            dirty_name = self.context.residual_upscaled_dir + file + ".jpg.png"
-            clean_name = self.context.residual_upscaled_dir + file + ".png"
-
-            wait_on_either_file(clean_name, dirty_name)
-
-            if file_exists(clean_name):
-                pass
-
-            elif file_exists(dirty_name):
-                while file_exists(dirty_name):
-                    try:
-                        rename_file(dirty_name, clean_name)
-                    except PermissionError:
-                        pass
@@ -2,6 +2,7 @@ import logging
 import os
 
 from dandere2x.dandere2x_service_request import Dandere2xServiceRequest
+from dandere2x.dandere2xlib.utils.resource_policy import SessionResourcePolicy
 from dandere2x.dandere2xlib.utils.yaml_utils import load_executable_paths_yaml
 from dandere2x.dandere2xlib.wrappers.ffmpeg.videosettings import VideoSettings
 
@@ -37,6 +38,8 @@ class Dandere2xServiceContext:
         self.encoded_dir = os.path.join(service_request.workspace, "encoded") + os.path.sep
         self.temp_image_folder = os.path.join(service_request.workspace, "temp_image_folder") + os.path.sep
         self.log_dir = os.path.join(service_request.workspace, "log_dir") + os.path.sep
+        self.statistics_dir = os.path.join(service_request.workspace, "statistics") + os.path.sep
+        self.scene_cuts_dir = os.path.join(service_request.workspace, "scene_cuts") + os.path.sep
 
         self.directories = {self.input_frames_dir,
                             self.correction_data_dir,
@@ -51,7 +54,9 @@ class Dandere2xServiceContext:
                             self.fade_data_dir,
                             self.encoded_dir,
                             self.temp_image_folder,
-                            self.log_dir}
+                            self.log_dir,
+                            self.statistics_dir,
+                            self.scene_cuts_dir}
 
         ffprobe_path = load_executable_paths_yaml()['ffprobe']
         video_settings = VideoSettings(ffprobe_path, self.service_request.input_file)
@@ -65,7 +70,89 @@ class Dandere2xServiceContext:
         self.temp_image = self.temp_image_folder + "tempimage.jpg"
         self.debug = False
         self.step_size = 4
-        self.max_frames_ahead = 100
+
+        # Whether block matching tries the vectors each block (and it's neighbours) moved by in the previous frame
+        # before diamond searching for it, which finds most blocks of a pan in one or two evaluations. dandere2x_cpp
+        # needs to be built with it (it's read from the 11th argument), which older builds don't.
+        self.temporal_seeding = False
+
+        # How many frames min_disk_usage.py extracts ahead of merge.py. It starts at initial_frames_ahead, and adapts
+        # to the upscaler's queue, free disk space (keeping lookahead_min_free_disk bytes free) and available memory
+        # (using at most lookahead_max_memory_fraction of it) within [min_frames_ahead, max_frames_ahead], see
+        # lookahead.py.
+        self.initial_frames_ahead = 100
+        self.min_frames_ahead = 25
+        self.max_frames_ahead = 400
+        self.lookahead_min_free_disk = 2 * 1024 ** 3
+        self.lookahead_max_memory_fraction = 0.25
+
+        # min_disk_usage.py extracts frames and deletes the files of frames merge.py is done with every this many
+        # frames, rather than every frame. At most min_frames_ahead - 3, see lookahead.py.
+        self.min_disk_batch_size = 10
+
+        # Frames whose grayscale thumbnail differs from the previous frame's by more than this (mean absolute
+        # difference, 0 - 255) are hard cuts, which skip block matching and are upscaled in full (see scene_cuts.py).
+        # 0 disables detection.
+        self.scene_cut_threshold = 40
+
+        # How residual.py packs residuals before they're upscaled:
+        #   "block"    - dandere2x_cpp's fixed block_size blocks, as is.
+        #   "quadtree" - split residual blocks into quadrants, down to quadtree_min_block_size, upscaling only the
+        #                quadrants that changed.
+        #   "region"   - merge adjacent residual blocks into rectangular regions sharing a single bleed.
+        self.residual_packing = "block"
+        self.quadtree_min_block_size = 8
+
+        # Format dandere2x_cpp (and residual.py's packed residuals) write vector files in, "binary" or "text" (see
+        # vector_utils.py). Readers detect the format themselves. "binary" needs a dandere2x_cpp built with it (which
+        # reads it from it's 9th argument) - an older one ignores the argument and writes text.
+        self.vector_format = "text"
+
+        # Whether vectors are saved as one file per frame ("files"), appended into one journal per vector type
+        # ("journal", see vector_journal.py), which saves creating / polling / deleting 4 files per frame, or streamed
+        # from dandere2x_cpp's stdout straight into memory ("pipe", see vector_stream.py). "journal" and "pipe" need a
+        # dandere2x_cpp built with them (which reads it from it's 10th argument) - an older one keeps writing a file
+        # per frame, and the session would wait on vectors that never come.
+        self.vector_storage = "files"
+
+        # What computes each frame's vectors, "dandere2x_cpp" (the dandere2x_cpp executable) or "numpy" (in-process,
+        # see block_matcher/).
+        self.block_matcher = "dandere2x_cpp"
+
+        # How the numpy block matcher searches for blocks that moved - "diamond" (dandere2x_cpp's diamond search) or
+        # "pyramid" (coarse-to-fine on downsampled frames, which finds larger motion, see pyramid_search.py).
+        self.block_search = "diamond"
+
+        # How many dandere2x_cpp instances match blocks at once. Above 1, frames are split into ranges of
+        # dandere2x_cpp_range_size frames, each matched by it's own instance, up to dandere2x_cpp_instances at a time
+        # (see Dandere2xCppWrapper.run_ranges). The first frame of every range is upscaled in full. A range is only
+        # started once min_disk_usage.py has extracted it's first frame, so ranges in flight should fit within
+        # min_frames_ahead, or fewer than dandere2x_cpp_instances instances end up running at once.
+        self.dandere2x_cpp_instances = 1
+        self.dandere2x_cpp_range_size = 25
+
+        # How many times an upscaling engine that keeps crashing is restarted before the session fails, and how many
+        # seconds upscaling a single file (i.e the first frame) may take before it's killed, see process_supervisor.py.
+        self.upscaler_restarts = 3
+        self.upscale_file_timeout = 600
+
+        # How many merged frames can be waiting on ffmpeg (the encode stage) before merge.py blocks on it.
+        self.merged_frames_buffer = 20
+
+        # How many threads the session's executor runs background io tasks (deletes, renames) and cpu tasks (decoding /
+        # encoding images) on, and tasks that mostly wait on other stages (prefetching the next upscaled image) on, see
+        # session_executor.py.
+        self.executor_io_workers = 4
+        self.executor_cpu_workers = 2
+        self.executor_wait_workers = 2
+
+        # How many frames the encode stage (pipe_thread.py) encodes as jpegs at once when piping to ffmpeg with
+        # image2pipe. They're encoded on the session's cpu pool, which gets this many more workers for them.
+        self.pipe_encoders = 4
+
+        # Which cores, nice and ionice levels each stage and program of the session runs with, from the
+        # 'resource_policy' section of output_options.yaml (see resource_policy.py).
+        self.resource_policy = SessionResourcePolicy.from_yaml(service_request.output_options.get("resource_policy"))
 
     def log_all_variables(self):
         log = logging.getLogger(name=self.service_request.input_file)
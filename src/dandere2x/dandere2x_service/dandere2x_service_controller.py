@@ -1,14 +1,133 @@
+import logging
+import threading
+from typing import Callable, Optional
+
+from dandere2x.dandere2xlib.utils.thread_utils import CancellationToken
+
+
+class SessionFailedError(Exception):
+    """ Raised out of a session (see Dandere2xServiceThread) once it's threads are stopped, if one of them failed. """
+
+    def __init__(self, failure):
+        super().__init__("Session failed: %s" % str(failure))
+        self.failure = failure
+
+
 class Dandere2xController:
     """
-    A simple thread-safe (not really) way of communicating to different parts of dandere2x what frame / the health
-    status of the current dandere2x instance.
+    A thread-safe way of communicating to different parts of dandere2x what frame / the health status of the current
+    dandere2x instance.
+
+    Threads waiting on a frame block on a condition variable (see wait_for_frame) rather than polling
+    get_current_frame, and are woken up when merge.py gets to their frame, or the session is killed / fails.
+
+    Killing or failing the session cancels cancellation_token, which every other wait (files, vectors) and subprocess
+    of the session is tied to (see thread_utils.py).
     """
 
     def __init__(self):
         self._current_frame = 1
+        self._extracted_frame = 0
+        self._condition = threading.Condition()
+
+        self.cancellation_token = CancellationToken()
+        self.cancellation_token.add_callback(self.__wake_waiters)
+
+        # Set once the session is killed (by the user) or failed (by an error), never cleared.
+        self._killed = False
+        self._failure = None
+
+        self._progress_callbacks = []
+
+        # When context.vector_storage is "pipe", the VectorStream dandere2x_cpp's vectors are streamed into.
+        self.vector_stream = None
+
+        # The SessionExecutor background tasks of the session run on.
+        self.executor = None
 
     def update_frame_count(self, set_frame: int):
-        self._current_frame = set_frame
+        with self._condition:
+            self._current_frame = set_frame
+            self._condition.notify_all()
+            callbacks = list(self._progress_callbacks)
+
+        # Called outside of the lock, so a slow callback doesn't hold up the waiting threads.
+        for callback in callbacks:
+            callback(set_frame)
 
     def get_current_frame(self):
         return self._current_frame
+
+    def wait_for_frame(self, frame: int, timeout: Optional[float] = None) -> bool:
+        """
+        Block until the current frame is at least 'frame', the session stops, or 'timeout' seconds pass.
+
+        Returns whether the current frame got to 'frame' - False means the session was killed / failed (or timed out),
+        and the waiting thread should stop.
+        """
+        with self._condition:
+            self._condition.wait_for(lambda: self._current_frame >= frame or not self.is_alive(), timeout)
+            return self._current_frame >= frame
+
+    def update_extracted_count(self, extracted_frame: int):
+        """ Signal that every frame up to (and including) 'extracted_frame' is extracted, see min_disk_usage.py. """
+        with self._condition:
+            self._extracted_frame = extracted_frame
+            self._condition.notify_all()
+
+    def wait_for_extracted(self, frame: int, timeout: Optional[float] = None) -> bool:
+        """
+        Block until 'frame' is extracted, the session stops, or 'timeout' seconds pass. Returns whether it was
+        extracted, as wait_for_frame does.
+        """
+        with self._condition:
+            self._condition.wait_for(lambda: self._extracted_frame >= frame or not self.is_alive(), timeout)
+            return self._extracted_frame >= frame
+
+    def add_progress_callback(self, callback: Callable[[int], None]):
+        """ Call callback(frame) every time the current frame changes. """
+        with self._condition:
+            self._progress_callbacks.append(callback)
+
+    def remove_progress_callback(self, callback: Callable[[int], None]):
+        with self._condition:
+            self._progress_callbacks.remove(callback)
+
+    def kill(self):
+        """ Stop the session, waking up every thread waiting on it and killing it's subprocesses. """
+        self._killed = True
+        self.cancellation_token.cancel("killed")
+
+    def fail(self, reason):
+        """
+        Stop the session because of 'reason' (an error message or exception), as kill does. Only the first failure
+        is kept, as later ones are usually the other threads being torn down.
+        """
+        if not self.is_alive():
+            return
+
+        logging.getLogger(__name__).error("Session failed: %s" % str(reason))
+        self._failure = reason
+        self.cancellation_token.cancel(reason)
+
+    def is_alive(self) -> bool:
+        return not self.cancellation_token.is_cancelled
+
+    def is_killed(self) -> bool:
+        return self._killed
+
+    def get_failure(self):
+        """ Why the session failed, or None if it hasn't. """
+        return self._failure
+
+    def raise_if_failed(self) -> None:
+        """ Raise SessionFailedError (from the failure itself, if it's an exception) if the session failed. """
+        if self._failure is None:
+            return
+
+        cause = self._failure if isinstance(self._failure, BaseException) else None
+        raise SessionFailedError(self._failure) from cause
+
+    def __wake_waiters(self):
+        with self._condition:
+            self._condition.notify_all()
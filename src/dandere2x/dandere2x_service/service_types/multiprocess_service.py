@@ -4,6 +4,7 @@ import os
 from typing import List
 
 from dandere2x.dandere2x_service.__init__ import Dandere2xServiceThread
+from dandere2x.dandere2x_service.dandere2x_service_controller import SessionFailedError
 from dandere2x.dandere2x_service.service_types.dandere2x_service_interface import Dandere2xServiceInterface
 from dandere2x.dandere2x_service_request import Dandere2xServiceRequest
 from dandere2x.dandere2xlib.utils.yaml_utils import load_executable_paths_yaml
@@ -63,8 +64,18 @@ class MultiProcessService(Dandere2xServiceInterface):
         for request in self._child_threads:
             request.start()
 
+        failures = []
         for request in self._child_threads:
-            request.join()
+            try:
+                request.join()
+            except SessionFailedError as failure:
+                # The divided videos can't be put back together without every part, so stop the other sessions too.
+                failures.append(failure)
+                for child in self._child_threads:
+                    child.kill()
+
+        if failures:
+            raise failures[0]
 
         self._on_completion()
 
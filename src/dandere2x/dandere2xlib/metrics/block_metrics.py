@@ -0,0 +1,115 @@
+"""
+Vectorized versions of the block metrics dandere2x_cpp matches blocks with (ImageUtils.h and SSIM-MSE.h), computed
+for many blocks at once. Images are (height, width, 3) uint8 arrays, and block positions (n, 2) arrays of the
+blocks' top-left (x, y) pixels.
+
+To compare every block of a frame against the same block of another frame, frame_metrics.py is far faster.
+"""
+import math
+
+import numpy as np
+from numpy.lib.stride_tricks import as_strided
+
+# Blocks are compared in chunks, so comparing every block of a 4K frame doesn't allocate gigabytes at once.
+CHUNK_SIZE = 1024
+
+# SSIM's stabilizing constants, as well as SSIM-MSE's equivalents for it's inverse mse term.
+C1 = (0.01 * 255) ** 2
+C2 = (0.03 * 255) ** 2
+D1 = (0.01 * (255 * 255)) ** 2
+D2 = (0.03 * (255 * 255)) ** 2
+
+
+def get_blocks(image: np.ndarray, positions: np.ndarray, block_size: int) -> np.ndarray:
+    """ Gather the blocks at 'positions' out of 'image', as a (n, 3, block_size, block_size) array. """
+    return get_windows(image, block_size)[positions[:, 1], positions[:, 0]]
+
+
+def get_windows(image: np.ndarray, block_size: int) -> np.ndarray:
+    """
+    A read-only view of every block_size block of 'image', as a (height - block_size + 1, width - block_size + 1, 3,
+    block_size, block_size) array indexed by the block's top-left (y, x). numpy 1.20's sliding_window_view does the
+    same, this works with older versions too.
+    """
+    height, width, channels = image.shape
+    stride_y, stride_x, stride_channel = image.strides
+    return as_strided(image, shape=(height - block_size + 1, width - block_size + 1, channels, block_size, block_size),
+                      strides=(stride_y, stride_x, stride_channel, stride_y, stride_x), writeable=False)
+
+
+def block_mse(image_a: np.ndarray, positions_a: np.ndarray,
+              image_b: np.ndarray, positions_b: np.ndarray, block_size: int) -> np.ndarray:
+    """
+    The mean squared error between image_a's blocks at positions_a and image_b's blocks at positions_b. Like
+    dandere2x_cpp's ImageUtils::mse, the squared errors of r, g and b are summed rather than averaged.
+    """
+    mse = np.empty(len(positions_a), dtype=np.float64)
+
+    for start in range(0, len(positions_a), CHUNK_SIZE):
+        blocks_a = get_blocks(image_a, positions_a[start:start + CHUNK_SIZE], block_size).astype(np.int32)
+        blocks_b = get_blocks(image_b, positions_b[start:start + CHUNK_SIZE], block_size).astype(np.int32)
+
+        difference = blocks_a - blocks_b
+        mse[start:start + CHUNK_SIZE] = np.einsum("ncij,ncij->n", difference, difference) / (block_size * block_size)
+
+    return mse
+
+
+def block_ssim_mse(image_a: np.ndarray, positions_a: np.ndarray,
+                   image_b: np.ndarray, positions_b: np.ndarray, block_size: int) -> np.ndarray:
+    """
+    dandere2x_cpp's SSIM-MSE score between image_a's blocks at positions_a and image_b's blocks at positions_b -
+    the SSIM of each color channel, weighted by an inverse mse term, averaged over r, g and b.
+
+    As in SSIM-MSE.h, the inverse mse term compares image_a and image_b at positions_a (not positions_b), so the
+    scores (and the vectors they decide on) are the same as dandere2x_cpp's.
+    """
+    return _ssim_mse(image_a, positions_a, image_b, positions_b, positions_a, block_size)
+
+
+def moving_block_ssim_mse(image_a: np.ndarray, positions_a: np.ndarray,
+                          image_b: np.ndarray, positions_b: np.ndarray, block_size: int) -> np.ndarray:
+    """
+    block_ssim_mse, but with the inverse mse term comparing the same blocks the SSIM does. This is what a moved
+    block should be judged by - block_ssim_mse judges it by how much the block in it's original position changed.
+    """
+    return _ssim_mse(image_a, positions_a, image_b, positions_b, positions_b, block_size)
+
+
+def _ssim_mse(image_a: np.ndarray, positions_a: np.ndarray, image_b: np.ndarray, positions_b: np.ndarray,
+              positions_b_mse: np.ndarray, block_size: int) -> np.ndarray:
+    scores = np.empty(len(positions_a), dtype=np.float64)
+
+    for start in range(0, len(positions_a), CHUNK_SIZE):
+        blocks_a = get_blocks(image_a, positions_a[start:start + CHUNK_SIZE], block_size).astype(np.float64)
+        blocks_b = get_blocks(image_b, positions_b[start:start + CHUNK_SIZE], block_size).astype(np.float64)
+        blocks_b_mse = get_blocks(image_b, positions_b_mse[start:start + CHUNK_SIZE], block_size).astype(np.float64)
+
+        mean_a = blocks_a.mean(axis=(2, 3), keepdims=True)
+        mean_b = blocks_b.mean(axis=(2, 3), keepdims=True)
+        deviation_a = blocks_a - mean_a
+        deviation_b = blocks_b - mean_b
+
+        variance_a = (deviation_a * deviation_a).mean(axis=(2, 3))
+        variance_b = (deviation_b * deviation_b).mean(axis=(2, 3))
+        covariance = (deviation_a * deviation_b).mean(axis=(2, 3))
+        mse = ((blocks_a - blocks_b_mse) ** 2).sum(axis=(2, 3))
+
+        mean_a, mean_b = mean_a[:, :, 0, 0], mean_b[:, :, 0, 0]
+        ssim = ((2 * mean_a * mean_b + C1) * (2 * covariance + C2)) / \
+               ((mean_a * mean_a + mean_b * mean_b + C1) * (variance_a + variance_b + C2))
+
+        scores[start:start + CHUNK_SIZE] = (ssim * (1 + D1) / (mse + D2)).mean(axis=1)
+
+    return scores
+
+
+def psnr(image_a: np.ndarray, image_b: np.ndarray) -> float:
+    """ dandere2x_cpp's ImageUtils::psnr, which (like block_mse) sums the squared errors of r, g and b. """
+    difference = image_a.astype(np.int64) - image_b.astype(np.int64)
+    mse = np.einsum("ijc,ijc->", difference, difference) / (image_a.shape[0] * image_a.shape[1])
+
+    if mse == 0:
+        return math.inf
+
+    return 20 * math.log10(255) - 10 * math.log10(mse)
@@ -0,0 +1,93 @@
+"""
+Per-block metrics of every block of a frame at once, for comparing two frames block for block (the same block of
+each). Where block_metrics.py gathers blocks at arbitrary positions, these never gather blocks - each score comes from
+the blocks' moments (sums of pixels and products of pixels), computed over the whole frame.
+
+Each moment is a single reduction over a (blocks_high, block_size, width * 3) view of the frame, adding up the rows
+of every row of blocks - with einsum for products, so neither the products nor a widened copy of the frame are ever
+stored. That leaves a (blocks_high, width * 3) array, small enough that adding up each block's columns costs nothing.
+The moments are exact integers, so scores only round once, at the end.
+
+Scores are returned as a (blocks_high, blocks_wide) grid - grid.T.ravel() puts them in dandere2x_cpp's block order
+(see pframe.get_block_positions).
+"""
+import cv2
+import numpy as np
+
+from dandere2x.dandere2xlib.metrics.block_metrics import C1, C2, D1, D2
+
+
+def block_rows(image: np.ndarray, block_size: int) -> np.ndarray:
+    """ image's whole rows of blocks, as a (blocks_high, block_size, width * 3) view (of a contiguous image). """
+    blocks_high = image.shape[0] // block_size
+    return image[:blocks_high * block_size].reshape(blocks_high, block_size, -1)
+
+
+def block_sums(image: np.ndarray, block_size: int, image_b: np.ndarray = None) -> np.ndarray:
+    """
+    The sum of every block's pixels per color channel - or given image_b, of image's pixels times image_b's - as a
+    (blocks_high, blocks_wide, 3) int64 array. Both images are uint8.
+    """
+    rows = block_rows(image, block_size)
+
+    if image_b is None:
+        # A block's column of uint8s fits a uint16 for any sane block size.
+        row_dtype = np.uint16 if block_size * 255 <= np.iinfo(np.uint16).max else np.uint32
+        row_sums = rows.sum(axis=1, dtype=row_dtype)
+    else:
+        row_sums = np.einsum("irj,irj->ij", rows, block_rows(image_b, block_size), dtype=np.uint32)
+
+    # Each block's columns are a contiguous run of every row of blocks, which reduceat adds up far faster than a sum
+    # over a (blocks_high, blocks_wide, block_size, 3) view.
+    blocks_wide = image.shape[1] // block_size
+    column_starts = np.arange(0, blocks_wide * block_size, block_size)
+
+    return np.add.reduceat(row_sums.reshape(len(row_sums), -1, 3)[:, :blocks_wide * block_size], column_starts,
+                           axis=1, dtype=np.int64)
+
+
+def block_moments(image_a: np.ndarray, image_b: np.ndarray, block_size: int):
+    """
+    Every block's (sum a, sum b, sum (a - b) * (a - b), sum a * b) per color channel, each a
+    (blocks_high, blocks_wide, 3) int64 array. Together they give sum a * a + sum b * b, which is all SSIM needs of
+    the squares.
+    """
+    image_a, image_b = np.ascontiguousarray(image_a), np.ascontiguousarray(image_b)
+    difference = cv2.absdiff(image_a, image_b)
+
+    return (block_sums(image_a, block_size), block_sums(image_b, block_size),
+            block_sums(difference, block_size, difference), block_sums(image_a, block_size, image_b))
+
+
+def frame_block_mse(image_a: np.ndarray, image_b: np.ndarray, block_size: int) -> np.ndarray:
+    """ block_mse of every block of image_a against the same block of image_b. """
+    difference = cv2.absdiff(np.ascontiguousarray(image_a), np.ascontiguousarray(image_b))
+    return block_sums(difference, block_size, difference).sum(axis=2) / (block_size * block_size)
+
+
+def frame_block_ssim(image_a: np.ndarray, image_b: np.ndarray, block_size: int) -> np.ndarray:
+    """ The SSIM of every block of image_a against the same block of image_b, averaged over r, g and b. """
+    ssim, _ = _ssim(block_moments(image_a, image_b, block_size), block_size)
+    return ssim.mean(axis=2)
+
+
+def frame_block_ssim_mse(image_a: np.ndarray, image_b: np.ndarray, block_size: int) -> np.ndarray:
+    """ block_ssim_mse of every block of image_a against the same block of image_b. """
+    ssim, mse = _ssim(block_moments(image_a, image_b, block_size), block_size)
+    return (ssim * (1 + D1) / (mse + D2)).mean(axis=2)
+
+
+def _ssim(moments, block_size: int):
+    """ Every block's per channel SSIM, and summed squared error, from it's moments. """
+    sum_a, sum_b, sum_dd, sum_ab = moments
+    pixels = block_size * block_size
+
+    mean_a, mean_b = sum_a / pixels, sum_b / pixels
+    # variance a + variance b, as SSIM only ever adds them - sum a * a + sum b * b is sum_dd + 2 * sum_ab.
+    variances = (pixels * (sum_dd + 2 * sum_ab) - sum_a * sum_a - sum_b * sum_b) / (pixels * pixels)
+    covariance = (pixels * sum_ab - sum_a * sum_b) / (pixels * pixels)
+
+    ssim = ((2 * mean_a * mean_b + C1) * (2 * covariance + C2)) / \
+           ((mean_a * mean_a + mean_b * mean_b + C1) * (variances + C2))
+
+    return ssim, sum_dd
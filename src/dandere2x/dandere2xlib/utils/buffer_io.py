@@ -0,0 +1,50 @@
+"""
+Writing buffers (numpy arrays, bytes, memoryviews) to a file descriptor without copying them, i.e frames into the
+ffmpeg pipe's stdin (see pipe_thread.py).
+"""
+import os
+from collections import deque
+from typing import Iterable
+
+# The most bytes handed to the kernel per write. ffmpeg's stdin pipe only takes what it's got room for either way, but
+# asking for less keeps each write (and so how long it blocks) bounded.
+WRITE_CHUNK_SIZE = 4 * 1024 ** 2
+
+# The most buffers os.writev is handed at once (posix only guarantees 16, linux allows 1024).
+MAX_WRITE_BUFFERS = 16
+
+
+def write_buffers(fd: int, buffers: Iterable, chunk_size: int = WRITE_CHUNK_SIZE) -> int:
+    """
+    Write every buffer in 'buffers' to 'fd', in order, returning how many bytes were written.
+
+    Buffers have to be C-contiguous (i.e numpy.ascontiguousarray), and are written from memoryviews of themselves, so
+    nothing's copied on the python side - writes that only write part of a buffer carry on from a slice of it's view.
+    Uses os.writev (up to MAX_WRITE_BUFFERS buffers per write) where there is one, and os.write otherwise (Windows).
+    """
+    views = deque(view for view in (memoryview(buffer).cast("B") for buffer in buffers) if view.nbytes)
+    total = 0
+
+    while views:
+        if hasattr(os, "writev"):
+            batch, size = [], 0
+            for view in views:
+                if len(batch) == MAX_WRITE_BUFFERS or size >= chunk_size:
+                    break
+                batch.append(view[:chunk_size - size])
+                size += batch[-1].nbytes
+            written = os.writev(fd, batch)
+        else:
+            written = os.write(fd, views[0][:chunk_size])
+
+        total += written
+
+        # drop what's been written, which may end partway into a buffer
+        while written:
+            if written >= views[0].nbytes:
+                written -= views.popleft().nbytes
+            else:
+                views[0] = views[0][written:]
+                written = 0
+
+    return total
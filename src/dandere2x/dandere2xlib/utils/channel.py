@@ -0,0 +1,100 @@
+"""
+Typed, bounded, in-memory channels between the stages of a dandere2x session, i.e merge -> encode (see
+Dandere2xServiceThread).
+"""
+import threading
+import time
+from collections import deque
+from typing import Generic, Iterator, Type, TypeVar
+
+from dandere2x.dandere2xlib.utils.thread_utils import CancellationToken
+
+T = TypeVar("T")
+
+
+class ChannelClosed(Exception):
+    """ Raised out of Channel.get once the channel's closed and every item put before that's been taken. """
+
+
+class Channel(Generic[T]):
+    """
+    Carries items of 'item_type' from one stage to the next, holding at most 'capacity' at once.
+
+    put() blocks while the channel's full, which is how a slow consumer holds up (applies backpressure to) it's
+    producer, and get() blocks while it's empty. The producer close()s the channel after it's last item, which ends
+    iterating over it once the consumer's taken every item before that. Both raise CancelledError if the session's
+    cancelled.
+    """
+
+    def __init__(self, name: str, item_type: Type[T], capacity: int, token: CancellationToken):
+        self.name = name
+        self.item_type = item_type
+        self.capacity = capacity
+        self.token = token
+
+        self.items = deque()
+        self.closed = False
+        self.condition = threading.Condition()
+        token.add_callback(self.__wake)
+
+        # How many items went through, how many times (and for how long in total) put() blocked on a full channel, and
+        # the most items it held at once.
+        self.put_count = 0
+        self.blocked_puts = 0
+        self.blocked_seconds = 0.0
+        self.high_watermark = 0
+
+    def put(self, item: T) -> None:
+        if not isinstance(item, self.item_type):
+            raise TypeError("Channel %s carries %s, not %s" % (self.name, self.item_type.__name__,
+                                                                type(item).__name__))
+
+        with self.condition:
+            if len(self.items) >= self.capacity:
+                blocked_at = time.perf_counter()
+                self.condition.wait_for(lambda: len(self.items) < self.capacity or self.token.is_cancelled)
+                self.blocked_puts += 1
+                self.blocked_seconds += time.perf_counter() - blocked_at
+
+            self.token.raise_if_cancelled()
+            if self.closed:
+                raise ValueError("Channel %s is closed" % self.name)
+
+            self.items.append(item)
+            self.put_count += 1
+            self.high_watermark = max(self.high_watermark, len(self.items))
+            self.condition.notify_all()
+
+    def get(self) -> T:
+        """ Block until there's an item, and take it. Raises ChannelClosed once there won't be any more. """
+        with self.condition:
+            self.condition.wait_for(lambda: self.items or self.closed or self.token.is_cancelled)
+            self.token.raise_if_cancelled()
+
+            if not self.items:
+                raise ChannelClosed(self.name)
+
+            item = self.items.popleft()
+            self.condition.notify_all()
+            return item
+
+    def close(self) -> None:
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+    def __iter__(self) -> Iterator[T]:
+        while True:
+            try:
+                yield self.get()
+            except ChannelClosed:
+                return
+
+    def describe(self) -> str:
+        return "%s: %d %s(s), full %d time(s) for %.2f seconds, at most %d of %d held" % (
+            self.name, self.put_count, self.item_type.__name__, self.blocked_puts, self.blocked_seconds,
+            self.high_watermark, self.capacity)
+
+    def __wake(self) -> None:
+        with self.condition:
+            self.condition.notify_all()
@@ -17,6 +17,9 @@ from sys import platform
 from pip._vendor.distlib.compat import raw_input
 from wget import bar_adaptive
 
+from dandere2x.dandere2xlib.utils.file_watcher import FileReadyWatcher
+from dandere2x.dandere2xlib.utils.thread_utils import CancellationToken
+
 
 def get_operating_system():
     if platform == "linux" or platform == "linux2":
@@ -53,15 +56,7 @@ def force_delete_directory(directory):
 
 
 def get_list_from_file_and_wait(text_file: str):
-    logger = logging.getLogger(__name__)
-    exists = exists = os.path.isfile(text_file)
-    count = 0
-    while not exists:
-        if count / 500 == 0:
-            logger.debug(text_file + " does not exist, waiting")
-        exists = os.path.isfile(text_file)
-        count += 1
-        time.sleep(.01)
+    wait_on_file(text_file)
 
     file = None
     try:
@@ -84,32 +79,18 @@ def get_list_from_file_and_wait(text_file: str):
     return text_list
 
 
-def wait_on_file(file_string: str):
-    logger = logging.getLogger(__name__)
-    exists = os.path.isfile(file_string)
-    count = 0
-    while not exists:
-        if count / 500 == 0:
-            logger.debug(file_string + " does not exist, waiting")
-        exists = os.path.isfile(file_string)
-        count += 1
-        time.sleep(.001)
+# If given a (session's) cancellation token, the wait raises CancelledError once it's cancelled.
+def wait_on_file(file_string: str, token: CancellationToken = None):
+    if not os.path.isfile(file_string):
+        logging.getLogger(__name__).debug(file_string + " does not exist, waiting")
+        FileReadyWatcher.instance().wait(file_string, token=token)
 
 
 # for renaming function, break when either file exists
-def wait_on_either_file(file_1: str, file_2: str):
-    logger = logging.getLogger(__name__)
-    exists_1 = os.path.isfile(file_1)
-    exists_2 = os.path.isfile(file_2)
-    count = 0
-    while not (exists_1 or exists_2):
-        if count / 500 == 0:
-            logger.debug(file_1 + " does not exist, waiting")
-        exists_1 = os.path.isfile(file_1)
-        exists_2 = os.path.isfile(file_2)
-
-        count += 1
-        time.sleep(.001)
+def wait_on_either_file(file_1: str, file_2: str, token: CancellationToken = None):
+    if not (os.path.isfile(file_1) or os.path.isfile(file_2)):
+        logging.getLogger(__name__).debug(file_1 + " does not exist, waiting")
+        FileReadyWatcher.instance().wait(file_1, file_2, token=token)
 
 
 # many times a file may not exist yet, so just have this function wait if it does not.
@@ -0,0 +1,86 @@
+"""
+Deleting the files of frames a session's done with, by sweeping the directories they're in rather than deleting each
+file by name.
+"""
+import os
+import re
+import threading
+from typing import List, Pattern, Tuple
+
+from dandere2x.dandere2xlib.utils.session_executor import SessionExecutor
+
+
+class FileSweeper:
+    """
+    Deletes every file of a frame at or below a threshold, out of a set of directories.
+
+    Each target is (directory, pattern, lag): files in 'directory' whose name matches 'pattern' are frame
+    int(match.group(1))'s, and are deleted once the threshold is at least that frame + 'lag'.
+
+    Sweeps run one at a time on the executor's io pool, each scanning every directory once with os.scandir. Asking for
+    a sweep while one is already running just raises the threshold the next sweep uses, so sweeps never pile up.
+    Files that couldn't be deleted (i.e still open on Windows) are under the threshold the next sweep uses too, so
+    they're retried then.
+    """
+
+    def __init__(self, executor: SessionExecutor, targets: List[Tuple[str, Pattern, int]]):
+        self.executor = executor
+        self.targets = targets
+
+        self.lock = threading.Lock()
+        self.threshold = None
+        self.swept_threshold = None
+        self.running = False
+
+    def sweep(self, threshold: int) -> None:
+        """ Delete every file of a frame at or below 'threshold' (minus it's target's lag), in the background. """
+        with self.lock:
+            if self.threshold is not None and threshold <= self.threshold:
+                return
+
+            self.threshold = threshold
+            if self.running:
+                return
+            self.running = True
+
+        self.executor.submit_io(self.__run)
+
+    def __run(self) -> None:
+        while True:
+            with self.lock:
+                if self.threshold == self.swept_threshold:
+                    self.running = False
+                    return
+                threshold = self.threshold
+
+            self.__sweep(threshold)
+
+            with self.lock:
+                self.swept_threshold = threshold
+
+    def __sweep(self, threshold: int) -> None:
+        for directory, pattern, lag in self.targets:
+            try:
+                entries = os.scandir(directory)
+            except FileNotFoundError:
+                continue
+
+            with entries:
+                for entry in entries:
+                    match = pattern.match(entry.name)
+                    if match is None or int(match.group(1)) + lag > threshold:
+                        continue
+
+                    try:
+                        os.remove(entry.path)
+                    except OSError:
+                        # Already gone, or still in use - in which case the next sweep retries it.
+                        pass
+
+
+def frame_file_pattern(prefix: str, extension: str) -> Pattern:
+    """
+    A pattern matching names starting with i.e "frame<N>.jpg" (or, with leading zeros, "output_000001.png"), see
+    FileSweeper.
+    """
+    return re.compile(re.escape(prefix) + r"(\d+)" + re.escape(extension))
@@ -0,0 +1,307 @@
+"""
+Waiting on files produced by other threads / processes (dandere2x_cpp, waifu2x, ffmpeg), without burning CPU time
+polling for them.
+
+On Linux, a single background thread listens to inotify events (through ctypes, no dependency needed) for every
+directory something is being waited on in, and wakes up the threads waiting on those files. Elsewhere (or if inotify
+can't be used) waits fall back to polling with an exponential backoff.
+
+Threads that need to know every file finished in a directory (rather than wait on particular ones) can watch it
+instead, getting the names of the files as they're finished (see DirectoryEvents).
+"""
+import ctypes
+import ctypes.util
+import logging
+import os
+import struct
+import sys
+import threading
+import time
+from collections import deque
+from typing import Callable, Iterable, List, Optional
+
+from dandere2x.dandere2xlib.utils.thread_utils import CancellationToken
+
+# inotify(7) constants.
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_CLOEXEC = 0o2000000
+
+INOTIFY_EVENT = struct.Struct("iIII")
+
+
+class DirectoryEvents:
+    """
+    The names of files finished being written into (IN_CLOSE_WRITE), or moved into (IN_MOVED_TO), a directory, in the
+    order they were. Made by FileReadyWatcher.watch_directory, and close() it once done.
+
+    Files already in the directory when it's watched don't get an event, so list them after watching it. If events
+    for the directory can't be had ('watching' is False, there's no inotify) or some were lost (the inotify queue
+    overflowed), get returns None instead, and the directory has to be listed again.
+    """
+
+    def __init__(self, watcher: "FileReadyWatcher", directory: str):
+        self.directory = directory
+
+        self.__watcher = watcher
+        self.__condition = threading.Condition()
+        self.__names = deque()
+        self.__woken = False
+        self.__missed = False
+
+    def get(self, timeout: Optional[float] = None) -> Optional[List[str]]:
+        """
+        Block until files are finished in the directory (returning their names), wake() is called or 'timeout'
+        passes (returning an empty list). Returns None if events were missed, or the directory isn't being watched.
+        """
+        with self.__condition:
+            self.__condition.wait_for(lambda: self.__names or self.__woken or self.__missed, timeout)
+
+            names = list(self.__names)
+            missed = self.__missed or not self.watching
+            self.__names.clear()
+            self.__woken = self.__missed = False
+
+        return None if missed else names
+
+    @property
+    def watching(self) -> bool:
+        """ Whether inotify is watching the directory - if not, get only ever returns None. """
+        return self.directory in self.__watcher.watched_directories
+
+    def wake(self) -> None:
+        """ Wake up get early, i.e to check if it's done waiting for files. """
+        with self.__condition:
+            self.__woken = True
+            self.__condition.notify_all()
+
+    def close(self) -> None:
+        self.__watcher.unwatch_directory(self)
+
+    def _put(self, name: str) -> None:
+        with self.__condition:
+            self.__names.append(name)
+            self.__condition.notify_all()
+
+    def _miss(self) -> None:
+        with self.__condition:
+            self.__missed = True
+            self.__condition.notify_all()
+
+
+class FileReadyWatcher:
+    """
+    Blocks threads until the files they're waiting on are ready. Use FileReadyWatcher.instance(), so every wait in
+    the process shares one inotify instance.
+
+    Waits are checked against the file system whenever a relevant event arrives (and at least every
+    'max_poll_interval' seconds, in case an event is missed, i.e a directory being re-created).
+    """
+
+    min_poll_interval = 0.001
+    max_poll_interval = 0.1
+
+    __instance = None
+    __instance_lock = threading.Lock()
+
+    @classmethod
+    def instance(cls) -> "FileReadyWatcher":
+        with cls.__instance_lock:
+            if cls.__instance is None:
+                cls.__instance = FileReadyWatcher()
+            return cls.__instance
+
+    def __init__(self):
+        self.log = logging.getLogger(__name__)
+        self.condition = threading.Condition()
+
+        # Incremented whenever an event arrives for a file that's being waited on.
+        self.generation = 0
+
+        self.watched_directories = {}  # directory -> watch descriptor
+        self.watch_descriptors = {}  # watch descriptor -> directory
+        self.waited_on = {}  # (directory, file name) -> number of waiters
+        self.directory_events = {}  # directory -> [DirectoryEvents]
+
+        self.libc = None
+        self.inotify_fd = -1
+        self.__init_inotify()
+
+    def wait(self, *files: str, timeout: Optional[float] = None,
+             token: Optional[CancellationToken] = None) -> Optional[str]:
+        """
+        Block until any of 'files' exist, returning the first one that does (or None if 'timeout' passes first).
+        """
+        found = []
+
+        def any_exists():
+            found[:] = [file for file in files if os.path.isfile(file)][:1]
+            return bool(found)
+
+        if not self.wait_until(any_exists, files, timeout, token):
+            return None
+        return found[0]
+
+    def wait_until(self, predicate: Callable[[], bool], files: Iterable[str], timeout: Optional[float] = None,
+                   token: Optional[CancellationToken] = None) -> bool:
+        """
+        Block until predicate() is true, re-checking it whenever any of 'files' are created, modified or moved into
+        place. Returns False if 'timeout' passes first, and raises CancelledError if 'token' is cancelled first
+        (noticed within max_poll_interval).
+        """
+        keys = [(os.path.dirname(os.path.abspath(file)), os.path.basename(file)) for file in files]
+        return self.__wait(predicate, keys, timeout, token)
+
+    def watch_directory(self, directory: str) -> DirectoryEvents:
+        """ Start collecting the names of files finished in 'directory', see DirectoryEvents. """
+        directory = os.path.abspath(directory)
+        self.__watch_directories([(directory, None)])
+
+        with self.condition:
+            events = DirectoryEvents(self, directory)
+            self.directory_events.setdefault(directory, []).append(events)
+        return events
+
+    def unwatch_directory(self, events: DirectoryEvents) -> None:
+        with self.condition:
+            subscribed = self.directory_events.get(events.directory, [])
+            if events in subscribed:
+                subscribed.remove(events)
+            if not subscribed:
+                self.directory_events.pop(events.directory, None)
+
+    def __wait(self, predicate: Callable[[], bool], keys: list, timeout: Optional[float],
+               token: Optional[CancellationToken]) -> bool:
+        if predicate():
+            return True
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        self.__register(keys)
+        try:
+            delay = self.min_poll_interval
+            while True:
+                with self.condition:
+                    generation = self.generation
+
+                if predicate():
+                    return True
+
+                if token is not None:
+                    token.raise_if_cancelled()
+
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+
+                if self.inotify_fd >= 0 and all(directory in self.watched_directories for directory, _ in keys):
+                    wait_time = self.max_poll_interval if remaining is None else min(self.max_poll_interval, remaining)
+                    with self.condition:
+                        self.condition.wait_for(lambda: self.generation != generation, wait_time)
+                else:
+                    # No inotify for these files - poll, backing off exponentially the longer we wait.
+                    time.sleep(delay if remaining is None else min(delay, remaining))
+                    delay = min(delay * 2, self.max_poll_interval)
+                    self.__watch_directories(keys)
+        finally:
+            self.__unregister(keys)
+
+    def __init_inotify(self):
+        if not sys.platform.startswith("linux"):
+            return
+
+        try:
+            self.libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+            self.inotify_fd = self.libc.inotify_init1(IN_CLOEXEC)
+        except (OSError, AttributeError):
+            self.inotify_fd = -1
+
+        if self.inotify_fd < 0:
+            self.log.warning("inotify is unavailable, falling back to polling for files.")
+            return
+
+        threading.Thread(target=self.__read_events, daemon=True, name="FileReadyWatcher").start()
+
+    def __register(self, keys):
+        with self.condition:
+            for key in keys:
+                self.waited_on[key] = self.waited_on.get(key, 0) + 1
+        self.__watch_directories(keys)
+
+    def __unregister(self, keys):
+        with self.condition:
+            for key in keys:
+                self.waited_on[key] -= 1
+                if not self.waited_on[key]:
+                    del self.waited_on[key]
+
+    def __watch_directories(self, keys):
+        if self.inotify_fd < 0:
+            return
+
+        with self.condition:
+            for directory, _ in keys:
+                if directory in self.watched_directories or not os.path.isdir(directory):
+                    continue
+
+                descriptor = self.libc.inotify_add_watch(self.inotify_fd, os.fsencode(directory),
+                                                         IN_CREATE | IN_MOVED_TO | IN_CLOSE_WRITE | IN_MODIFY)
+                if descriptor < 0:
+                    self.log.debug("Couldn't watch %s (errno %d)" % (directory, ctypes.get_errno()))
+                    continue
+
+                self.watched_directories[directory] = descriptor
+                self.watch_descriptors[descriptor] = directory
+
+    def __read_events(self):
+        while True:
+            try:
+                buffer = os.read(self.inotify_fd, 64 * 1024)
+            except InterruptedError:
+                continue
+
+            relevant = False
+            offset = 0
+            with self.condition:
+                while offset < len(buffer):
+                    descriptor, mask, _, name_length = INOTIFY_EVENT.unpack_from(buffer, offset)
+                    name = buffer[offset + INOTIFY_EVENT.size: offset + INOTIFY_EVENT.size + name_length]
+                    offset += INOTIFY_EVENT.size + name_length
+
+                    # Events were dropped, so every wait needs to re-check, and every watcher list it's directory.
+                    if mask & IN_Q_OVERFLOW:
+                        for subscribed in self.directory_events.values():
+                            for events in subscribed:
+                                events._miss()
+                        relevant = True
+                        continue
+
+                    directory = self.watch_descriptors.get(descriptor)
+                    if directory is None:
+                        continue
+
+                    # The directory was deleted, it'll be watched again if it's re-created and waited on.
+                    if mask & IN_IGNORED:
+                        del self.watch_descriptors[descriptor]
+                        self.watched_directories.pop(directory, None)
+                        for events in self.directory_events.get(directory, []):
+                            events._miss()
+                        relevant = True
+                        continue
+
+                    name = os.fsdecode(name.rstrip(b"\0"))
+                    if (directory, name) in self.waited_on:
+                        relevant = True
+
+                    # Directory watchers only care about files being finished, not every write to them.
+                    if mask & (IN_CLOSE_WRITE | IN_MOVED_TO):
+                        for events in self.directory_events.get(directory, []):
+                            events._put(name)
+
+                if relevant:
+                    self.generation += 1
+                    self.condition.notify_all()
@@ -0,0 +1,214 @@
+"""
+Running dandere2x's external programs (the upscaling engines, dandere2x_cpp and ffmpeg) on one asyncio event loop,
+rather than a Popen and a blocking wait() per program.
+
+The process has one ProcessSupervisor (get_process_supervisor()), whose event loop runs on it's own thread. For every
+program it supervises, it:
+
+    - streams the program's stdout / stderr line by line (splitting on '\\r' too, which ffmpeg's progress uses) into
+      the console output file the program used to write to directly, keeping the last lines for error messages.
+    - logs the lines that look like errors, and parses progress lines (i.e ffmpeg's "frame=  120 ...").
+    - kills the program if it runs longer than it's timeout.
+    - restarts it if it crashes (exits non-zero), up to it's number of restarts.
+    - kills it if the session's CancellationToken is cancelled.
+
+Threads call ProcessSupervisor.run, which blocks on the program's result. Programs dandere2x streams data to or from
+(the ffmpeg pipe, dandere2x_cpp streaming vectors) are still Popen'd by their threads.
+"""
+import asyncio
+import concurrent.futures
+import logging
+import re
+import threading
+from collections import deque
+from typing import Callable, List, Optional, Pattern, TextIO
+
+from dandere2x.dandere2xlib.utils.resource_policy import ResourcePolicy
+from dandere2x.dandere2xlib.utils.thread_utils import CancellationToken, CancelledError
+
+# Lines of a program's output logged as errors.
+ERROR_PATTERN = re.compile(r"error|failed|invalid|exception|cannot", re.IGNORECASE)
+
+# ffmpeg's progress lines, i.e "frame=  120 fps= 30 q=-1.0 size=  1024kB time=00:00:04.00 ...".
+FFMPEG_PROGRESS_PATTERN = re.compile(r"frame=\s*(\d+)")
+
+# How many of a program's last output lines are kept for error messages.
+TAIL_LINES = 20
+
+
+class ProcessError(Exception):
+    """ Raised when a supervised program exits non-zero (after all it's restarts). """
+
+
+class ProcessResult:
+
+    def __init__(self, name: str, returncode: int, restarts: int, timed_out: bool, progress: Optional[int],
+                 tail: List[str]):
+        self.name = name
+        self.returncode = returncode
+        self.restarts = restarts
+        self.timed_out = timed_out
+        self.progress = progress  # the last progress the program reported, if it's progress was parsed
+        self.tail = tail  # the program's last output lines
+
+    def describe(self) -> str:
+        reason = "timed out" if self.timed_out else "exited with code %d" % self.returncode
+        return "%s %s after %d restart(s), last output:\n%s" % (self.name, reason, self.restarts, "\n".join(self.tail))
+
+
+class ProcessSupervisor:
+
+    def __init__(self):
+        self.log = logging.getLogger(__name__)
+        self.loop = asyncio.new_event_loop()
+        threading.Thread(target=self.loop.run_forever, daemon=True, name="ProcessSupervisor").start()
+
+    def run(self, command: list, token: Optional[CancellationToken] = None, check: bool = False,
+            **kwargs) -> ProcessResult:
+        """
+        Run 'command' (see submit for the keyword arguments) and block until it's done. If 'token' is cancelled,
+        the program's killed and CancelledError is raised. If 'check', a non-zero exit raises ProcessError.
+        """
+        future = self.submit(command, **kwargs)
+
+        if token is not None:
+            cancel = future.cancel
+            token.add_callback(cancel)
+
+        try:
+            result = future.result()
+        except concurrent.futures.CancelledError:
+            raise CancelledError(token.reason if token is not None else "%s cancelled" % str(command[0]))
+        finally:
+            if token is not None:
+                token.remove_callback(cancel)
+
+        if check and result.returncode != 0:
+            raise ProcessError(result.describe())
+
+        return result
+
+    def submit(self, command: list, output: Optional[TextIO] = None, cwd: Optional[str] = None,
+               timeout: Optional[float] = None, restarts: int = 0, restart_delay: float = 1.0,
+               progress_pattern: Optional[Pattern] = None, on_progress: Optional[Callable[[int], None]] = None,
+               name: Optional[str] = None, policy: Optional[ResourcePolicy] = None) -> concurrent.futures.Future:
+        """
+        Start supervising 'command', returning a future of it's ProcessResult. Cancelling the future kills it.
+
+        Args:
+            output: Where the program's output lines are written, i.e it's console output file.
+            cwd: The directory to run the program in.
+            timeout: Seconds each run of the program may take before it's killed (and counts as a crash).
+            restarts: How many times the program is restarted if it crashes.
+            restart_delay: Seconds to wait before restarting it.
+            progress_pattern: A pattern whose first group is the program's progress, i.e FFMPEG_PROGRESS_PATTERN.
+            on_progress: Called with the progress whenever it's parsed. Called on the supervisor's thread, so should
+                         be quick.
+            name: What to call the program in logs, it's executable by default.
+            policy: The cores and priorities to run the program (and every restart of it) with, see
+                    resource_policy.py.
+        """
+        name = name or str(command[0])
+        return asyncio.run_coroutine_threadsafe(
+            self.__supervise(command, output, cwd, timeout, restarts, restart_delay, progress_pattern, on_progress,
+                             name, policy), self.loop)
+
+    async def __supervise(self, command, output, cwd, timeout, restarts, restart_delay, progress_pattern,
+                          on_progress, name, policy) -> ProcessResult:
+        attempt = 0
+        while True:
+            result = await self.__run_once(command, output, cwd, timeout, progress_pattern, on_progress, name, policy)
+            result.restarts = attempt
+
+            if result.returncode == 0:
+                return result
+
+            if attempt >= restarts:
+                self.log.warning(result.describe())
+                return result
+
+            attempt += 1
+            self.log.warning("%s %s, restarting it (%d of %d)" %
+                             (name, "timed out" if result.timed_out else "crashed (exit code %d)" % result.returncode,
+                              attempt, restarts))
+            await asyncio.sleep(restart_delay)
+
+    async def __run_once(self, command, output, cwd, timeout, progress_pattern, on_progress, name,
+                         policy) -> ProcessResult:
+        tail = deque(maxlen=TAIL_LINES)
+        progress = None
+
+        def on_line(line: str):
+            nonlocal progress
+            tail.append(line)
+
+            if output is not None:
+                output.write(line + "\n")
+
+            if progress_pattern is not None and (match := progress_pattern.search(line)):
+                progress = int(match.group(1))
+                if on_progress is not None:
+                    on_progress(progress)
+            elif ERROR_PATTERN.search(line):
+                self.log.warning("%s: %s" % (name, line))
+
+        process = await asyncio.create_subprocess_exec(*command, cwd=cwd, stdin=asyncio.subprocess.DEVNULL,
+                                                       stdout=asyncio.subprocess.PIPE,
+                                                       stderr=asyncio.subprocess.PIPE)
+        if policy is not None:
+            policy.apply_to_process(process.pid, name)
+
+        timed_out = False
+        try:
+            await asyncio.wait_for(asyncio.gather(self.__read_lines(process.stdout, on_line),
+                                                  self.__read_lines(process.stderr, on_line),
+                                                  process.wait()), timeout)
+        except asyncio.TimeoutError:
+            self.log.error("%s ran longer than %s seconds, killing it" % (name, str(timeout)))
+            timed_out = True
+            self.__kill(process)
+            await process.wait()
+        except asyncio.CancelledError:
+            self.__kill(process)
+            raise
+        finally:
+            if output is not None:
+                output.flush()
+
+        return ProcessResult(name, process.returncode, 0, timed_out, progress, list(tail))
+
+    @staticmethod
+    async def __read_lines(stream: asyncio.StreamReader, on_line: Callable[[str], None]) -> None:
+        buffer = b""
+        while chunk := await stream.read(65536):
+            *lines, buffer = re.split(rb"[\r\n]", buffer + chunk)
+            for line in lines:
+                if line.strip():
+                    on_line(line.decode("utf-8", errors="replace").rstrip())
+
+        if buffer.strip():
+            on_line(buffer.decode("utf-8", errors="replace").rstrip())
+
+    @staticmethod
+    def __kill(process: asyncio.subprocess.Process) -> None:
+        if process.returncode is not None:
+            return
+
+        try:
+            process.kill()
+        except ProcessLookupError:
+            # It exited in between.
+            pass
+
+
+_supervisor = None
+_supervisor_lock = threading.Lock()
+
+
+def get_process_supervisor() -> ProcessSupervisor:
+    """ The process' ProcessSupervisor, started the first time it's needed. """
+    global _supervisor
+    with _supervisor_lock:
+        if _supervisor is None:
+            _supervisor = ProcessSupervisor()
+        return _supervisor
@@ -0,0 +1,171 @@
+"""
+Which cores, scheduling priority (nice) and io priority (ionice) a session's stages and the programs it runs get,
+from the 'resource_policy' section of output_options.yaml, i.e:
+
+    resource_policy:
+      stages:
+        extract: {cpu_affinity: "0-1", nice: 5}
+      processes:
+        upscaler: {cpu_affinity: "2-7", nice: -5, ionice: best_effort:0}
+
+Stages are the session's child-threads (see Dandere2xServiceThread), applied to their thread once it's started.
+Processes are the programs a session runs - "upscaler", "dandere2x_cpp" and "ffmpeg_pipe" - applied once they're
+started.
+
+This only does anything on linux (nice levels work on every unix). A policy that can't be applied (i.e lowering nice
+below 0 without the permissions to) is logged and skipped, rather than failing the session.
+
+Threads and programs started from a thread inherit it's cores and priority, so i.e the ffmpeg pipe runs with the
+encode stage's policy unless "ffmpeg_pipe" has one of it's own, and the session executor's workers run with the
+policy of whichever stage first submitted enough work to start them.
+"""
+import logging
+import os
+import sys
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Set, Tuple
+
+import psutil
+
+# The session's child-threads (see Dandere2xServiceThread), and the programs it runs.
+STAGE_NAMES = {"extract", "match", "residual", "upscale", "merge", "encode", "status"}
+PROCESS_NAMES = {"upscaler", "dandere2x_cpp", "ffmpeg_pipe"}
+
+IONICE_CLASSES = {"realtime": 1, "best_effort": 2, "idle": 3}
+
+
+def parse_cores(cores) -> Set[int]:
+    """ Cores as a list ([0, 1, 4]), a single core (2), or a string of cores and ranges ("0-3,6"). """
+    if isinstance(cores, int):
+        return {cores}
+
+    if isinstance(cores, (list, tuple)):
+        return {int(core) for core in cores}
+
+    parsed = set()
+    for part in str(cores).split(","):
+        part = part.strip()
+        if "-" in part:
+            first, last = part.split("-")
+            parsed.update(range(int(first), int(last) + 1))
+        elif part:
+            parsed.add(int(part))
+
+    return parsed
+
+
+def parse_ionice(ionice) -> Tuple[int, Optional[int]]:
+    """ "idle", or "realtime" / "best_effort" with an optional level 0 (highest) - 7, i.e "best_effort:4". """
+    ioclass, _, level = str(ionice).partition(":")
+    if ioclass not in IONICE_CLASSES:
+        raise ValueError("Unknown ionice class %s, expected one of %s" % (ioclass, ", ".join(IONICE_CLASSES)))
+
+    return IONICE_CLASSES[ioclass], int(level) if level else None
+
+
+@dataclass
+class ResourcePolicy:
+    cpu_affinity: Optional[Set[int]] = None
+    nice: Optional[int] = None
+    ionice: Optional[Tuple[int, Optional[int]]] = None  # (class, level)
+
+    @classmethod
+    def from_yaml(cls, section: Optional[dict]) -> "ResourcePolicy":
+        if not section:
+            return cls()
+
+        unknown = set(section) - {"cpu_affinity", "nice", "ionice"}
+        if unknown:
+            raise ValueError("Unknown resource policy setting(s) %s" % ", ".join(sorted(unknown)))
+
+        return cls(cpu_affinity=parse_cores(section["cpu_affinity"]) if section.get("cpu_affinity") is not None
+                   else None,
+                   nice=int(section["nice"]) if section.get("nice") is not None else None,
+                   ionice=parse_ionice(section["ionice"]) if section.get("ionice") is not None else None)
+
+    def is_empty(self) -> bool:
+        return self.cpu_affinity is None and self.nice is None and self.ionice is None
+
+    def apply_to_process(self, pid: int, name: str) -> None:
+        """ Apply the policy to process 'pid' and every thread it already has. 'name' is what to call it in logs. """
+        if self.is_empty():
+            return
+
+        try:
+            tasks = [thread.id for thread in psutil.Process(pid).threads()]
+        except psutil.Error:
+            # It already exited, which __apply logs.
+            tasks = [pid]
+
+        self.__apply(tasks, name)
+
+    def apply_to_thread(self, native_id: int, name: str) -> None:
+        """ Apply the policy to just the thread 'native_id' (threading.Thread.native_id) of this process. """
+        self.__apply([native_id], name)
+
+    def __apply(self, tasks: List[int], name: str) -> None:
+        if self.is_empty() or not sys.platform.startswith("linux"):
+            return
+
+        log = logging.getLogger(__name__)
+
+        # linux schedules threads and processes alike (as tasks), so each of these only applies to the task given.
+        for task in tasks:
+            try:
+                if self.cpu_affinity is not None:
+                    os.sched_setaffinity(task, self.cpu_affinity)
+                if self.nice is not None:
+                    os.setpriority(os.PRIO_PROCESS, task, self.nice)
+                if self.ionice is not None:
+                    psutil.Process(task).ionice(*self.ionice)
+            except (OSError, psutil.Error, ValueError) as e:
+                log.warning("Couldn't apply the resource policy (%s) to %s: %s" % (self.describe(), name, str(e)))
+                return
+
+        log.debug("Applied the resource policy (%s) to %s" % (self.describe(), name))
+
+    def describe(self) -> str:
+        settings = []
+        if self.cpu_affinity is not None:
+            settings.append("cores " + ",".join(str(core) for core in sorted(self.cpu_affinity)))
+        if self.nice is not None:
+            settings.append("nice %d" % self.nice)
+        if self.ionice is not None:
+            ioclass = next(name for name, value in IONICE_CLASSES.items() if value == self.ionice[0])
+            settings.append("ionice " + ioclass + (":%d" % self.ionice[1] if self.ionice[1] is not None else ""))
+        return ", ".join(settings) or "none"
+
+
+class SessionResourcePolicy:
+    """ Every stage's and process' ResourcePolicy. Stages and processes without one get an empty policy. """
+
+    def __init__(self, stages: Dict[str, ResourcePolicy], processes: Dict[str, ResourcePolicy]):
+        self.stages = stages
+        self.processes = processes
+
+    @classmethod
+    def from_yaml(cls, section: Optional[dict]) -> "SessionResourcePolicy":
+        section = section or {}
+        return cls(cls.__load(section.get("stages"), STAGE_NAMES, "stage"),
+                   cls.__load(section.get("processes"), PROCESS_NAMES, "process"))
+
+    def stage(self, name: str) -> ResourcePolicy:
+        return self.stages.get(name, ResourcePolicy())
+
+    def process(self, name: str) -> ResourcePolicy:
+        return self.processes.get(name, ResourcePolicy())
+
+    def __repr__(self):
+        policies = ["%s: %s" % (name, policy.describe()) for name, policy in {**self.stages, **self.processes}.items()
+                    if not policy.is_empty()]
+        return "{%s}" % "; ".join(policies)
+
+    @staticmethod
+    def __load(section: Optional[dict], names: Set[str], kind: str) -> Dict[str, ResourcePolicy]:
+        policies = {}
+        for name, policy in (section or {}).items():
+            if name not in names:
+                raise ValueError("Unknown %s %s in resource_policy, expected one of %s" %
+                                 (kind, name, ", ".join(sorted(names))))
+            policies[name] = ResourcePolicy.from_yaml(policy)
+        return policies
@@ -0,0 +1,56 @@
+"""
+Detecting hard cuts (scene changes) as frames are extracted, and marking them for the rest of dandere2x.
+
+On a cut, block matching searches every block in vain, and the frame is upscaled in full anyways. Frames are
+compared by the mean absolute difference of their grayscale thumbnails, which costs a fraction of a millisecond per
+frame, and every cut frame gets an empty marker file ("cut_<frame>") in the workspace's scene_cuts directory. The
+marker is written before the frame itself is, so whatever waits on a frame can check for it's marker right after.
+
+dandere2x_cpp checks for the same markers (see Driver.h).
+"""
+import os
+
+import cv2
+import numpy as np
+
+# Frames are compared at this (width, height), which is plenty to tell two scenes apart.
+THUMBNAIL_SIZE = (64, 36)
+
+
+class SceneCutDetector:
+    """ Compares every frame it's given to the one before it. """
+
+    def __init__(self, threshold: float):
+        """
+        Args:
+            threshold: The mean absolute difference (0 - 255) of two frames' thumbnails above which the second
+                       frame is a cut. 0 disables detection.
+        """
+        self.threshold = threshold
+        self.previous_thumbnail = None
+
+    def is_cut(self, image: np.ndarray) -> bool:
+        """ Whether 'image' (an opencv BGR image) starts a new scene. The first frame never does. """
+        if self.threshold <= 0:
+            return False
+
+        grayscale = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        thumbnail = cv2.resize(grayscale, THUMBNAIL_SIZE, interpolation=cv2.INTER_AREA).astype(np.int16)
+
+        previous_thumbnail, self.previous_thumbnail = self.previous_thumbnail, thumbnail
+        if previous_thumbnail is None:
+            return False
+
+        return np.abs(thumbnail - previous_thumbnail).mean() > self.threshold
+
+
+def get_scene_cut_file(scene_cuts_dir: str, frame: int) -> str:
+    return scene_cuts_dir + "cut_" + str(frame)
+
+
+def mark_scene_cut(scene_cuts_dir: str, frame: int) -> None:
+    open(get_scene_cut_file(scene_cuts_dir, frame), "w").close()
+
+
+def is_scene_cut(scene_cuts_dir: str, frame: int) -> bool:
+    return os.path.isfile(get_scene_cut_file(scene_cuts_dir, frame))
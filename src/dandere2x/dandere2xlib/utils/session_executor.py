@@ -0,0 +1,134 @@
+"""
+The thread pools a dandere2x session runs it's background tasks on, rather than starting a thread per task.
+
+A session has one SessionExecutor (Dandere2xController.executor), with three pools:
+
+    - io:  deleting / renaming files and waiting on them (min_disk_usage.py's deletes, the upscalers' name fixing and
+           residual image removal).
+    - cpu: decoding / encoding images (merge.py's prefetch of the next upscaled residual image, and pipe_thread.py
+           encoding frames as jpegs).
+    - wait: tasks that spend their time blocked on another stage rather than doing io / cpu work (merge.py waiting
+            on the next upscaled residual image to prefetch).
+
+Each pool is bounded per session (its max_workers), and the io and cpu pools of every session share a process-wide
+bound too (PROCESS_IO_LIMIT / PROCESS_CPU_LIMIT tasks running at once), so running many sessions in one process (i.e
+multiprocess_service.py) can't oversubscribe it. The wait pool doesn't, as a blocked task holding one of the process'
+slots would hold up every session's io / cpu work for as long as it's blocked.
+
+Tasks that run for as long as the session does (the upscalers' residual image removal and output name reconciling)
+get a thread of their own instead (submit_thread), rather than holding a pool's worker for the whole session.
+"""
+import logging
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable
+
+PROCESS_IO_LIMIT = 32
+PROCESS_CPU_LIMIT = os.cpu_count() or 4
+
+_process_io_slots = threading.BoundedSemaphore(PROCESS_IO_LIMIT)
+_process_cpu_slots = threading.BoundedSemaphore(PROCESS_CPU_LIMIT)
+
+
+class SessionExecutor:
+
+    def __init__(self, io_workers: int, cpu_workers: int, name: str = "session", wait_workers: int = 2):
+        self.log = logging.getLogger(__name__)
+        self.name = name
+        self.io_pool = ThreadPoolExecutor(max_workers=io_workers, thread_name_prefix=name + " io")
+        self.cpu_pool = ThreadPoolExecutor(max_workers=min(cpu_workers, PROCESS_CPU_LIMIT),
+                                           thread_name_prefix=name + " cpu")
+        self.wait_pool = ThreadPoolExecutor(max_workers=wait_workers, thread_name_prefix=name + " wait")
+
+        self.threads = []
+        self.threads_lock = threading.Lock()
+
+        # Pool tasks that haven't finished, so shutdown can cancel the ones that haven't started (ThreadPoolExecutor's
+        # cancel_futures needs python 3.9).
+        self.pending = set()
+        self.pending_lock = threading.Lock()
+
+    def submit_io(self, fn: Callable, *args, **kwargs) -> Future:
+        """ Run fn(*args, **kwargs) on the io pool. """
+        return self.__submit(self.io_pool, _process_io_slots, fn, args, kwargs)
+
+    def submit_cpu(self, fn: Callable, *args, **kwargs) -> Future:
+        """ Run fn(*args, **kwargs) on the cpu pool. """
+        return self.__submit(self.cpu_pool, _process_cpu_slots, fn, args, kwargs)
+
+    def submit_wait(self, fn: Callable, *args, **kwargs) -> Future:
+        """
+        Run fn(*args, **kwargs) on the wait pool, which isn't bounded process-wide. fn should only block on other
+        stages, and submit any io / cpu work it does once it's done waiting to the other pools.
+        """
+        return self.__track(self.wait_pool.submit(fn, *args, **kwargs))
+
+    def submit_thread(self, fn: Callable, *args, **kwargs) -> Future:
+        """
+        Run fn(*args, **kwargs) on a thread of it's own, for tasks that run (mostly blocked) for as long as the session
+        does. shutdown(wait=True) joins it.
+        """
+        future = Future()
+
+        def run():
+            if not future.set_running_or_notify_cancel():
+                return
+            try:
+                future.set_result(fn(*args, **kwargs))
+            except BaseException as error:
+                future.set_exception(error)
+
+        thread = threading.Thread(target=run, daemon=True,
+                                  name="%s %s" % (self.name, getattr(fn, "__qualname__", "task")))
+        with self.threads_lock:
+            self.threads.append(thread)
+        future.add_done_callback(self.__log_error)
+        thread.start()
+        return future
+
+    def shutdown(self, wait: bool = True, cancel_pending: bool = False) -> None:
+        """
+        Stop accepting tasks, and (if 'wait') block until the running ones finish. 'cancel_pending' drops the tasks
+        that haven't started yet, i.e when the session is cancelled.
+        """
+        if cancel_pending:
+            with self.pending_lock:
+                pending = list(self.pending)
+            # Only cancels the tasks that haven't started, the running ones carry on.
+            for future in pending:
+                future.cancel()
+
+        self.io_pool.shutdown(wait=wait)
+        self.cpu_pool.shutdown(wait=wait)
+        self.wait_pool.shutdown(wait=wait)
+
+        if wait:
+            with self.threads_lock:
+                threads = list(self.threads)
+            for thread in threads:
+                thread.join()
+
+    def __submit(self, pool: ThreadPoolExecutor, process_slots: threading.BoundedSemaphore, fn: Callable, args,
+                 kwargs) -> Future:
+        def task():
+            with process_slots:
+                return fn(*args, **kwargs)
+
+        return self.__track(pool.submit(task))
+
+    def __track(self, future: Future) -> Future:
+        with self.pending_lock:
+            self.pending.add(future)
+        future.add_done_callback(self.__done)
+        return future
+
+    def __done(self, future: Future) -> None:
+        with self.pending_lock:
+            self.pending.discard(future)
+        self.__log_error(future)
+
+    def __log_error(self, future: Future) -> None:
+        # Tasks nobody waits on the result of (i.e deletes) would otherwise fail silently.
+        if not future.cancelled() and future.exception() is not None:
+            self.log.debug("Background task raised %s" % repr(future.exception()))
@@ -1,6 +1,122 @@
+"""
+Cancelling a dandere2x session - every thread, wait and subprocess of it - at once.
+
+A session has one CancellationToken (Dandere2xController.cancellation_token). Waits on files, vectors or frames
+check it (and are woken up when it's cancelled), subprocesses are registered with it so they're killed when it's
+cancelled, and pipeline threads' run() methods are decorated with cancel_on_error, so any thread crashing cancels the
+whole session rather than leaving the others waiting on it forever.
+"""
+import functools
+import logging
+import subprocess
+import threading
+import weakref
+from typing import Callable, Optional
+
+
+class CancelledError(Exception):
+    """ Raised out of a wait when the session it's waiting in was cancelled. """
+
+
 class CancellationToken:
     def __init__(self):
-        self.is_cancelled = False
+        self.reason = None
+
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks = []
+
+        # Processes are only weakly referenced, so finished ones don't pile up over a long session.
+        self._processes = weakref.WeakSet()
+
+    @property
+    def is_cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self, reason=None) -> bool:
+        """
+        Cancel the token, killing every registered process and calling every callback. Returns False if it was
+        already cancelled, in which case nothing happens.
+        """
+        with self._lock:
+            if self._event.is_set():
+                return False
+
+            self.reason = reason
+            self._event.set()
+            processes, callbacks = list(self._processes), list(self._callbacks)
+
+        for process in processes:
+            kill_process(process)
+
+        for callback in callbacks:
+            callback()
+
+        return True
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """ Block until the token is cancelled, or 'timeout' passes. Returns whether it was cancelled. """
+        return self._event.wait(timeout)
+
+    def raise_if_cancelled(self) -> None:
+        if self._event.is_set():
+            raise CancelledError(self.reason)
+
+    def add_callback(self, callback: Callable[[], None]) -> None:
+        """ Call callback() when the token is cancelled (right away, if it already is). """
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return
+
+        callback()
+
+    def remove_callback(self, callback: Callable[[], None]) -> None:
+        """ Stop calling callback() when the token is cancelled, i.e once whatever it was cancelling is done. """
+        with self._lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+
+    def register_process(self, process: subprocess.Popen) -> None:
+        """ Kill 'process' when the token is cancelled (right away, if it already is). """
+        with self._lock:
+            if not self._event.is_set():
+                self._processes.add(process)
+                return
+
+        kill_process(process)
+
+
+def kill_process(process: subprocess.Popen) -> None:
+    """ Kill 'process' if it's still running. """
+    if process.poll() is not None:
+        return
+
+    try:
+        process.kill()
+    except OSError:
+        # It exited in between.
+        pass
+
+
+def cancel_on_error(run):
+    """
+    Decorates a pipeline thread's run() (or any method of an object with a 'controller'), so that an exception out of
+    it fails the session - cancelling every other thread and subprocess - and re-raises it. Once the session's
+    cancelled, exceptions are just the thread being woken up out of a wait (or a killed subprocess), so the thread
+    ends quietly instead.
+    """
+
+    @functools.wraps(run)
+    def wrapper(self, *args, **kwargs):
+        try:
+            return run(self, *args, **kwargs)
+        except Exception as error:
+            if self.controller.is_alive():
+                self.controller.fail(error)
+                raise
+
+            logging.getLogger(__name__).debug("%s stopped, the session was cancelled (%s)" %
+                                              (threading.current_thread().name, repr(error)))
 
-    def cancel(self):
-        self.is_cancelled = True
+    return wrapper
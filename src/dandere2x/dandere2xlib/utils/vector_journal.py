@@ -0,0 +1,128 @@
+"""
+A single append-only file holding every frame's vectors of one data type (pframe, residual, correction, fade or
+packed), as an alternative to one vector file per frame (see vector_utils.py).
+
+Layout (little-endian), shared with dandere2x_cpp's VectorJournal:
+
+    header:  b"D2XJ" | version (uint16) = 1 | reserved (uint16) | frame_count (uint32) | reserved (uint32)
+    index:   (frame_count + 1) fixed size entries, one per frame:
+             offset (uint64) | count (uint32) | ready (uint32)
+    records: int32 arrays, appended in the order they're computed.
+
+Records are written before their index entry, and 'ready' is set last, so readers can find frame x's vectors in
+O(1) without ever seeing a half-written record.
+"""
+import logging
+import mmap
+import os
+import struct
+
+import numpy as np
+
+from dandere2x.dandere2xlib.utils.file_watcher import FileReadyWatcher
+from dandere2x.dandere2xlib.utils.thread_utils import CancellationToken
+
+JOURNAL_MAGIC = b"D2XJ"
+JOURNAL_VERSION = 1
+JOURNAL_HEADER = struct.Struct("<4sHHII")
+JOURNAL_INDEX_ENTRY = struct.Struct("<QII")
+
+
+class VectorJournal:
+    """
+    Reads (and, for vectors produced by dandere2x itself, appends to) a vector journal. Readers map the journal
+    into memory, so loading a frame's vectors is an index lookup plus a zero-copy np.frombuffer.
+
+    Instances aren't thread safe, each thread should use it's own.
+    """
+
+    def __init__(self, journal_file: str, frame_count: int):
+        self.journal_file = journal_file
+        self.frame_count = frame_count
+        self.index_size = JOURNAL_HEADER.size + (frame_count + 1) * JOURNAL_INDEX_ENTRY.size
+
+        self.__writer = None
+        self.__reader = None
+        self.__mapped = None
+
+    def append(self, frame: int, values) -> None:
+        """ Append frame's vectors to the end of the journal, then publish them in the index. """
+        if not self.__writer:
+            self.__open_writer()
+
+        vectors = np.asarray(values, dtype="<i4")
+
+        self.__writer.seek(0, os.SEEK_END)
+        offset = self.__writer.tell()
+        self.__writer.write(vectors.tobytes())
+        self.__writer.flush()
+
+        self.__writer.seek(JOURNAL_HEADER.size + frame * JOURNAL_INDEX_ENTRY.size)
+        self.__writer.write(JOURNAL_INDEX_ENTRY.pack(offset, len(vectors), 1))
+        self.__writer.flush()
+
+    def read(self, frame: int):
+        """ Return frame's vectors as a 1-d int32 array, or None if they haven't been written yet. """
+        if not self.__mapped and not self.__open_reader():
+            return None
+
+        offset, count, ready = JOURNAL_INDEX_ENTRY.unpack_from(
+            self.__mapped, JOURNAL_HEADER.size + frame * JOURNAL_INDEX_ENTRY.size)
+        if not ready:
+            return None
+
+        # The journal grew since it was mapped, so map it again. Arrays from the previous map keep it alive.
+        if offset + count * 4 > len(self.__mapped):
+            self.__mapped = mmap.mmap(self.__reader.fileno(), 0, access=mmap.ACCESS_READ)
+
+        return np.frombuffer(self.__mapped, dtype="<i4", count=count, offset=offset)
+
+    def read_and_wait(self, frame: int, token: CancellationToken = None) -> np.ndarray:
+        """ The journal counter-part of get_vectors_from_file_and_wait. """
+        vectors = []
+
+        def frame_written():
+            vectors[:] = [self.read(frame)]
+            return vectors[0] is not None
+
+        if not frame_written():
+            logging.getLogger(__name__).debug("frame %d of %s does not exist, waiting" % (frame, self.journal_file))
+            FileReadyWatcher.instance().wait_until(frame_written, [self.journal_file], token=token)
+
+        return vectors[0]
+
+    def close(self) -> None:
+        if self.__writer:
+            self.__writer.close()
+        if self.__reader:
+            self.__reader.close()
+        self.__writer = self.__reader = self.__mapped = None
+
+    def __open_writer(self):
+        """ Re-use the journal if it exists (i.e resuming a session), otherwise create it with an empty index. """
+        if not self.__is_valid_journal():
+            with open(self.journal_file, "wb") as file:
+                file.write(bytes(self.index_size))
+
+        self.__writer = open(self.journal_file, "r+b")
+
+        # The header goes in last, so readers don't read the index before it fully exists.
+        self.__writer.write(JOURNAL_HEADER.pack(JOURNAL_MAGIC, JOURNAL_VERSION, 0, self.frame_count, 0))
+        self.__writer.flush()
+
+    def __open_reader(self) -> bool:
+        if not self.__is_valid_journal():
+            return False
+
+        self.__reader = open(self.journal_file, "rb")
+        self.__mapped = mmap.mmap(self.__reader.fileno(), 0, access=mmap.ACCESS_READ)
+        return True
+
+    def __is_valid_journal(self) -> bool:
+        if not os.path.isfile(self.journal_file) or os.path.getsize(self.journal_file) < self.index_size:
+            return False
+
+        with open(self.journal_file, "rb") as file:
+            magic, version, _, frame_count, _ = JOURNAL_HEADER.unpack(file.read(JOURNAL_HEADER.size))
+
+        return magic == JOURNAL_MAGIC and version == JOURNAL_VERSION and frame_count == self.frame_count
@@ -0,0 +1,98 @@
+"""
+Vectors streamed from dandere2x_cpp over a pipe (its stdout), rather than through the filesystem.
+
+Every record is framed (little-endian), shared with dandere2x_cpp's VectorPipe:
+
+    frame (int32) | type (uint32) | count (uint32) | count * int32
+"""
+import struct
+import threading
+from typing import BinaryIO, Dict, Iterable, Iterator, Optional, Tuple
+
+import numpy as np
+
+RECORD_HEADER = struct.Struct("<iII")
+RECORD_TYPES = {1: "pframe", 2: "residual", 3: "correction", 4: "fade"}
+
+
+class VectorStream:
+    """
+    Demultiplexes the records dandere2x_cpp streams into in-memory queues, keyed by (data type, frame).
+
+    Each data type is read by a known number of threads ('readers', i.e pframe vectors are read by both residual.py
+    and merge.py), so records are dropped once every reader has taken them.
+
+    Data types are closed by whoever produces them, i.e dandere2x_cpp's (RECORD_TYPES) once it exits, and residual.py's
+    packed residuals once it's done, so one producer finishing doesn't end the stream for the others.
+    """
+
+    def __init__(self, readers: Dict[str, int]):
+        self.readers = readers
+        self.condition = threading.Condition()
+        self.records = {}  # (data type, frame) -> [vectors, reads remaining]
+
+        # Whether every data type is closed (i.e the session was cancelled), and which data types are otherwise.
+        self.closed = False
+        self.closed_types = set()
+
+    def put(self, data_type: str, frame: int, vectors: np.ndarray) -> None:
+        with self.condition:
+            self.records[(data_type, frame)] = [vectors, self.readers.get(data_type, 1)]
+            self.condition.notify_all()
+
+    def get(self, data_type: str, frame: int, timeout: Optional[float] = None) -> np.ndarray:
+        """
+        Block until frame's vectors of data_type arrive. Raises EOFError if the stream ends without them, or
+        TimeoutError if 'timeout' passes first.
+        """
+        key = (data_type, frame)
+        with self.condition:
+            if not self.condition.wait_for(lambda: key in self.records or self.is_closed(data_type), timeout):
+                raise TimeoutError("Timed out waiting for %s vectors of frame %d" % (data_type, frame))
+
+            if key not in self.records:
+                raise EOFError("Vector stream closed before %s vectors of frame %d arrived" % (data_type, frame))
+
+            record = self.records[key]
+            record[1] -= 1
+            if record[1] <= 0:
+                del self.records[key]
+            return record[0]
+
+    def close(self, data_types: Optional[Iterable[str]] = None) -> None:
+        """ End the stream of 'data_types', or of every data type if not given. """
+        with self.condition:
+            if data_types is None:
+                self.closed = True
+            else:
+                self.closed_types.update(data_types)
+            self.condition.notify_all()
+
+    def is_closed(self, data_type: str) -> bool:
+        return self.closed or data_type in self.closed_types
+
+    def read_records(self, stream: BinaryIO) -> None:
+        """
+        Read records from 'stream' (dandere2x_cpp's stdout) until it ends, putting each into the matching queue, then
+        close dandere2x_cpp's data types.
+        """
+        try:
+            for data_type, frame, vectors in iter_records(stream):
+                self.put(data_type, frame, vectors)
+        finally:
+            self.close(RECORD_TYPES.values())
+
+
+def iter_records(stream: BinaryIO) -> Iterator[Tuple[str, int, np.ndarray]]:
+    """ Yield (data type, frame, vectors) for every record in 'stream', until it ends. """
+    while True:
+        header = stream.read(RECORD_HEADER.size)
+        if len(header) < RECORD_HEADER.size:
+            return
+
+        frame, record_type, count = RECORD_HEADER.unpack(header)
+        payload = stream.read(count * 4)
+        if len(payload) < count * 4:
+            return
+
+        yield RECORD_TYPES[record_type], frame, np.frombuffer(payload, dtype="<i4")
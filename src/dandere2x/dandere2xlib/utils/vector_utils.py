@@ -0,0 +1,85 @@
+"""
+Reading / writing the vector files (pframe, residual, correction, fade) shared between dandere2x_cpp and dandere2x.
+
+Two formats are supported, and readers detect which one a file is in, so the writer decides:
+
+    - text:   dandere2x_cpp's original format, one value per line.
+    - binary: a 12 byte header followed by a little-endian integer array:
+
+        offset  size  field
+        0       4     magic, b"D2XV"
+        4       2     version (uint16), currently 1
+        6       2     dtype (uint16), 1 = int16, 2 = int32
+        8       4     count (uint32), number of values that follow
+
+      int32 payloads are loaded zero-copy with np.frombuffer.
+"""
+import logging
+import struct
+
+import numpy as np
+
+from dandere2x.dandere2xlib.utils.dandere2x_utils import rename_file, wait_on_file
+from dandere2x.dandere2xlib.utils.thread_utils import CancellationToken
+
+VECTOR_FILE_MAGIC = b"D2XV"
+VECTOR_FILE_VERSION = 1
+VECTOR_FILE_HEADER = struct.Struct("<4sHHI")
+VECTOR_FILE_DTYPES = {1: np.dtype("<i2"), 2: np.dtype("<i4")}
+
+
+def decode_vectors(data: bytes) -> np.ndarray:
+    """ Decode the contents of a vector file (in either format) into a 1-d integer array. """
+    if data[:len(VECTOR_FILE_MAGIC)] != VECTOR_FILE_MAGIC:
+        # dandere2x_cpp's fade scalars are doubles, hence parsing as floats first.
+        return np.array(data.split(), dtype=np.float64).astype(np.int32)
+
+    magic, version, dtype_code, count = VECTOR_FILE_HEADER.unpack_from(data)
+    if version != VECTOR_FILE_VERSION or dtype_code not in VECTOR_FILE_DTYPES:
+        raise ValueError("Unsupported vector file (version %d, dtype %d)" % (version, dtype_code))
+
+    vectors = np.frombuffer(data, dtype=VECTOR_FILE_DTYPES[dtype_code], count=count,
+                            offset=VECTOR_FILE_HEADER.size)
+
+    # int16 payloads are widened, as scaling int16 coordinates (i.e x * scale_factor) can overflow.
+    if dtype_code == 1:
+        return vectors.astype(np.int32)
+
+    return vectors
+
+
+def encode_vectors(values) -> bytes:
+    """ Encode a list / array of integers into the binary vector format. """
+    vectors = np.asarray(values, dtype="<i4")
+    return VECTOR_FILE_HEADER.pack(VECTOR_FILE_MAGIC, VECTOR_FILE_VERSION, 2, len(vectors)) + vectors.tobytes()
+
+
+def write_vector_file(vector_file: str, values, binary: bool = True) -> None:
+    """
+    Write 'values' into vector_file. Like dandere2x_cpp, save it as '.temp' first so it isn't read before it's
+    done writing.
+    """
+    if binary:
+        with open(vector_file + ".temp", "wb") as file:
+            file.write(encode_vectors(values))
+    else:
+        with open(vector_file + ".temp", "w") as file:
+            for value in values:
+                file.write(str(int(value)) + "\n")
+
+    rename_file(vector_file + ".temp", vector_file)
+
+
+def get_vectors_from_file_and_wait(vector_file: str, token: CancellationToken = None) -> np.ndarray:
+    """
+    The array counter-part of get_list_from_file_and_wait - waits for vector_file to exist, then loads it as a
+    1-d integer array regardless of which format it was written in.
+    """
+    wait_on_file(vector_file, token)
+
+    while True:
+        try:
+            with open(vector_file, "rb") as file:
+                return decode_vectors(file.read())
+        except PermissionError:
+            logging.info("permission error on file" + vector_file)
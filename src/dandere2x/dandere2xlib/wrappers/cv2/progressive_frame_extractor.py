@@ -1,16 +1,19 @@
 import cv2
 
 from dandere2x.dandere2xlib.utils.dandere2x_utils import rename_file_wait
+from dandere2x.dandere2xlib.utils.scene_cuts import SceneCutDetector, mark_scene_cut
 
 
 class ProgressiveFramesExtractorCV2:
     """
     Temporally extract frames from a video each time next_frame is called.
     Saves into dandere2x's inputs DIR.
+
+    If given a scene_cuts_dir, frames that start a new scene are marked there (see scene_cuts.py).
     """
 
     def __init__(self, input_video: str, extracted_frames_dir: str, compressed_frames_dir: str,
-                 compressed_quality: int):
+                 compressed_quality: int, scene_cuts_dir: str = None, scene_cut_threshold: float = 0):
 
         self.input_video = input_video
         self.extracted_frames_dir = extracted_frames_dir
@@ -18,6 +21,9 @@ class ProgressiveFramesExtractorCV2:
         self.compressed_quality = compressed_quality
         self.cap = cv2.VideoCapture(self.input_video)
 
+        self.scene_cuts_dir = scene_cuts_dir
+        self.scene_cut_detector = SceneCutDetector(scene_cut_threshold if scene_cuts_dir else 0)
+
         self.count = 1
 
     def extract_frames_to(self, stop_frame: int):
@@ -46,6 +52,10 @@ class ProgressiveFramesExtractorCV2:
             success, image = self.cap.read()
 
         if success:
+            # Marked before the frame is renamed into place, so it's marked by the time anything can load it.
+            if self.scene_cut_detector.is_cut(image):
+                mark_scene_cut(self.scene_cuts_dir, self.count)
+
             cv2.imwrite(self.extracted_frames_dir + "frame_temp_%s.jpg" % self.count, image,
                         [cv2.IMWRITE_JPEG_QUALITY, 100])
             cv2.imwrite(self.compressed_frames_dir + "compressed_temp_%s.jpg" % self.count, image,
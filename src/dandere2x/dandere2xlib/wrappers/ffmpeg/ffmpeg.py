@@ -4,11 +4,33 @@ import subprocess
 import sys
 
 from dandere2x.dandere2xlib.utils.dandere2x_utils import get_a_valid_input_resolution, get_operating_system
+from dandere2x.dandere2xlib.utils.process_supervisor import FFMPEG_PROGRESS_PATTERN, ProcessResult, \
+    get_process_supervisor
 from dandere2x.dandere2xlib.utils.yaml_utils import get_options_from_section
 from dandere2x.dandere2xlib.wrappers.ffmpeg.ffprobe import get_seconds
 from dandere2x.dandere2xlib.wrappers.ffmpeg.videosettings import VideoSettings
 
 
+def run_ffmpeg(command: list, console_output=None, description: str = "ffmpeg", check: bool = False) -> ProcessResult:
+    """
+    Run an ffmpeg command on the process supervisor (see process_supervisor.py), writing it's output into
+    console_output and logging it's progress (frames written) as it goes. If 'check', a non-zero exit raises
+    ProcessError.
+    """
+    logger = logging.getLogger("root")
+
+    def on_progress(frame: int):
+        logger.debug("%s: frame %d" % (description, frame))
+
+    result = get_process_supervisor().run(command, check=check, output=console_output, name="ffmpeg",
+                                          progress_pattern=FFMPEG_PROGRESS_PATTERN, on_progress=on_progress)
+
+    if result.progress is not None:
+        logger.info("%s: finished, %d frames written" % (description, result.progress))
+
+    return result
+
+
 def re_encode_video(ffmpeg_dir: str, ffprobe_dir: str, output_options: dict, input_file: str,
                     output_file: str, console_output=None) -> None:
     """
@@ -43,10 +65,7 @@ def re_encode_video(ffmpeg_dir: str, ffprobe_dir: str, output_options: dict, inp
     extract_frames_command.extend([output_file])
 
     logger.warning("Re-encoding your video, this may take some time.")
-    process = subprocess.Popen(extract_frames_command, stdout=sys.stdout, stderr=sys.stdout,
-                               stdin=subprocess.PIPE, shell=False)
-
-    stdout, stderr = process.communicate()
+    run_ffmpeg(extract_frames_command, console_output=sys.stdout, description="Re-encoding")
 
 
 def convert_video_to_gif(ffmpeg_dir: str, input_path: str, output_path: str, output_options=None) -> None:
@@ -67,10 +86,7 @@ def convert_video_to_gif(ffmpeg_dir: str, input_path: str, output_path: str, out
     execute.append(output_path)
 
     print(execute)
-    process = subprocess.Popen(execute, stdout=open(os.devnull, 'w'), stderr=subprocess.PIPE,
-                               stdin=subprocess.PIPE, shell=False)
-
-    stdout, stderr = process.communicate()
+    run_ffmpeg(execute, description="Converting %s" % input_path)
 
 
 def convert_gif_to_video(ffmpeg_dir: str, input_path: str, output_path: str, output_options=None) -> None:
@@ -91,10 +107,7 @@ def convert_gif_to_video(ffmpeg_dir: str, input_path: str, output_path: str, out
     execute.append(output_path)
 
     print(execute)
-    process = subprocess.Popen(execute, stdout=open(os.devnull, 'w'), stderr=subprocess.PIPE,
-                               stdin=subprocess.PIPE, shell=False)
-
-    stdout, stderr = process.communicate()
+    run_ffmpeg(execute, description="Converting %s" % input_path)
 
 
 def is_file_video(ffprobe_dir: str, input_video: str):
@@ -202,10 +215,7 @@ def divide_and_reencode_video(ffmpeg_path: str, ffprobe_path: str,
 
     execute.append(os.path.join(output_dir, "split_video%d.mkv"))
 
-    return_bytes = subprocess.run(execute, check=True, stdout=subprocess.PIPE).stdout
-    return_string = return_bytes.decode("utf-8")
-
-    return return_string
+    run_ffmpeg(execute, description="Dividing %s" % input_video, check=True)
 
 
 def get_console_output(method_name: str, console_output_dir=None):
@@ -221,8 +231,6 @@ def get_console_output(method_name: str, console_output_dir=None):
 
 def concat_n_videos(ffmpeg_dir: str, temp_file_dir: str, console_output_dir: str, list_of_files: list,
                     output_file: str) -> None:
-    import subprocess
-
     file_list_text_file = os.path.join(temp_file_dir, "temp.txt")
 
     file_template = "file " + "'" + "%s" + "'" + "\n"
@@ -241,7 +249,7 @@ def concat_n_videos(ffmpeg_dir: str, temp_file_dir: str, console_output_dir: str
     concat_videos_command.extend([output_file])
 
     console_output = get_console_output(__name__, console_output_dir)
-    subprocess.call(concat_videos_command, shell=False, stderr=console_output, stdout=console_output)
+    run_ffmpeg(concat_videos_command, console_output=console_output, description="Concatenating videos")
 
 
 def migrate_tracks_contextless(ffmpeg_dir: str, no_audio: str, file_dir: str, output_file: str,
@@ -283,5 +291,5 @@ def migrate_tracks_contextless(ffmpeg_dir: str, no_audio: str, file_dir: str, ou
 
     log.info("Writing files to %s" % str(console_output_dir))
     log.info("Migrate Command: %s" % convert(migrate_tracks_command))
-    subprocess.call(migrate_tracks_command, shell=False, stderr=console_output, stdout=console_output)
+    run_ffmpeg(migrate_tracks_command, console_output=console_output, description="Migrating tracks")
     log.info("Finished migrating to file: %s" % output_file)
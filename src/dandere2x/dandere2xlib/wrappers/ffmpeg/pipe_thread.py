@@ -1,21 +1,74 @@
+import io
 import subprocess
 import threading
-import time
+from collections import deque
 
+import numpy
 from colorlog import logging
 
 from dandere2x.dandere2x_service.dandere2x_service_context import Dandere2xServiceContext
 from dandere2x.dandere2x_service.dandere2x_service_controller import Dandere2xController
+from dandere2x.dandere2xlib.utils.buffer_io import write_buffers
+from dandere2x.dandere2xlib.utils.channel import Channel
+from dandere2x.dandere2xlib.utils.thread_utils import cancel_on_error
 from dandere2x.dandere2xlib.utils.yaml_utils import load_executable_paths_yaml, get_options_from_section
+from dandere2x.dandere2xlib.wrappers.frame.frame import Frame
+
+# How frames can be piped into ffmpeg (output_options.yaml's pipe_video 'pipe_format').
+PIPE_FORMATS = {"rawvideo", "image2pipe"}
+
+
+def drop_legacy_input_options(output_options: dict) -> tuple:
+    """
+    Older output_options.yaml's declared the pipe's input in pipe_video's output options (as "-y: -f",
+    "image2pipe: True", "-i: '-'", or "-f: image2pipe"), which is now built from pipe_format instead. Returns
+    (output_options without them, the keys dropped).
+    """
+    dropped = [key for key, value in output_options.items()
+               if key == "-i" or key in PIPE_FORMATS
+               or (key == "-f" and value in PIPE_FORMATS)
+               or (key == "-y" and value == "-f")]
+    return {key: value for key, value in output_options.items() if key not in dropped}, dropped
+
+
+def get_pipe_input_options(pipe_format: str, width: int, height: int) -> list:
+    """ What ffmpeg's told about the frames piped into it's stdin. """
+    options = ["-y", "-f", pipe_format]
+    if pipe_format == "rawvideo":
+        options.extend(["-pix_fmt", "rgb24", "-s", "%dx%d" % (width, height)])
+    return options + ["-i", "-"]
+
+
+def get_pipe_output_options(pipe_format: str, output_options: dict) -> list:
+    """
+    pipe_video's output options, as ffmpeg arguments. rawvideo's rgb24 frames would otherwise be encoded as yuv444p
+    (which most players can't play), so unless a -pix_fmt is given, they're encoded as yuv420p, as image2pipe's jpegs
+    are.
+    """
+    options = get_options_from_section(output_options, ffmpeg_command=True)
+    if pipe_format == "rawvideo" and "-pix_fmt" not in output_options:
+        options.extend(["-pix_fmt", "yuv420p"])
+    return options
 
 
 class Pipe(threading.Thread):
     """
     The pipe class allows images (Frame.py) to be processed into a video directly. It does this by "piping"
     images to ffmpeg, thus removing the need for storing the processed images onto the disk.
+
+    Images are piped in pipe_video's 'pipe_format':
+        "rawvideo"   - each frame's rgb24 pixels, written as is. ffmpeg's told the frames' size up front, so the pipe
+                       is started once the first frame (and it's size) arrives, and every frame has to be that size.
+        "image2pipe" - each frame encoded as a quality 100 jpeg, which ffmpeg decodes again (and is lossy). Up to
+                       context.pipe_encoders frames are encoded at once on the session's cpu pool (Pillow releases the
+                       GIL while encoding), and written in order as they finish.
+
+    Either way, frames are written straight to ffmpeg's stdin file descriptor from a memoryview of the frame's pixels
+    (or the encoded jpeg), rather than being copied through a buffered file (see buffer_io.py).
     """
 
-    def __init__(self, output_no_sound: str, context: Dandere2xServiceContext, controller: Dandere2xController):
+    def __init__(self, output_no_sound: str, context: Dandere2xServiceContext, controller: Dandere2xController,
+                 frames: Channel):
         threading.Thread.__init__(self, name="Pipe Thread")
 
         # load context
@@ -27,53 +80,77 @@ class Pipe(threading.Thread):
         # class specific
         self.ffmpeg_pipe_subprocess = None
         self.alive = False
-        self.images_to_pipe = []
-        self.buffer_limit = 20
-        self.lock_buffer = False
-
-    def kill(self) -> None:
-        self.log.info("Kill called.")
-        self.alive = False
-
+        self.width, self.height = None, None
+
+        pipe_video = self.context.service_request.output_options["ffmpeg"]["pipe_video"]
+        self.pipe_format = pipe_video.get("pipe_format", "image2pipe")
+        if self.pipe_format not in PIPE_FORMATS:
+            raise ValueError("Unknown pipe_format %s, expected one of %s" % (self.pipe_format,
+                                                                            ", ".join(sorted(PIPE_FORMATS))))
+        _, legacy_options = drop_legacy_input_options(pipe_video["output_options"])
+        if legacy_options:
+            self.log.warning("Ignoring %s in pipe_video's output_options, ffmpeg's input is set by pipe_format (%s) "
+                             "instead" % (", ".join(legacy_options), self.pipe_format))
+
+        # The frames to pipe, from merge.py. It's bounded, so merge.py blocks on it while ffmpeg is behind.
+        self.frames = frames
+
+    @cancel_on_error
     def run(self) -> None:
         self.log.info("Run Called")
 
         self.alive = True
-        self._setup_pipe()
 
-        # keep piping images to ffmpeg while this thread is supposed to be kept alive.
-        while self.alive:
-            if len(self.images_to_pipe) > 0:
-                img = self.images_to_pipe.pop(0).get_pil_image()  # get the first image and remove it from list
-                img.save(self.ffmpeg_pipe_subprocess.stdin, format="jpeg", quality=100)
-            else:
-                time.sleep(0.1)
+        # jpegs being encoded (image2pipe), oldest frame first. Only the oldest is ever written, once it's done, so
+        # frames reach ffmpeg in order however their encodes finish.
+        encoding = deque()
+
+        # keep piping images to ffmpeg until merge.py closes the channel (or the session is cancelled, which raises
+        # CancelledError - ffmpeg was killed along with it, and there's no video left to finish).
+        for frame in self.frames:
+            if self.ffmpeg_pipe_subprocess is None:
+                self._setup_pipe(frame.width, frame.height)
+
+            if self.pipe_format == "rawvideo":
+                self._write_raw(frame)
+                continue
 
-        # if the thread is killed for whatever reason, finish writing the remainder of the images to the video file.
-        while self.images_to_pipe:
-            pil_image = self.images_to_pipe.pop(0).get_pil_image()
-            pil_image.save(self.ffmpeg_pipe_subprocess.stdin, format="jpeg", quality=100)
+            encoding.append(self.controller.executor.submit_cpu(self._encode_jpeg, frame))
+            if len(encoding) >= self.context.pipe_encoders:
+                self._write_jpeg(encoding.popleft().result())
 
-        self.ffmpeg_pipe_subprocess.stdin.close()
-        self.ffmpeg_pipe_subprocess.wait()
+        while encoding:
+            self._write_jpeg(encoding.popleft().result())
+
+        if self.ffmpeg_pipe_subprocess is not None:
+            self.ffmpeg_pipe_subprocess.stdin.close()
+            self.ffmpeg_pipe_subprocess.wait()
 
         # ensure thread is dead (can be killed with controller.kill() )
         self.alive = False
 
-    # todo: Implement this without a 'while true'
-    def save(self, frame):
-        """
-        Try to add an image to image_to_pipe buffer. If there's too many images in the buffer,
-        simply wait until the buffer clears.
-        """
-        while True:
-            if len(self.images_to_pipe) < self.buffer_limit:
-                self.images_to_pipe.append(frame)
-                break
-            time.sleep(0.05)
-
-    def _setup_pipe(self) -> None:
+    @staticmethod
+    def _encode_jpeg(frame: Frame) -> io.BytesIO:
+        jpeg = io.BytesIO()
+        frame.get_pil_image().save(jpeg, format="jpeg", quality=100)
+        return jpeg
+
+    def _write_jpeg(self, jpeg: io.BytesIO) -> None:
+        write_buffers(self.ffmpeg_pipe_subprocess.stdin.fileno(), [jpeg.getbuffer()])
+
+    def _write_raw(self, frame: Frame) -> None:
+        if frame.frame.shape != (self.height, self.width, 3):
+            raise ValueError("Can't pipe a %s frame into a %dx%d rgb24 rawvideo pipe" %
+                             ("x".join(str(size) for size in frame.frame.shape), self.width, self.height))
+
+        # Merged frames are already contiguous uint8 arrays, in which case this is the frame's own buffer.
+        write_buffers(self.ffmpeg_pipe_subprocess.stdin.fileno(),
+                      [numpy.ascontiguousarray(frame.frame, dtype=numpy.uint8)])
+
+    def _setup_pipe(self, width: int, height: int) -> None:
+        """ Start ffmpeg, piping in frames of width x height. """
         self.log.info("Setting up pipe Called")
+        self.width, self.height = width, height
         # load variables..
         output_no_sound = self.output_no_sound
         frame_rate = str(self.context.frame_rate)
@@ -91,10 +168,12 @@ class Pipe(threading.Thread):
 
         ffmpeg_pipe_command.extend(["-r", frame_rate])
 
-        options = get_options_from_section(
-            self.context.service_request.output_options["ffmpeg"]["pipe_video"]['output_options'],
-            ffmpeg_command=True)
-        for item in options:
+        # what ffmpeg reads from stdin
+        ffmpeg_pipe_command.extend(get_pipe_input_options(self.pipe_format, width, height))
+
+        output_options, _ = drop_legacy_input_options(
+            self.context.service_request.output_options["ffmpeg"]["pipe_video"]['output_options'])
+        for item in get_pipe_output_options(self.pipe_format, output_options):
             ffmpeg_pipe_command.append(item)
 
         ffmpeg_pipe_command.append("-r")
@@ -107,5 +186,9 @@ class Pipe(threading.Thread):
         console_output.write(str(ffmpeg_pipe_command))
 
         self.log.info("ffmpeg_pipe_command %s" % str(ffmpeg_pipe_command))
+        # unbuffered, as frames are written to stdin's file descriptor directly
         self.ffmpeg_pipe_subprocess = subprocess.Popen(ffmpeg_pipe_command, stdin=subprocess.PIPE,
-                                                       stdout=console_output)
+                                                       stdout=console_output, bufsize=0)
+        self.controller.cancellation_token.register_process(self.ffmpeg_pipe_subprocess)
+        self.context.resource_policy.process("ffmpeg_pipe").apply_to_process(self.ffmpeg_pipe_subprocess.pid,
+                                                                             "ffmpeg_pipe")
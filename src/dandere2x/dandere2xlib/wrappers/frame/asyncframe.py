@@ -1,6 +1,7 @@
 import threading
 
 from dandere2x.dandere2x_service.dandere2x_service_controller import Dandere2xController
+from dandere2x.dandere2xlib.utils.thread_utils import cancel_on_error
 from dandere2x.dandere2xlib.wrappers.frame.frame import Frame
 
 
@@ -17,6 +18,7 @@ class AsyncFrameRead(threading.Thread):
         self.load_complete = False
         self.controller = controller
 
+    @cancel_on_error
     def run(self):
         self.loaded_image.load_from_string_controller(self.input_image, self.controller)
         self.load_complete = True
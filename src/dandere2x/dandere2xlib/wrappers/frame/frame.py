@@ -2,7 +2,6 @@
 # -*- coding: utf-8 -*-
 import logging
 import os
-import time
 from dataclasses import dataclass
 
 import imageio
@@ -109,14 +108,7 @@ class Frame:
     def load_from_string_controller(self, input_string, controller=Dandere2xController()):
 
         logger = logging.getLogger(__name__)
-        exists = exists = os.path.isfile(input_string)
-        count = 0
-        while not exists:
-            if count % 10000 == 0:
-                logger.debug(input_string + " dne")
-            exists = os.path.isfile(input_string)
-            count += 1
-            time.sleep(.2)
+        wait_on_file(input_string, controller.cancellation_token)
 
         loaded = False
         while not loaded:
@@ -152,7 +144,7 @@ class Frame:
         return (self.width, self.height)
 
     def get_pil_image(self):
-        return Image.fromarray(self.frame.astype(np.uint8))
+        return Image.fromarray(self.frame.astype(np.uint8, copy=False))
 
     def save_image_temp(self, out_location, temp_location):
         """
@@ -216,6 +208,22 @@ class Frame:
                   (other_y, other_x), (this_y, this_x),
                   (this_y + block_size - 1, this_x + block_size - 1))
 
+    def copy_rect(self, frame_other, width, height, other_x, other_y, this_x, this_y):
+        """
+        The rectangular counter-part of copy_block, used when the copied regions aren't block_size x block_size
+        (i.e packed residuals of mixed sizes).
+        """
+        if this_x < 0 or this_y < 0 or other_x < 0 or other_y < 0 or \
+                this_x + width > self.width or this_y + height > self.height or \
+                other_x + width > frame_other.width or other_y + height > frame_other.height:
+            self.logger.error('Input Dimensions Invalid for Copy Rect Function, printing variables.')
+            self.logger.error('width: %s height: %s other: (%s, %s) this: (%s, %s)'
+                              % (width, height, other_x, other_y, this_x, this_y))
+            raise ValueError('Invalid Dimensions for Dandere2x Image, See Log. ')
+
+        self.frame[this_y:this_y + height, this_x:this_x + width] = \
+            frame_other.frame[other_y:other_y + height, other_x:other_x + width]
+
     def fade_block(self, this_x, this_y, block_size, scalar):
         """
         Apply a scalar value to the RGB values for a given block. The values are then clipped to ensure
@@ -309,4 +317,6 @@ class Frame:
         return im_out
 
     def mean(self, other):
-        return numpy.mean((self.frame - other.frame) ** 2)
+        # Widened first, as the uint8 difference (and it's square) wrap around.
+        difference = self.frame.astype(numpy.int32) - other.frame
+        return numpy.mean(difference * difference)
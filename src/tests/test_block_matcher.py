@@ -0,0 +1,144 @@
+import os
+import shutil
+import threading
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from dandere2x.dandere2x_service.core.block_matcher.block_matcher import BlockMatcher
+from dandere2x.dandere2x_service.core.block_matcher.pframe import get_block_positions, match_blocks, \
+    residual_vectors
+from dandere2x.dandere2x_service.dandere2x_service_controller import Dandere2xController
+from dandere2x.dandere2xlib.utils.scene_cuts import mark_scene_cut
+from dandere2x.dandere2xlib.utils.vector_utils import get_vectors_from_file_and_wait
+from dandere2x.dandere2xlib.wrappers.frame.frame import Frame
+
+# Four 150x90 frames, and the vectors dandere2x_cpp wrote for them ("dandere2x_cpp <workspace> 4 30 4 n 1 .jpg text
+# files 0", as well as with temporal seeding, which wrote the same vectors). Between frames 1 and 2 one block is
+# replaced, a strip of blocks moves and a few pixels of another change, between 2 and 3 the strip keeps moving and
+# a corner is inverted, and frame 4 is frame 3 inverted, which dandere2x_cpp doesn't match anything of.
+DATA_DIR = os.path.join(os.path.dirname(__file__), "data", "block_matcher") + os.sep
+FRAME_COUNT = 4
+BLOCK_SIZE = 30
+
+
+def make_context(workspace, temporal_seeding: bool):
+    directories = {}
+    for name in ["input_frames", "compressed_static", "pframe_data", "residual_data", "correction_data", "fade_data",
+                 "scene_cuts"]:
+        os.makedirs(os.path.join(workspace, name))
+        directories[name + "_dir"] = os.path.join(workspace, name) + os.sep
+
+    for x in range(1, FRAME_COUNT + 1):
+        shutil.copy(DATA_DIR + "frame%d.jpg" % x, directories["input_frames_dir"])
+        shutil.copy(DATA_DIR + "compressed_%d.jpg" % x, directories["compressed_static_dir"])
+
+    return SimpleNamespace(service_request=SimpleNamespace(block_size=BLOCK_SIZE), frame_count=FRAME_COUNT,
+                           step_size=4, block_search="diamond", temporal_seeding=temporal_seeding,
+                           vector_storage="files", vector_format="text", **directories)
+
+
+def load_frame(file: str) -> np.ndarray:
+    frame = Frame()
+    frame.load_from_string(file)
+    return frame.frame
+
+
+@pytest.mark.parametrize("temporal_seeding", [False, True])
+def test_vectors_match_dandere2x_cpp(tmp_path, temporal_seeding):
+    context = make_context(str(tmp_path), temporal_seeding)
+    controller = Dandere2xController()
+
+    block_matcher = BlockMatcher(context, controller)
+    block_matcher.start()
+    block_matcher.join(timeout=60)
+
+    assert not block_matcher.is_alive()
+    assert controller.get_failure() is None
+
+    for x in range(1, FRAME_COUNT):
+        for data_type, directory in [("pframe", context.pframe_data_dir), ("residual", context.residual_data_dir)]:
+            expected = get_vectors_from_file_and_wait(DATA_DIR + "%s_%d.txt" % (data_type, x))
+            actual = get_vectors_from_file_and_wait(directory + "%s_%d.txt" % (data_type, x))
+
+            assert actual.tolist() == expected.tolist(), "%s vectors of frame %d" % (data_type, x)
+
+
+def test_scene_cuts_skip_matching(tmp_path):
+    """ A cut frame's vectors are all empty (upscaling it in full), and the frames after it are matched as usual. """
+    context = make_context(str(tmp_path), temporal_seeding=True)
+    mark_scene_cut(context.scene_cuts_dir, 2)
+    controller = Dandere2xController()
+
+    block_matcher = BlockMatcher(context, controller)
+    block_matcher.start()
+    block_matcher.join(timeout=60)
+
+    assert controller.get_failure() is None
+    for data_type, directory in [("pframe", context.pframe_data_dir), ("residual", context.residual_data_dir),
+                                 ("fade", context.fade_data_dir), ("correction", context.correction_data_dir)]:
+        assert get_vectors_from_file_and_wait(directory + "%s_1.txt" % data_type).size == 0
+
+    for data_type, directory in [("pframe", context.pframe_data_dir), ("residual", context.residual_data_dir)]:
+        expected = get_vectors_from_file_and_wait(DATA_DIR + "%s_2.txt" % data_type)
+        assert get_vectors_from_file_and_wait(directory + "%s_2.txt" % data_type).tolist() == expected.tolist()
+
+
+def test_fixture_covers_stationary_and_residual_blocks():
+    """ Make sure the vectors compared above aren't trivially empty or trivially all matched. """
+    pframe = get_vectors_from_file_and_wait(DATA_DIR + "pframe_1.txt").reshape(-1, 4)
+    residual = get_vectors_from_file_and_wait(DATA_DIR + "residual_1.txt").reshape(-1, 4)
+
+    assert len(pframe) and len(residual)
+    assert len(pframe) + len(residual) == (150 // BLOCK_SIZE) * (90 // BLOCK_SIZE)
+    assert get_vectors_from_file_and_wait(DATA_DIR + "pframe_3.txt").size == 0
+
+
+def test_low_psnr_matches_nothing():
+    image_previous = load_frame(DATA_DIR + "frame3.jpg")
+    image_next = load_frame(DATA_DIR + "frame4.jpg")
+
+    positions, ends, matched = match_blocks(image_previous, image_next, load_frame(DATA_DIR + "compressed_4.jpg"),
+                                            BLOCK_SIZE, step_size=4)
+
+    assert not matched.any()
+    assert (ends == positions).all()
+
+
+def test_identical_frames_are_stationary():
+    image = load_frame(DATA_DIR + "frame1.jpg")
+
+    positions, ends, matched = match_blocks(image, image.copy(), load_frame(DATA_DIR + "compressed_1.jpg"),
+                                            BLOCK_SIZE, step_size=4)
+
+    assert matched.all()
+    assert (ends == positions).all()
+
+
+def test_block_positions_are_x_major():
+    positions = get_block_positions(60, 90, BLOCK_SIZE)
+
+    assert positions.tolist() == [[0, 0], [0, 30], [0, 60], [30, 0], [30, 30], [30, 60]]
+
+
+def test_residual_slots_skip_the_first_slot():
+    positions = get_block_positions(90, 30, BLOCK_SIZE)
+    matched = np.array([False, True, False])
+
+    # Two missing blocks get a 2x2 residual image, filling slots (1, 0) then (0, 1).
+    assert residual_vectors(positions, matched).tolist() == [0, 0, 1, 0, 60, 0, 0, 1]
+
+
+def test_cancelled_block_matcher_stops(tmp_path):
+    """ Waiting on a frame that never shows up shouldn't keep the thread alive once the session is cancelled. """
+    context = make_context(str(tmp_path), temporal_seeding=False)
+    os.remove(context.input_frames_dir + "frame3.jpg")
+    controller = Dandere2xController()
+
+    block_matcher = BlockMatcher(context, controller)
+    block_matcher.start()
+    threading.Timer(0.5, controller.cancellation_token.cancel).start()
+    block_matcher.join(timeout=30)
+
+    assert not block_matcher.is_alive()
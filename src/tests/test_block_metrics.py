@@ -0,0 +1,150 @@
+import math
+
+import numpy as np
+import pytest
+
+from dandere2x.dandere2xlib.metrics import block_metrics
+from dandere2x.dandere2xlib.metrics.block_metrics import C1, C2, D1, D2, block_mse, block_ssim_mse, get_blocks, \
+    get_windows, moving_block_ssim_mse, psnr
+
+BLOCK_SIZE = 6
+
+
+def random_image(width, height, seed) -> np.ndarray:
+    return np.random.default_rng(seed).integers(0, 256, (height, width, 3), dtype=np.uint8)
+
+
+def cpp_mse(image_a, x_a, y_a, image_b, x_b, y_b, block_size) -> float:
+    """ ImageUtils::mse, pixel by pixel. """
+    total = 0
+    for x in range(block_size):
+        for y in range(block_size):
+            for c in range(3):
+                total += (int(image_a[y_a + y, x_a + x, c]) - int(image_b[y_b + y, x_b + x, c])) ** 2
+    return total / (block_size * block_size)
+
+
+def cpp_ssim(image_a, x_a, y_a, image_b, x_b, y_b, block_size, x_mse=None, y_mse=None) -> float:
+    """ SSIM::ssim from SSIM-MSE.h, pixel by pixel. The inverse mse term compares image_b at (x_mse, y_mse). """
+    x_mse, y_mse = (x_a, y_a) if x_mse is None else (x_mse, y_mse)
+    pixels = block_size * block_size
+    scores = []
+
+    for c in range(3):
+        block_a = [float(image_a[y_a + y, x_a + x, c]) for x in range(block_size) for y in range(block_size)]
+        block_b = [float(image_b[y_b + y, x_b + x, c]) for x in range(block_size) for y in range(block_size)]
+        block_b_mse = [float(image_b[y_mse + y, x_mse + x, c]) for x in range(block_size) for y in range(block_size)]
+
+        mx, my = sum(block_a) / pixels, sum(block_b) / pixels
+        sigsqx = sum((a - mx) ** 2 for a in block_a) / pixels
+        sigsqy = sum((b - my) ** 2 for b in block_b) / pixels
+        sigxy = sum((a - mx) * (b - my) for a, b in zip(block_a, block_b)) / pixels
+        mse = sum((a - b) ** 2 for a, b in zip(block_a, block_b_mse))
+
+        ssim = ((2 * mx * my + C1) * (2 * sigxy + C2)) / ((mx * mx + my * my + C1) * (sigsqx + sigsqy + C2))
+        scores.append(ssim * (1 + D1) / (mse + D2))
+
+    return sum(scores) / 3
+
+
+@pytest.fixture
+def images():
+    image_a = random_image(40, 30, 0)
+    # Partly the same as image_a, so the scores aren't all about equally bad.
+    image_b = image_a.copy()
+    image_b[10:20] = random_image(40, 10, 1)
+    return image_a, image_b
+
+
+@pytest.fixture
+def positions():
+    rng = np.random.default_rng(2)
+    positions_a = np.stack([rng.integers(0, 40 - BLOCK_SIZE + 1, 50), rng.integers(0, 30 - BLOCK_SIZE + 1, 50)], 1)
+    positions_b = np.stack([rng.integers(0, 40 - BLOCK_SIZE + 1, 50), rng.integers(0, 30 - BLOCK_SIZE + 1, 50)], 1)
+    return positions_a, positions_b
+
+
+@pytest.mark.parametrize("block_size", [1, 4, 30])
+def test_windows_are_every_block(block_size):
+    image = random_image(40, 30, 0)
+    windows = get_windows(image, block_size)
+
+    assert windows.shape == (30 - block_size + 1, 40 - block_size + 1, 3, block_size, block_size)
+    for y, x in [(0, 0), (30 - block_size, 40 - block_size), (0, 40 - block_size), (30 - block_size, 0)]:
+        assert (windows[y, x] == image[y:y + block_size, x:x + block_size].transpose(2, 0, 1)).all()
+
+
+def test_windows_are_read_only():
+    windows = get_windows(random_image(40, 30, 0), BLOCK_SIZE)
+
+    with pytest.raises(ValueError):
+        windows[0, 0, 0, 0, 0] = 0
+
+
+def test_get_blocks(images, positions):
+    image_a, _ = images
+    positions_a, _ = positions
+    blocks = get_blocks(image_a, positions_a, BLOCK_SIZE)
+
+    for block, (x, y) in zip(blocks, positions_a):
+        assert (block == image_a[y:y + BLOCK_SIZE, x:x + BLOCK_SIZE].transpose(2, 0, 1)).all()
+
+
+def test_block_mse_matches_dandere2x_cpp(images, positions):
+    image_a, image_b = images
+    positions_a, positions_b = positions
+
+    expected = [cpp_mse(image_a, x_a, y_a, image_b, x_b, y_b, BLOCK_SIZE)
+                for (x_a, y_a), (x_b, y_b) in zip(positions_a, positions_b)]
+
+    assert block_mse(image_a, positions_a, image_b, positions_b, BLOCK_SIZE) == pytest.approx(expected)
+
+
+def test_block_ssim_mse_matches_dandere2x_cpp(images, positions):
+    image_a, image_b = images
+    positions_a, positions_b = positions
+
+    expected = [cpp_ssim(image_a, x_a, y_a, image_b, x_b, y_b, BLOCK_SIZE)
+                for (x_a, y_a), (x_b, y_b) in zip(positions_a, positions_b)]
+
+    assert block_ssim_mse(image_a, positions_a, image_b, positions_b, BLOCK_SIZE) == pytest.approx(expected)
+
+
+def test_moving_block_ssim_mse_compares_the_moved_block(images, positions):
+    image_a, image_b = images
+    positions_a, positions_b = positions
+
+    expected = [cpp_ssim(image_a, x_a, y_a, image_b, x_b, y_b, BLOCK_SIZE, x_b, y_b)
+                for (x_a, y_a), (x_b, y_b) in zip(positions_a, positions_b)]
+
+    assert moving_block_ssim_mse(image_a, positions_a, image_b, positions_b, BLOCK_SIZE) == pytest.approx(expected)
+
+
+def test_metrics_are_chunked(images, monkeypatch):
+    """ Comparing more blocks than fit in a chunk gives the same scores as comparing them all at once. """
+    image_a, image_b = images
+    positions_a = np.stack(np.meshgrid(np.arange(35), np.arange(25), indexing="ij"), axis=2).reshape(-1, 2)
+    positions_b = positions_a[::-1].copy()
+
+    mse = block_mse(image_a, positions_a, image_b, positions_b, BLOCK_SIZE)
+    ssim = block_ssim_mse(image_a, positions_a, image_b, positions_b, BLOCK_SIZE)
+
+    monkeypatch.setattr(block_metrics, "CHUNK_SIZE", 7)
+    assert (block_mse(image_a, positions_a, image_b, positions_b, BLOCK_SIZE) == mse).all()
+    assert (block_ssim_mse(image_a, positions_a, image_b, positions_b, BLOCK_SIZE) == ssim).all()
+
+
+def test_identical_blocks():
+    image = random_image(40, 30, 0)
+    positions = np.array([[0, 0], [10, 12], [34, 24]])
+
+    assert (block_mse(image, positions, image, positions, BLOCK_SIZE) == 0).all()
+    assert psnr(image, image) == math.inf
+
+
+def test_psnr_sums_the_color_channels():
+    image_a = np.zeros((10, 10, 3), dtype=np.uint8)
+    image_b = np.full((10, 10, 3), 10, dtype=np.uint8)
+
+    # Every pixel is off by 10 in each of r, g and b, so an mse of 300.
+    assert psnr(image_a, image_b) == pytest.approx(20 * math.log10(255) - 10 * math.log10(300))
@@ -0,0 +1,57 @@
+import os
+import threading
+
+import numpy as np
+
+from dandere2x.dandere2xlib.utils.buffer_io import write_buffers
+
+
+def write_to_pipe(buffers, **kwargs) -> tuple:
+    """ write_buffers into a pipe, returning (bytes written, bytes read out the other end). """
+    read_fd, write_fd = os.pipe()
+    chunks = []
+
+    def read():
+        with os.fdopen(read_fd, "rb") as reader:
+            chunks.append(reader.read())
+
+    reader = threading.Thread(target=read)
+    reader.start()
+    try:
+        written = write_buffers(write_fd, buffers, **kwargs)
+    finally:
+        os.close(write_fd)
+    reader.join()
+
+    return written, chunks[0]
+
+
+def test_buffers_are_written_in_order():
+    frame = np.arange(64 * 48 * 3, dtype=np.uint8).reshape((48, 64, 3))
+    buffers = [b"header", frame, memoryview(b""), bytearray(b"footer")]
+
+    written, piped = write_to_pipe(buffers)
+    assert piped == b"header" + frame.tobytes() + b"footer"
+    assert written == len(piped)
+
+
+def test_writes_split_across_buffers():
+    # Small chunks, and more buffers than are written at once, end writes partway into buffers.
+    buffers = [bytes([x]) * (x * 7 + 1) for x in range(40)]
+
+    written, piped = write_to_pipe(buffers, chunk_size=5)
+    assert piped == b"".join(buffers)
+    assert written == len(piped)
+
+
+def test_large_writes_wait_on_the_reader():
+    # Larger than a pipe's buffer, so writes only take part of it at a time.
+    data = os.urandom(8 * 1024 ** 2)
+
+    written, piped = write_to_pipe([data])
+    assert piped == data
+    assert written == len(data)
+
+
+def test_nothing_to_write():
+    assert write_to_pipe([]) == (0, b"")
@@ -0,0 +1,116 @@
+import subprocess
+import sys
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from dandere2x.dandere2xlib.utils.thread_utils import CancellationToken, CancelledError, cancel_on_error
+
+
+def start_sleeper() -> subprocess.Popen:
+    return subprocess.Popen([sys.executable, "-c", "import time; time.sleep(30)"])
+
+
+def test_cancel_only_once():
+    token = CancellationToken()
+
+    assert not token.is_cancelled
+    assert token.cancel("first")
+    assert not token.cancel("second")
+
+    assert token.is_cancelled
+    assert token.reason == "first"
+
+
+def test_raise_if_cancelled():
+    token = CancellationToken()
+    token.raise_if_cancelled()
+
+    token.cancel("stopped")
+    with pytest.raises(CancelledError, match="stopped"):
+        token.raise_if_cancelled()
+
+
+def test_wait():
+    token = CancellationToken()
+    assert not token.wait(0.01)
+
+    threading.Timer(0.1, token.cancel).start()
+    assert token.wait(5)
+
+
+def test_callbacks():
+    token = CancellationToken()
+    called = []
+
+    def removed():
+        called.append("removed")
+
+    token.add_callback(lambda: called.append("added"))
+    token.add_callback(removed)
+    token.remove_callback(removed)
+
+    token.cancel()
+    assert called == ["added"]
+
+    # Added after it's cancelled, it's called right away.
+    token.add_callback(lambda: called.append("late"))
+    assert called == ["added", "late"]
+
+
+def test_registered_processes_are_killed():
+    token = CancellationToken()
+    process = start_sleeper()
+    token.register_process(process)
+
+    token.cancel()
+    assert process.wait(5) is not None
+
+
+def test_processes_registered_after_cancelling_are_killed():
+    token = CancellationToken()
+    token.cancel()
+
+    process = start_sleeper()
+    token.register_process(process)
+    assert process.wait(5) is not None
+
+
+def test_finished_processes_are_left_alone():
+    token = CancellationToken()
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    token.register_process(process)
+
+    token.cancel()
+    assert process.returncode == 0
+
+
+class Stage:
+    def __init__(self, error: Exception):
+        self.failures = []
+        self.alive = True
+        self.error = error
+        self.controller = SimpleNamespace(is_alive=lambda: self.alive, fail=self.failures.append)
+
+    @cancel_on_error
+    def run(self):
+        raise self.error
+
+
+def test_cancel_on_error_fails_the_session():
+    error = RuntimeError("crashed")
+    stage = Stage(error)
+
+    with pytest.raises(RuntimeError):
+        stage.run()
+    assert stage.failures == [error]
+
+
+def test_cancel_on_error_is_quiet_once_cancelled():
+    stage = Stage(CancelledError())
+    stage.alive = False
+
+    stage.run()
+    assert stage.failures == []
@@ -0,0 +1,81 @@
+import threading
+import time
+
+import pytest
+
+from dandere2x.dandere2xlib.utils.channel import Channel, ChannelClosed
+from dandere2x.dandere2xlib.utils.thread_utils import CancellationToken, CancelledError
+
+
+@pytest.fixture
+def token():
+    return CancellationToken()
+
+
+def test_items_come_out_in_order(token):
+    channel = Channel("numbers", int, capacity=4, token=token)
+    for x in range(3):
+        channel.put(x)
+    channel.close()
+
+    assert list(channel) == [0, 1, 2]
+
+
+def test_put_checks_the_item_type(token):
+    channel = Channel("numbers", int, capacity=4, token=token)
+
+    with pytest.raises(TypeError):
+        channel.put("1")
+
+
+def test_full_channel_holds_up_the_producer(token):
+    channel = Channel("numbers", int, capacity=2, token=token)
+    produced = []
+
+    def produce():
+        for x in range(5):
+            channel.put(x)
+            produced.append(x)
+        channel.close()
+
+    producer = threading.Thread(target=produce)
+    producer.start()
+
+    time.sleep(0.1)
+    assert produced == [0, 1]
+
+    assert list(channel) == [0, 1, 2, 3, 4]
+    producer.join()
+
+    assert channel.blocked_puts >= 1
+    assert channel.high_watermark == 2
+
+
+def test_get_after_close(token):
+    channel = Channel("numbers", int, capacity=4, token=token)
+    channel.put(1)
+    channel.close()
+
+    assert channel.get() == 1
+    with pytest.raises(ChannelClosed):
+        channel.get()
+
+    with pytest.raises(ValueError):
+        channel.put(2)
+
+
+def test_cancelling_wakes_a_blocked_get(token):
+    channel = Channel("numbers", int, capacity=4, token=token)
+    threading.Timer(0.1, token.cancel).start()
+
+    with pytest.raises(CancelledError):
+        channel.get()
+
+
+def test_cancelling_wakes_a_blocked_put(token):
+    channel = Channel("numbers", int, capacity=1, token=token)
+    channel.put(1)
+    threading.Timer(0.1, token.cancel).start()
+
+    with pytest.raises(CancelledError):
+        channel.put(2)
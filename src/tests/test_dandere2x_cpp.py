@@ -0,0 +1,133 @@
+import os
+import stat
+import sys
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from dandere2x.dandere2x_service.core import dandere2x_cpp
+from dandere2x.dandere2x_service.core.dandere2x_cpp import Dandere2xCppWrapper
+from dandere2x.dandere2x_service.dandere2x_service_controller import Dandere2xController
+from dandere2x.dandere2xlib.utils.file_watcher import FileReadyWatcher
+from dandere2x.dandere2xlib.utils.resource_policy import SessionResourcePolicy
+
+FRAME_COUNT = 60
+RANGE_SIZE = 25
+
+# Stands in for dandere2x_cpp resuming at a range's first frame: it logs the frame it resumes at, and streams empty
+# vectors of every frame of the range over stdout (see vector_stream.py).
+STAND_IN = """#!{python}
+import struct
+import sys
+
+workspace, end, resume = sys.argv[1], int(sys.argv[2]), int(sys.argv[6])
+with open(workspace + "started.txt", "a") as log:
+    log.write("%d\\n" % resume)
+
+for frame in range(resume, end):
+    for record_type in range(1, 5):
+        sys.stdout.buffer.write(struct.pack("<iII", frame, record_type, 0))
+"""
+
+
+@pytest.fixture
+def stand_in(tmp_path, monkeypatch):
+    executable = str(tmp_path / "dandere2x_cpp")
+    with open(executable, "w") as file:
+        file.write(STAND_IN.format(python=sys.executable))
+    os.chmod(executable, os.stat(executable).st_mode | stat.S_IEXEC)
+
+    monkeypatch.setattr(dandere2x_cpp, "load_executable_paths_yaml", lambda: {"dandere2x_cpp": executable})
+
+
+def make_context(workspace: str, frame_count: int = FRAME_COUNT):
+    directories = {}
+    for name in ["pframe_data", "residual_data", "correction_data", "fade_data", "logs"]:
+        os.makedirs(os.path.join(workspace, name))
+        directories[name + "_dir"] = os.path.join(workspace, name) + os.sep
+
+    return SimpleNamespace(service_request=SimpleNamespace(workspace=workspace + os.sep, block_size=30),
+                           frame_count=frame_count, step_size=4, vector_format="text", vector_storage="files",
+                           temporal_seeding=False, dandere2x_cpp_instances=2, dandere2x_cpp_range_size=RANGE_SIZE,
+                           resource_policy=SessionResourcePolicy({}, {}), log_dir=directories.pop("logs_dir"),
+                           **directories)
+
+
+def started_ranges(workspace: str) -> list:
+    try:
+        with open(os.path.join(workspace, "started.txt")) as log:
+            return [int(line) for line in log]
+    except FileNotFoundError:
+        return []
+
+
+def wait_for_ranges(workspace: str, count: int) -> None:
+    file = os.path.join(workspace, "started.txt")
+    assert FileReadyWatcher.instance().wait_until(lambda: len(started_ranges(workspace)) >= count, [file], 10)
+
+
+@pytest.mark.parametrize("frame_count, expected", [
+    (60, [(1, 26), (26, 51), (51, 60)]),
+    (51, [(1, 26), (26, 51)]),
+    (10, [(1, 10)]),
+])
+def test_ranges_cover_every_frame(tmp_path, stand_in, frame_count, expected):
+    wrapper = Dandere2xCppWrapper(make_context(str(tmp_path), frame_count), Dandere2xController())
+
+    assert wrapper.get_ranges() == expected
+
+
+def test_ranges_start_once_their_frames_are_extracted(tmp_path, stand_in):
+    workspace = str(tmp_path)
+    context = make_context(workspace)
+    controller = Dandere2xController()
+    wrapper = Dandere2xCppWrapper(context, controller)
+
+    # Resuming at frame 1 loads frame 2, so only the first range can start.
+    controller.update_extracted_count(2)
+    wrapper.start()
+    wait_for_ranges(workspace, 1)
+    wrapper.join(timeout=0.5)
+    assert started_ranges(workspace) == [1]
+
+    controller.update_extracted_count(27)
+    wait_for_ranges(workspace, 2)
+    controller.update_extracted_count(FRAME_COUNT)
+    wrapper.join(timeout=30)
+
+    assert not wrapper.is_alive()
+    assert controller.get_failure() is None
+    assert started_ranges(workspace) == [1, 26, 51]
+    assert all(os.path.isfile(context.pframe_data_dir + "pframe_%d.txt" % x) for x in range(1, FRAME_COUNT))
+
+
+def test_cancelling_while_waiting_on_a_range(tmp_path, stand_in):
+    workspace = str(tmp_path)
+    controller = Dandere2xController()
+    wrapper = Dandere2xCppWrapper(make_context(workspace), controller)
+
+    wrapper.start()
+    threading.Timer(0.2, controller.kill).start()
+    wrapper.join(timeout=10)
+
+    assert not wrapper.is_alive()
+    assert started_ranges(workspace) == []
+    assert controller.get_failure() is None
+
+
+def test_wait_for_extracted():
+    controller = Dandere2xController()
+
+    assert not controller.wait_for_extracted(1, timeout=0.01)
+
+    threading.Timer(0.1, controller.update_extracted_count, args=(5,)).start()
+    assert controller.wait_for_extracted(3, timeout=10)
+    assert controller.wait_for_extracted(5, timeout=0)
+
+
+def test_wait_for_extracted_wakes_up_when_killed():
+    controller = Dandere2xController()
+
+    threading.Timer(0.1, controller.kill).start()
+    assert not controller.wait_for_extracted(1, timeout=10)
@@ -0,0 +1,114 @@
+import os
+import threading
+
+import pytest
+
+from dandere2x.dandere2xlib.utils import file_sweeper
+from dandere2x.dandere2xlib.utils.file_sweeper import FileSweeper, frame_file_pattern
+from dandere2x.dandere2xlib.utils.session_executor import SessionExecutor
+
+
+@pytest.fixture
+def executor():
+    executor = SessionExecutor(io_workers=1, cpu_workers=1)
+    yield executor
+    executor.shutdown()
+
+
+def make_files(directory, names) -> None:
+    os.makedirs(str(directory), exist_ok=True)
+    for name in names:
+        open(os.path.join(str(directory), name), "w").close()
+
+
+def remaining(directory) -> list:
+    return sorted(os.listdir(str(directory)))
+
+
+def finish(executor: SessionExecutor) -> None:
+    """ Wait for every sweep submitted so far. """
+    executor.submit_io(lambda: None).result(timeout=10)
+
+
+def test_frame_file_pattern():
+    pattern = frame_file_pattern("output_", ".")
+
+    assert int(pattern.match("output_000012.png").group(1)) == 12
+    assert pattern.match("output_temp.png") is None
+    assert frame_file_pattern("frame", ".jpg").match("frame_temp_3.jpg") is None
+    assert int(frame_file_pattern("cut_", "").match("cut_7").group(1)) == 7
+
+
+def test_files_are_swept_at_the_threshold_less_their_lag(tmp_path, executor):
+    frames, upscaled = tmp_path / "frames", tmp_path / "upscaled"
+    make_files(frames, ["frame%d.jpg" % x for x in range(1, 8)] + ["frame_temp_8.jpg", "notes.txt"])
+    make_files(upscaled, ["output_%06d.png" % x for x in range(1, 8)])
+
+    sweeper = FileSweeper(executor, [(str(frames), frame_file_pattern("frame", ".jpg"), 2),
+                                     (str(upscaled), frame_file_pattern("output_", "."), 0)])
+    sweeper.sweep(5)
+    finish(executor)
+
+    assert remaining(frames) == ["frame4.jpg", "frame5.jpg", "frame6.jpg", "frame7.jpg", "frame_temp_8.jpg",
+                                 "notes.txt"]
+    assert remaining(upscaled) == ["output_000006.png", "output_000007.png"]
+
+
+def test_missing_directories_are_skipped(tmp_path, executor):
+    make_files(tmp_path / "frames", ["frame1.jpg"])
+
+    sweeper = FileSweeper(executor, [(str(tmp_path / "missing"), frame_file_pattern("frame", ".jpg"), 0),
+                                     (str(tmp_path / "frames"), frame_file_pattern("frame", ".jpg"), 0)])
+    sweeper.sweep(1)
+    finish(executor)
+
+    assert remaining(tmp_path / "frames") == []
+
+
+def test_sweeps_dont_pile_up(tmp_path, executor, monkeypatch):
+    """ Sweeps asked for while the io pool's busy become one sweep, at the highest threshold asked for. """
+    make_files(tmp_path, ["frame%d.jpg" % x for x in range(1, 11)])
+    scans = []
+    scandir = os.scandir
+
+    def counted_scandir(path):
+        scans.append(path)
+        return scandir(path)
+
+    monkeypatch.setattr(file_sweeper.os, "scandir", counted_scandir)
+
+    busy = threading.Event()
+    executor.submit_io(busy.wait, 10)
+
+    sweeper = FileSweeper(executor, [(str(tmp_path), frame_file_pattern("frame", ".jpg"), 0)])
+    for threshold in [2, 6, 4]:
+        sweeper.sweep(threshold)
+    busy.set()
+    finish(executor)
+
+    assert len(scans) == 1
+    assert remaining(tmp_path) == sorted("frame%d.jpg" % x for x in range(7, 11))
+
+
+def test_files_that_cant_be_deleted_are_retried(tmp_path, executor, monkeypatch):
+    """ i.e a frame still open on Windows - it's deleted by the next sweep. """
+    make_files(tmp_path, ["frame1.jpg", "frame2.jpg"])
+    remove = os.remove
+    locked = [str(tmp_path / "frame1.jpg")]
+
+    def remove_unless_locked(path):
+        if path in locked:
+            raise PermissionError(path)
+        remove(path)
+
+    monkeypatch.setattr(file_sweeper.os, "remove", remove_unless_locked)
+    sweeper = FileSweeper(executor, [(str(tmp_path), frame_file_pattern("frame", ".jpg"), 0)])
+
+    sweeper.sweep(2)
+    finish(executor)
+    assert remaining(tmp_path) == ["frame1.jpg"]
+
+    locked.clear()
+    sweeper.sweep(3)
+    finish(executor)
+    assert remaining(tmp_path) == []
@@ -0,0 +1,115 @@
+import os
+import threading
+import time
+
+import pytest
+
+from dandere2x.dandere2xlib.utils.file_watcher import FileReadyWatcher
+from dandere2x.dandere2xlib.utils.thread_utils import CancellationToken, CancelledError
+
+
+@pytest.fixture(params=["inotify", "polling"])
+def watcher(request, monkeypatch):
+    """ The process' watcher, and one that has to poll (as it does without inotify). """
+    if request.param == "inotify":
+        if FileReadyWatcher.instance().inotify_fd < 0:
+            pytest.skip("needs inotify")
+        return FileReadyWatcher.instance()
+
+    monkeypatch.setattr("sys.platform", "win32")
+    return FileReadyWatcher()
+
+
+def write_later(file: str, delay: float = 0.1, content: str = "") -> None:
+    def write():
+        with open(file, "w") as handle:
+            handle.write(content)
+
+    threading.Timer(delay, write).start()
+
+
+def test_waiting_on_a_file_thats_created_later(tmp_path, watcher):
+    file = str(tmp_path / "frame1.jpg")
+    write_later(file)
+
+    assert watcher.wait(file, timeout=10) == file
+
+
+def test_waiting_on_a_file_that_already_exists(tmp_path, watcher):
+    file = str(tmp_path / "frame1.jpg")
+    open(file, "w").close()
+
+    assert watcher.wait(file, timeout=0) == file
+
+
+def test_waiting_on_any_of_several_files(tmp_path, watcher):
+    files = [str(tmp_path / "pframe_1.txt"), str(tmp_path / "pframe_1.bin")]
+    write_later(files[1])
+
+    assert watcher.wait(*files, timeout=10) == files[1]
+
+
+def test_waits_time_out(tmp_path, watcher):
+    started = time.monotonic()
+
+    assert watcher.wait(str(tmp_path / "never"), timeout=0.2) is None
+    assert 0.2 <= time.monotonic() - started < 5
+
+
+def test_cancelling_a_wait(tmp_path, watcher):
+    token = CancellationToken()
+    threading.Timer(0.1, token.cancel).start()
+
+    with pytest.raises(CancelledError):
+        watcher.wait(str(tmp_path / "never"), token=token)
+
+
+def test_predicates_are_rechecked_when_files_change(tmp_path, watcher):
+    """ i.e waiting for a file to be completely written, rather than only created. """
+    file = str(tmp_path / "frame1.txt")
+    open(file, "w").close()
+    write_later(file, content="done")
+
+    def written():
+        with open(file) as handle:
+            return handle.read() == "done"
+
+    assert watcher.wait_until(written, [file], timeout=10)
+
+
+def test_files_moved_into_place(tmp_path, watcher):
+    temp_file, file = str(tmp_path / "frame_temp_1.jpg"), str(tmp_path / "frame1.jpg")
+    open(temp_file, "w").close()
+    threading.Timer(0.1, os.rename, args=(temp_file, file)).start()
+
+    assert watcher.wait(file, timeout=10) == file
+
+
+def test_waiting_in_a_directory_that_doesnt_exist_yet(tmp_path, watcher):
+    directory = str(tmp_path / "later")
+    file = os.path.join(directory, "frame1.jpg")
+
+    def create():
+        os.makedirs(directory)
+        open(file, "w").close()
+
+    threading.Timer(0.1, create).start()
+
+    assert watcher.wait(file, timeout=10) == file
+
+
+def test_waits_are_unregistered(tmp_path, watcher):
+    file = str(tmp_path / "frame1.jpg")
+    watcher.wait(file, timeout=0.05)
+
+    assert (str(tmp_path), "frame1.jpg") not in watcher.waited_on
+
+
+def test_directory_events_without_inotify(tmp_path, monkeypatch):
+    """ Nothing reports a directory's files without inotify, so get always says to list the directory. """
+    monkeypatch.setattr("sys.platform", "win32")
+    events = FileReadyWatcher().watch_directory(str(tmp_path))
+
+    assert not events.watching
+    assert events.get(0) is None
+    events.close()
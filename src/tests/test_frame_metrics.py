@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+
+from dandere2x.dandere2x_service.core.block_matcher.pframe import get_block_positions
+from dandere2x.dandere2xlib.metrics.block_metrics import block_mse, block_ssim_mse
+from dandere2x.dandere2xlib.metrics.frame_metrics import block_sums, frame_block_mse, frame_block_ssim_mse
+
+
+def random_images(width, height, seed):
+    rng = np.random.default_rng(seed)
+    image_a = rng.integers(0, 256, (height, width, 3), dtype=np.uint8)
+    image_b = np.clip(image_a.astype(np.int16) + rng.integers(-20, 20, image_a.shape), 0, 255).astype(np.uint8)
+
+    # Some blocks the same, and some entirely different, so the scores cover the whole range.
+    image_b[:height // 3] = image_a[:height // 3]
+    image_b[-(height // 3):] = rng.integers(0, 256, (height // 3, width, 3), dtype=np.uint8)
+    return image_a, image_b
+
+
+def gathered(metric, image_a, image_b, block_size):
+    """ 'metric' of every block, the slow way - gathering every block with block_metrics. """
+    positions = get_block_positions(image_a.shape[1], image_a.shape[0], block_size)
+    return metric(image_a, positions, image_b, positions, block_size)
+
+
+@pytest.mark.parametrize("block_size", [1, 4, 8, 30])
+@pytest.mark.parametrize("width, height", [(120, 60), (127, 64)])
+def test_frame_block_mse_matches_block_mse(block_size, width, height):
+    image_a, image_b = random_images(width, height, block_size)
+
+    expected = gathered(block_mse, image_a, image_b, block_size)
+    assert frame_block_mse(image_a, image_b, block_size).T.ravel() == pytest.approx(expected, rel=1e-12)
+
+
+@pytest.mark.parametrize("block_size", [1, 4, 8, 30])
+@pytest.mark.parametrize("width, height", [(120, 60), (127, 64)])
+def test_frame_block_ssim_mse_matches_block_ssim_mse(block_size, width, height):
+    image_a, image_b = random_images(width, height, block_size)
+
+    expected = gathered(block_ssim_mse, image_a, image_b, block_size)
+    assert frame_block_ssim_mse(image_a, image_b, block_size).T.ravel() == pytest.approx(expected, rel=1e-9)
+
+
+def test_extreme_values_dont_overflow():
+    """ All-white against all-black maximizes every moment, and 260 pixel blocks need uint32 row sums. """
+    image_a = np.full((260, 520, 3), 255, dtype=np.uint8)
+    image_b = np.zeros((260, 520, 3), dtype=np.uint8)
+
+    assert (block_sums(image_a, 260) == 260 * 260 * 255).all()
+    assert (block_sums(image_a, 260, image_a) == 260 * 260 * 255 * 255).all()
+    assert frame_block_mse(image_a, image_b, 260).tolist() == [[3 * 255 * 255] * 2]
+    assert frame_block_ssim_mse(image_a, image_b, 260).T.ravel() == \
+        pytest.approx(gathered(block_ssim_mse, image_a, image_b, 260), rel=1e-9)
+
+
+def test_non_contiguous_images():
+    """ Frames sliced out of a larger image (so their rows aren't contiguous) score the same as copies of them. """
+    image_a, image_b = random_images(160, 90, 0)
+    view_a, view_b = image_a[5:65, 10:130], image_b[5:65, 10:130]
+
+    assert (frame_block_mse(view_a, view_b, 30) == frame_block_mse(view_a.copy(), view_b.copy(), 30)).all()
+    assert (frame_block_ssim_mse(view_a, view_b, 30) ==
+            frame_block_ssim_mse(view_a.copy(), view_b.copy(), 30)).all()
+
+
+def test_identical_frames():
+    image_a, _ = random_images(120, 60, 0)
+
+    assert (frame_block_mse(image_a, image_a.copy(), 30) == 0).all()
+    assert frame_block_ssim_mse(image_a, image_a.copy(), 30).T.ravel() == \
+        pytest.approx(gathered(block_ssim_mse, image_a, image_a.copy(), 30), rel=1e-9)
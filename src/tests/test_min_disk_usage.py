@@ -0,0 +1,113 @@
+import os
+import threading
+from types import SimpleNamespace
+
+import cv2
+import numpy as np
+import pytest
+
+from dandere2x.dandere2x_service.core.lookahead import Lookahead
+from dandere2x.dandere2x_service.core.min_disk_usage import MinDiskUsage
+from dandere2x.dandere2x_service.dandere2x_service_controller import Dandere2xController
+from dandere2x.dandere2xlib.utils.session_executor import SessionExecutor
+
+FRAME_COUNT = 40
+MIN_FRAMES_AHEAD = 8
+
+
+def make_video(file: str) -> None:
+    writer = cv2.VideoWriter(file, cv2.VideoWriter_fourcc(*"MJPG"), 24, (64, 48))
+    for x in range(FRAME_COUNT):
+        writer.write(np.full((48, 64, 3), x * 5, dtype=np.uint8))
+    writer.release()
+
+
+def make_context(workspace: str, min_disk_batch_size: int, min_frames_ahead: int = MIN_FRAMES_AHEAD):
+    directories = {}
+    for name in ["input_frames", "compressed_static", "scene_cuts", "residual_images", "residual_upscaled",
+                 "pframe_data", "residual_data", "correction_data", "fade_data"]:
+        os.makedirs(os.path.join(workspace, name))
+        directories[name + "_dir"] = os.path.join(workspace, name) + os.sep
+
+    input_file = os.path.join(workspace, "input.avi")
+    make_video(input_file)
+
+    service_request = SimpleNamespace(input_file=input_file, workspace=workspace, quality_minimum=85)
+    return SimpleNamespace(service_request=service_request, frame_count=FRAME_COUNT,
+                           video_settings=SimpleNamespace(frame_count=FRAME_COUNT), scene_cut_threshold=0,
+                           min_disk_batch_size=min_disk_batch_size, initial_frames_ahead=min_frames_ahead,
+                           min_frames_ahead=min_frames_ahead, max_frames_ahead=min_frames_ahead * 2,
+                           lookahead_min_free_disk=0, lookahead_max_memory_fraction=0.25, vector_storage="files",
+                           residual_packing="block", **directories)
+
+
+class StandInMerge(threading.Thread):
+    """
+    Gets through frames the way merge.py (with everything upstream of it) does - frame x once frame x + 2 is
+    extracted - checking the files of every frame it still needs haven't been swept.
+    """
+
+    def __init__(self, context, controller: Dandere2xController):
+        super().__init__(name="StandInMerge")
+        self.context = context
+        self.controller = controller
+        self.missing = []
+
+    def run(self):
+        for x in range(1, FRAME_COUNT):
+            if not self.controller.wait_for_extracted(min(x + 2, FRAME_COUNT), timeout=10):
+                return
+
+            # What dandere2x_cpp, residual.py and the upscaler would have made of frame x + 1 by now.
+            for file in [self.context.pframe_data_dir + "pframe_%d.txt" % (x + 1),
+                         self.context.residual_upscaled_dir + "output_%06d.png" % (x + 1)]:
+                open(file, "w").close()
+
+            needed = [self.context.input_frames_dir + "frame%d.jpg" % x,
+                      self.context.input_frames_dir + "frame%d.jpg" % (x + 1),
+                      self.context.compressed_static_dir + "compressed_%d.jpg" % (x + 1),
+                      self.context.pframe_data_dir + "pframe_%d.txt" % (x + 1),
+                      self.context.residual_upscaled_dir + "output_%06d.png" % (x + 1)]
+            self.missing += [file for file in needed if not os.path.isfile(file)]
+
+            self.controller.update_frame_count(x)
+
+
+@pytest.mark.parametrize("min_disk_batch_size", [1, 4, MIN_FRAMES_AHEAD - Lookahead.frames_past_batch])
+def test_batches_extract_and_sweep_every_frame(tmp_path, min_disk_batch_size):
+    context = make_context(str(tmp_path), min_disk_batch_size)
+    controller = Dandere2xController()
+    controller.executor = SessionExecutor(io_workers=1, cpu_workers=1)
+
+    min_disk_usage = MinDiskUsage(context, controller)
+    merge = StandInMerge(context, controller)
+
+    min_disk_usage.extract_initial_frames()
+    min_disk_usage.start()
+    merge.start()
+    merge.join(timeout=60)
+    min_disk_usage.join(timeout=60)
+    controller.executor.shutdown()
+
+    assert not merge.is_alive() and not min_disk_usage.is_alive()
+    assert controller.get_current_frame() == FRAME_COUNT - 1
+    assert controller.get_failure() is None
+    assert merge.missing == []
+
+    # Every frame's files, up to the last batch (less their lag), are gone.
+    assert not os.path.isfile(context.input_frames_dir + "frame1.jpg")
+    assert not os.path.isfile(context.residual_upscaled_dir + "output_000002.png")
+
+
+def test_batches_that_dont_fit_in_min_frames_ahead_are_refused(tmp_path):
+    context = make_context(str(tmp_path), MIN_FRAMES_AHEAD - Lookahead.frames_past_batch + 1)
+
+    with pytest.raises(ValueError, match="min_disk_batch_size"):
+        Lookahead(context)
+
+
+def test_a_batch_as_large_as_min_frames_ahead_is_refused(tmp_path):
+    context = make_context(str(tmp_path), 25, min_frames_ahead=25)
+
+    with pytest.raises(ValueError, match=r"min_disk_batch_size \(25\) has to be at most min_frames_ahead - 3 \(22\)"):
+        MinDiskUsage(context, Dandere2xController())
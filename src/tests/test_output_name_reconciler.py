@@ -0,0 +1,151 @@
+import os
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from dandere2x.dandere2x_service.core.waifu2x.output_name_reconciler import OutputNameReconciler
+from dandere2x.dandere2x_service.dandere2x_service_controller import Dandere2xController
+from dandere2x.dandere2xlib.utils.file_watcher import FileReadyWatcher
+
+ENGINE_SUFFIX = ".jpg.png"
+
+
+def make_reconciler(directory, frame_count=10):
+    context = SimpleNamespace(residual_upscaled_dir=str(directory) + os.sep, frame_count=frame_count)
+    return OutputNameReconciler(context, Dandere2xController(), ENGINE_SUFFIX)
+
+
+def write(directory, name):
+    with open(os.path.join(str(directory), name), "wb") as file:
+        file.write(b"upscaled")
+
+
+def start(reconciler) -> threading.Thread:
+    thread = threading.Thread(target=reconciler.run, name="OutputNameReconciler")
+    thread.start()
+    return thread
+
+
+def wait_for_files(directory, names, timeout=10):
+    files = [os.path.join(str(directory), name) for name in names]
+    assert FileReadyWatcher.instance().wait_until(lambda: all(os.path.isfile(file) for file in files), files, timeout)
+
+
+def test_files_are_renamed_in_the_order_theyre_finished(tmp_path):
+    reconciler = make_reconciler(tmp_path)
+    thread = start(reconciler)
+
+    for frame in [3, 1, 7, 2]:
+        write(tmp_path, "output_%06d%s" % (frame, ENGINE_SUFFIX))
+    wait_for_files(tmp_path, ["output_%06d.png" % frame for frame in [3, 1, 7, 2]])
+
+    reconciler.controller.update_frame_count(9)
+    thread.join(timeout=10)
+
+    assert not thread.is_alive()
+    assert sorted(os.listdir(str(tmp_path))) == ["output_%06d.png" % frame for frame in [1, 2, 3, 7]]
+
+
+def test_files_finished_before_it_starts_are_renamed(tmp_path):
+    write(tmp_path, "output_000001" + ENGINE_SUFFIX)
+    reconciler = make_reconciler(tmp_path)
+    thread = start(reconciler)
+
+    wait_for_files(tmp_path, ["output_000001.png"])
+    reconciler.controller.cancellation_token.cancel()
+    thread.join(timeout=10)
+
+    assert not thread.is_alive()
+
+
+def test_already_renamed_files_are_skipped(tmp_path):
+    """ A file both listed and evented, or renamed since, is only renamed once - and doesn't fail the session. """
+    write(tmp_path, "output_000001.png")
+    write(tmp_path, "output_000002" + ENGINE_SUFFIX)
+    reconciler = make_reconciler(tmp_path)
+
+    names = ["output_000001" + ENGINE_SUFFIX, "output_000002" + ENGINE_SUFFIX, "output_000002" + ENGINE_SUFFIX]
+    assert reconciler.reconcile(names) == []
+    assert sorted(os.listdir(str(tmp_path))) == ["output_000001.png", "output_000002.png"]
+
+
+def test_only_the_engines_files_are_renamed(tmp_path):
+    for name in ["output_000001.png", "output_000002.jpg", "frame2" + ENGINE_SUFFIX]:
+        write(tmp_path, name)
+
+    make_reconciler(tmp_path).reconcile(os.listdir(str(tmp_path)))
+
+    assert sorted(os.listdir(str(tmp_path))) == ["frame2" + ENGINE_SUFFIX, "output_000001.png", "output_000002.jpg"]
+
+
+def test_files_that_cant_be_renamed_yet_are_retried(tmp_path, monkeypatch):
+    write(tmp_path, "output_000001" + ENGINE_SUFFIX)
+    reconciler = make_reconciler(tmp_path)
+
+    def locked(file1, file2):
+        raise PermissionError(file1)
+
+    monkeypatch.setattr("dandere2x.dandere2x_service.core.waifu2x.output_name_reconciler.rename_file", locked)
+    assert reconciler.reconcile(["output_000001" + ENGINE_SUFFIX]) == ["output_000001" + ENGINE_SUFFIX]
+
+
+def test_finishing_the_last_frame_stops_it(tmp_path):
+    """ Merge finishing wakes the reconciler up, rather than it noticing on some later file event. """
+    reconciler = make_reconciler(tmp_path, frame_count=3)
+    thread = start(reconciler)
+
+    reconciler.controller.update_frame_count(1)
+    thread.join(timeout=0.5)
+    assert thread.is_alive()
+
+    reconciler.controller.update_frame_count(2)
+    thread.join(timeout=10)
+    assert not thread.is_alive()
+    assert reconciler.controller.get_failure() is None
+
+
+def test_cancelling_stops_it(tmp_path):
+    reconciler = make_reconciler(tmp_path)
+    thread = start(reconciler)
+
+    reconciler.controller.cancellation_token.cancel()
+    thread.join(timeout=10)
+
+    assert not thread.is_alive()
+    assert reconciler.controller.get_failure() is None
+
+
+@pytest.mark.skipif(FileReadyWatcher.instance().inotify_fd < 0, reason="needs inotify")
+def test_watched_directory_gets_finished_files_only(tmp_path):
+    events = FileReadyWatcher.instance().watch_directory(str(tmp_path))
+    try:
+        assert events.watching
+
+        with open(os.path.join(str(tmp_path), "partial"), "wb") as file:
+            file.write(b"not finished")
+            file.flush()
+            assert events.get(0.2) == []
+
+        write(tmp_path, "finished")
+        os.rename(os.path.join(str(tmp_path), "partial"), os.path.join(str(tmp_path), "moved"))
+
+        names = []
+        while len(names) < 3:
+            got = events.get(5)
+            assert got
+            names += got
+        assert names == ["partial", "finished", "moved"]
+    finally:
+        events.close()
+
+    assert str(tmp_path) not in FileReadyWatcher.instance().directory_events
+
+
+def test_waking_a_directory_wait(tmp_path):
+    events = FileReadyWatcher.instance().watch_directory(str(tmp_path))
+    try:
+        threading.Timer(0.1, events.wake).start()
+        assert events.get(10) == ([] if events.watching else None)
+    finally:
+        events.close()
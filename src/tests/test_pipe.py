@@ -0,0 +1,248 @@
+import io
+import logging
+import subprocess
+import sys
+import threading
+import time
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from dandere2x.dandere2x_service.dandere2x_service_controller import Dandere2xController
+from dandere2x.dandere2xlib.utils.channel import Channel
+from dandere2x.dandere2xlib.utils.session_executor import SessionExecutor
+from dandere2x.dandere2xlib.utils.thread_utils import CancelledError
+from dandere2x.dandere2xlib.wrappers.ffmpeg.pipe_thread import Pipe, drop_legacy_input_options, \
+    get_pipe_input_options, get_pipe_output_options
+from dandere2x.dandere2xlib.wrappers.frame.frame import Frame
+
+# Stands in for ffmpeg, writing everything piped into it to a file - once the gate file (if any) exists, until which
+# it's a stalled ffmpeg, reading nothing.
+SINK = """import os, shutil, sys, time
+while len(sys.argv) > 2 and not os.path.exists(sys.argv[2]):
+    time.sleep(0.01)
+with open(sys.argv[1], 'wb') as file:
+    shutil.copyfileobj(sys.stdin.buffer, file)
+"""
+
+
+class SinkPipe(Pipe):
+    """
+    A Pipe into SINK rather than ffmpeg, with jpeg encoding replaced by a frame's id - which, with the cores to encode
+    frames at once, finish out of order.
+    """
+
+    def __init__(self, *args, output_file: str, gate_file: str = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.output_file = output_file
+        self.gate_file = gate_file
+
+    def _setup_pipe(self, width: int, height: int) -> None:
+        self.width, self.height = width, height
+        gate = [self.gate_file] if self.gate_file else []
+        self.ffmpeg_pipe_subprocess = subprocess.Popen([sys.executable, "-c", SINK, self.output_file] + gate,
+                                                       stdin=subprocess.PIPE, bufsize=0)
+        self.controller.cancellation_token.register_process(self.ffmpeg_pipe_subprocess)
+
+    @staticmethod
+    def _encode_jpeg(frame: Frame) -> io.BytesIO:
+        # Later frames finish encoding first.
+        frame_id = int(frame.frame[0, 0, 0])
+        time.sleep(0.02 * (4 - frame_id % 4))
+        return io.BytesIO(b"<frame %d>" % frame_id)
+
+
+def make_context(pipe_format: str, output_options: dict = None, pipe_encoders: int = 4):
+    pipe_video = {"pipe_format": pipe_format, "-hwaccel": None,
+                  "output_options": output_options or {"-vcodec": "libx264"}}
+    return SimpleNamespace(service_request=SimpleNamespace(input_file="test_pipe",
+                                                           output_options={"ffmpeg": {"pipe_video": pipe_video}}),
+                           pipe_encoders=pipe_encoders)
+
+
+def make_frame(frame_id: int, width: int = 4, height: int = 2) -> Frame:
+    frame = Frame()
+    frame.create_new(width, height)
+    frame.frame[:] = np.arange(width * height * 3).reshape((height, width, 3)) % 200 + frame_id
+    frame.frame[0, 0, 0] = frame_id
+    return frame
+
+
+@pytest.fixture
+def controller():
+    controller = Dandere2xController()
+    controller.executor = SessionExecutor(io_workers=1, cpu_workers=4)
+    yield controller
+    controller.executor.shutdown()
+
+
+class JpegSinkPipe(SinkPipe):
+    """ A Pipe into SINK, encoding real jpegs. """
+
+    _encode_jpeg = staticmethod(Pipe._encode_jpeg)
+
+
+def pipe_frames(tmp_path, controller, context, frames, pipe_type=SinkPipe) -> bytes:
+    output_file = str(tmp_path / "piped")
+    channel = Channel("merged frames", Frame, capacity=len(frames) + 1, token=controller.cancellation_token)
+    for frame in frames:
+        channel.put(frame)
+    channel.close()
+
+    pipe_type("out.mkv", context, controller, channel, output_file=output_file).run()
+
+    with open(output_file, "rb") as file:
+        return file.read()
+
+
+def test_rawvideo_pipes_every_frames_pixels_in_order(tmp_path, controller):
+    frames = [make_frame(x) for x in range(6)]
+    piped = pipe_frames(tmp_path, controller, make_context("rawvideo"), frames)
+
+    assert piped == b"".join(frame.frame.tobytes() for frame in frames)
+
+
+@pytest.mark.parametrize("pipe_encoders", [1, 2, 4, 16])
+def test_image2pipe_writes_frames_in_order(tmp_path, controller, pipe_encoders):
+    """ However many frames are encoded at once (even more than there are frames), whatever order they finish in. """
+    frames = [make_frame(x) for x in range(9)]
+    piped = pipe_frames(tmp_path, controller, make_context("image2pipe", pipe_encoders=pipe_encoders), frames)
+
+    assert piped == b"".join(b"<frame %d>" % x for x in range(9))
+
+
+def test_image2pipe_pipes_jpegs_of_every_frame(tmp_path, controller):
+    frames = []
+    for x in range(6):
+        frame = Frame()
+        frame.create_new(32, 16)
+        frame.frame[:] = x * 40
+        frames.append(frame)
+
+    piped = pipe_frames(tmp_path, controller, make_context("image2pipe"), frames, pipe_type=JpegSinkPipe)
+
+    # Each jpeg ends with an EOI marker, which can't appear inside the (byte stuffed) image data.
+    jpegs = piped.split(b"\xff\xd9")
+    assert jpegs[-1] == b""
+    decoded = [np.array(Image.open(io.BytesIO(jpeg + b"\xff\xd9"))) for jpeg in jpegs[:-1]]
+    assert [int(round(image.mean())) for image in decoded] == [x * 40 for x in range(6)]
+
+
+def test_image2pipe_encoding_errors_fail_the_session(tmp_path, controller, monkeypatch):
+    def corrupt(frame: Frame) -> io.BytesIO:
+        raise OSError("encoder broke")
+
+    monkeypatch.setattr(SinkPipe, "_encode_jpeg", staticmethod(corrupt))
+
+    with pytest.raises(OSError, match="encoder broke"):
+        pipe_frames(tmp_path, controller, make_context("image2pipe"), [make_frame(x) for x in range(3)])
+    assert isinstance(controller.get_failure(), OSError)
+
+
+def test_rawvideo_rejects_frames_of_another_size(tmp_path, controller):
+    with pytest.raises(ValueError):
+        pipe_frames(tmp_path, controller, make_context("rawvideo"), [make_frame(0), make_frame(1, width=8)])
+
+    assert isinstance(controller.get_failure(), ValueError)
+
+
+def start_stalled_pipe(tmp_path, controller, frame_count: int, capacity: int = 2):
+    """
+    Start merging frame_count frames (each larger than an OS pipe's buffer) into a pipe to a stalled ffmpeg. Returns
+    (the pipe, the channel, the frames put so far, the merge thread).
+    """
+    channel = Channel("merged frames", Frame, capacity=capacity, token=controller.cancellation_token)
+    pipe = SinkPipe("out.mkv", make_context("rawvideo"), controller, channel, output_file=str(tmp_path / "piped"),
+                    gate_file=str(tmp_path / "gate"))
+    frames = [make_frame(x, width=200, height=200) for x in range(frame_count)]
+    put = []
+
+    def merge():
+        try:
+            for frame in frames:
+                channel.put(frame)
+                put.append(frame)
+            channel.close()
+        except CancelledError:
+            pass
+
+    merge_thread = threading.Thread(target=merge, name="merge")
+    pipe.start()
+    merge_thread.start()
+    return pipe, channel, put, merge_thread
+
+
+def test_a_stalled_ffmpeg_holds_up_merging(tmp_path, controller):
+    """ Frames back up into the channel and stop there, rather than piling up in memory, until ffmpeg catches up. """
+    pipe, channel, put, merge_thread = start_stalled_pipe(tmp_path, controller, frame_count=10)
+
+    merge_thread.join(timeout=0.5)
+    assert merge_thread.is_alive()
+    # The channel's full, and the pipe's holding at most the frame it's stuck writing.
+    assert 2 <= len(put) <= 3
+    assert len(channel.items) == 2
+
+    open(str(tmp_path / "gate"), "w").close()
+    merge_thread.join(timeout=30)
+    pipe.join(timeout=30)
+
+    assert not pipe.is_alive()
+    assert controller.get_failure() is None
+    assert channel.blocked_puts >= 1
+    assert channel.high_watermark == 2
+    with open(str(tmp_path / "piped"), "rb") as file:
+        assert file.read() == b"".join(frame.frame.tobytes() for frame in put)
+
+
+def test_cancelling_a_pipe_stuck_on_a_stalled_ffmpeg(tmp_path, controller):
+    pipe, _, _, merge_thread = start_stalled_pipe(tmp_path, controller, frame_count=10)
+
+    merge_thread.join(timeout=0.5)
+    controller.kill()
+    merge_thread.join(timeout=10)
+    pipe.join(timeout=10)
+
+    assert not pipe.is_alive() and not merge_thread.is_alive()
+    assert controller.get_failure() is None
+
+
+def test_unknown_pipe_format(controller):
+    channel = Channel("merged frames", Frame, capacity=1, token=controller.cancellation_token)
+
+    with pytest.raises(ValueError, match="pipe_format"):
+        Pipe("out.mkv", make_context("png"), controller, channel)
+
+
+def test_legacy_input_options_are_ignored(controller, caplog):
+    channel = Channel("merged frames", Frame, capacity=1, token=controller.cancellation_token)
+    context = make_context("rawvideo", {"-y": "-f", "image2pipe": True, "-i": "-", "-vcodec": "libx264"})
+
+    with caplog.at_level(logging.WARNING):
+        Pipe("out.mkv", context, controller, channel)
+
+    assert "Ignoring -y, image2pipe, -i" in caplog.text
+
+
+def test_drop_legacy_input_options():
+    options = {"-y": "-f", "image2pipe": True, "-i": "-", "-f": "rawvideo", "-vcodec": "libx264", "-crf": 15}
+
+    assert drop_legacy_input_options(options) == ({"-vcodec": "libx264", "-crf": 15},
+                                                  ["-y", "image2pipe", "-i", "-f"])
+
+    # An output format isn't the pipe's input format, so it's kept.
+    assert drop_legacy_input_options({"-f": "matroska"}) == ({"-f": "matroska"}, [])
+
+
+def test_pipe_input_options():
+    assert get_pipe_input_options("rawvideo", 1920, 1080) == \
+        ["-y", "-f", "rawvideo", "-pix_fmt", "rgb24", "-s", "1920x1080", "-i", "-"]
+    assert get_pipe_input_options("image2pipe", 1920, 1080) == ["-y", "-f", "image2pipe", "-i", "-"]
+
+
+def test_pipe_output_options():
+    assert get_pipe_output_options("rawvideo", {"-vcodec": "libx264"}) == \
+        ["-vcodec", "libx264", "-pix_fmt", "yuv420p"]
+    assert get_pipe_output_options("rawvideo", {"-pix_fmt": "yuv444p"}) == ["-pix_fmt", "yuv444p"]
+    assert get_pipe_output_options("image2pipe", {"-vcodec": "libx264"}) == ["-vcodec", "libx264"]
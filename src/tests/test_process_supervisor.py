@@ -0,0 +1,121 @@
+import io
+import logging
+import os
+import sys
+import threading
+import time
+
+import psutil
+import pytest
+
+from dandere2x.dandere2xlib.utils.process_supervisor import FFMPEG_PROGRESS_PATTERN, ProcessError, \
+    get_process_supervisor
+from dandere2x.dandere2xlib.utils.thread_utils import CancellationToken, CancelledError
+
+# Crashes (exit code 3) the first 'crashes' times it's run, counting runs in a file.
+CRASHES = """import os, sys
+runs_file, crashes = sys.argv[1], int(sys.argv[2])
+runs = int(open(runs_file).read()) if os.path.exists(runs_file) else 0
+open(runs_file, "w").write(str(runs + 1))
+print("run %d" % (runs + 1))
+sys.exit(3 if runs < crashes else 0)
+"""
+
+# Writes it's pid to a file, then hangs.
+HANGS = "import os, sys, time\nopen(sys.argv[1], 'w').write(str(os.getpid()))\ntime.sleep(60)"
+
+
+def python(script: str, *args) -> list:
+    return [sys.executable, "-c", script] + [str(arg) for arg in args]
+
+
+def runs(runs_file) -> int:
+    with open(str(runs_file)) as file:
+        return int(file.read())
+
+
+def wait_for_exit(pid_file) -> None:
+    with open(str(pid_file)) as file:
+        pid = int(file.read())
+    try:
+        psutil.Process(pid).wait(timeout=10)
+    except psutil.NoSuchProcess:
+        pass
+
+
+def test_output_goes_to_the_console_output_file():
+    output = io.StringIO()
+    result = get_process_supervisor().run(python("print('one'); import sys; print('two', file=sys.stderr)"),
+                                          output=output)
+
+    assert result.returncode == 0 and not result.timed_out
+    assert sorted(output.getvalue().splitlines()) == ["one", "two"]
+    assert sorted(result.tail) == ["one", "two"]
+
+
+def test_crashes_are_restarted(tmp_path):
+    runs_file = tmp_path / "runs"
+    result = get_process_supervisor().run(python(CRASHES, runs_file, 2), restarts=3, restart_delay=0)
+
+    assert result.returncode == 0
+    assert result.restarts == 2
+    assert runs(runs_file) == 3
+
+
+def test_restarts_run_out(tmp_path):
+    runs_file = tmp_path / "runs"
+
+    with pytest.raises(ProcessError, match=r"exited with code 3 after 1 restart\(s\), last output:\nrun 2"):
+        get_process_supervisor().run(python(CRASHES, runs_file, 5), restarts=1, restart_delay=0, check=True,
+                                     name="crasher")
+    assert runs(runs_file) == 2
+
+
+def test_a_crash_without_check_is_returned(tmp_path):
+    result = get_process_supervisor().run(python(CRASHES, tmp_path / "runs", 1))
+
+    assert result.returncode == 3
+    assert result.restarts == 0
+
+
+def test_programs_running_past_their_timeout_are_killed(tmp_path):
+    pid_file = tmp_path / "pid"
+    started = time.monotonic()
+    result = get_process_supervisor().run(python(HANGS, pid_file), timeout=0.5, restarts=1, restart_delay=0)
+
+    # Timing out counts as a crash, so it's restarted (and times out again).
+    assert result.timed_out
+    assert result.returncode != 0
+    assert result.restarts == 1
+    assert time.monotonic() - started < 30
+    assert "timed out after 1 restart(s)" in result.describe()
+
+
+def test_cancelling_kills_the_program(tmp_path):
+    pid_file = tmp_path / "pid"
+    token = CancellationToken()
+
+    def cancel_once_started():
+        while not os.path.exists(str(pid_file)):
+            time.sleep(0.01)
+        token.cancel("stopped by test")
+
+    threading.Thread(target=cancel_once_started).start()
+    with pytest.raises(CancelledError, match="stopped by test"):
+        get_process_supervisor().run(python(HANGS, pid_file), token=token, timeout=60)
+
+    wait_for_exit(pid_file)
+    assert not token._callbacks
+
+
+def test_progress_is_parsed_from_carriage_return_lines(caplog):
+    progress = []
+    script = "import sys\nsys.stderr.write('frame=    1 fps=0\\rframe=   12 fps=24\\rError while decoding\\n')"
+
+    with caplog.at_level(logging.WARNING):
+        result = get_process_supervisor().run(python(script), progress_pattern=FFMPEG_PROGRESS_PATTERN,
+                                              on_progress=progress.append, name="ffmpeg")
+
+    assert progress == [1, 12]
+    assert result.progress == 12
+    assert "ffmpeg: Error while decoding" in caplog.text
@@ -0,0 +1,89 @@
+import cv2
+import numpy as np
+import pytest
+
+from dandere2x.dandere2x_service.core.block_matcher.pframe import get_block_positions, match_blocks
+from dandere2x.dandere2x_service.core.block_matcher.pyramid_search import downsample, pyramid_search
+
+BLOCK_SIZE = 16
+WIDTH, HEIGHT = 192, 128
+
+
+def texture(width, height, seed=0) -> np.ndarray:
+    """ Blurred noise - detailed enough to only match in one place, smooth enough to still do so downsampled. """
+    noise = np.random.default_rng(seed).integers(0, 256, (height, width, 3), dtype=np.uint8)
+    return cv2.GaussianBlur(noise, (0, 0), 2)
+
+
+def panned_frames(pan):
+    """ frame_next's block at p is frame_previous's block at p + pan. """
+    margin = 40
+    image = texture(WIDTH + 2 * margin, HEIGHT + 2 * margin)
+    image_previous = image[margin:margin + HEIGHT, margin:margin + WIDTH].copy()
+    image_next = image[margin + pan[1]:margin + pan[1] + HEIGHT, margin + pan[0]:margin + pan[0] + WIDTH].copy()
+    return image_previous, image_next
+
+
+def interior(positions, pan):
+    """ Blocks that moved by 'pan' are still within the frame. """
+    ends = positions + pan
+    return (ends >= 0).all(axis=1) & (ends[:, 0] + BLOCK_SIZE <= WIDTH) & (ends[:, 1] + BLOCK_SIZE <= HEIGHT)
+
+
+def test_downsample_averages_and_rounds():
+    image = np.array([[[0], [1], [9]], [[2], [2], [9]], [[5], [5], [9]]], dtype=np.uint8).repeat(3, axis=2)
+
+    # (0 + 1 + 2 + 2) / 4 = 1.25, and odd rows / columns are dropped.
+    assert downsample(image).tolist() == [[[1, 1, 1]]]
+    assert downsample(np.full((4, 4, 3), 255, dtype=np.uint8)).tolist() == [[[255] * 3] * 2] * 2
+
+
+@pytest.mark.parametrize("pan", [(20, -12), (-29, 17), (3, 5), (0, 0)])
+def test_pyramid_search_finds_motion_beyond_diamond_search(pan):
+    """ Up to search_range * 4 pixels with the default 2 levels, and not only multiples of the downsampling. """
+    image_previous, image_next = panned_frames(pan)
+    positions = get_block_positions(WIDTH, HEIGHT, BLOCK_SIZE)
+
+    ends = pyramid_search(image_next, image_previous, positions, BLOCK_SIZE)
+
+    inside = interior(positions, pan)
+    assert (ends[inside] == positions[inside] + pan).all()
+
+
+def test_ends_stay_within_the_frame():
+    image_previous, image_next = panned_frames((-29, 17))
+    positions = get_block_positions(WIDTH, HEIGHT, BLOCK_SIZE)
+
+    ends = pyramid_search(image_next, image_previous, positions, BLOCK_SIZE)
+
+    assert (ends >= 0).all()
+    assert (ends[:, 0] + BLOCK_SIZE <= WIDTH).all() and (ends[:, 1] + BLOCK_SIZE <= HEIGHT).all()
+
+
+def test_identical_frames_dont_move():
+    image = texture(WIDTH, HEIGHT)
+    positions = get_block_positions(WIDTH, HEIGHT, BLOCK_SIZE)
+
+    assert (pyramid_search(image, image.copy(), positions, BLOCK_SIZE) == positions).all()
+
+
+def test_flat_frames_dont_move():
+    """ Every displacement ties on a flat frame, and ties go to staying put. """
+    image = np.full((HEIGHT, WIDTH, 3), 128, dtype=np.uint8)
+    positions = get_block_positions(WIDTH, HEIGHT, BLOCK_SIZE)
+
+    assert (pyramid_search(image, image.copy(), positions, BLOCK_SIZE) == positions).all()
+
+
+def test_match_blocks_with_pyramid_search_matches_the_pan():
+    pan = (20, -12)
+    image_previous, image_next = panned_frames(pan)
+    # A slightly worse copy of image_next, as the jpeg re-compressed frame would be.
+    image_compressed = np.clip(image_next.astype(np.int16) + 3, 0, 255).astype(np.uint8)
+
+    positions, ends, matched = match_blocks(image_previous, image_next, image_compressed, BLOCK_SIZE, step_size=4,
+                                            search="pyramid")
+
+    inside = interior(positions, pan)
+    assert (matched == inside).all()
+    assert (ends[matched] == positions[matched] + pan).all()
@@ -0,0 +1,170 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from dandere2x.dandere2x_service.core.residual import Residual
+from dandere2x.dandere2x_service.core.residual_plugins.packing import RESIDUAL_RECT_SIZE, get_packed_image_size, \
+    pack_residual_rects
+from dandere2x.dandere2x_service.core.residual_plugins.pframe import get_moving_vectors, pframe_image
+from dandere2x.dandere2x_service.core.residual_plugins.quadtree import quadtree_residuals, reconstruct_frame
+from dandere2x.dandere2x_service.core.residual_plugins.regions import region_residuals
+from dandere2x.dandere2xlib.wrappers.frame.frame import Frame
+
+RECTS = [(0, 0, 30, 30), (30, 0, 15, 15), (45, 15, 8, 8), (60, 30, 8, 8), (0, 30, 15, 15)]
+
+
+def make_context(block_size=30, bleed=2, scale_factor=1, residual_packing="quadtree", width=90, height=60):
+    return SimpleNamespace(service_request=SimpleNamespace(block_size=block_size, scale_factor=scale_factor),
+                           bleed=bleed, residual_packing=residual_packing, quadtree_min_block_size=8,
+                           width=width, height=height)
+
+
+def make_frame(image: np.ndarray) -> Frame:
+    frame = Frame()
+    frame.create_new(image.shape[1], image.shape[0])
+    frame.frame[:] = image
+    return frame
+
+
+def random_frame(width, height, seed) -> Frame:
+    return make_frame(np.random.default_rng(seed).integers(0, 256, (height, width, 3), dtype=np.uint8))
+
+
+def unpack(list_packed: list) -> list:
+    return [tuple(int(value) for value in list_packed[x * RESIDUAL_RECT_SIZE: (x + 1) * RESIDUAL_RECT_SIZE])
+            for x in range(len(list_packed) // RESIDUAL_RECT_SIZE)]
+
+
+def test_packing_keeps_every_rect():
+    packed = unpack(pack_residual_rects(RECTS, bleed=2))
+
+    assert len(packed) == len(RECTS)
+    assert sorted((x, y, width, height) for x, y, _, _, width, height in packed) == sorted(RECTS)
+
+
+def test_packed_rects_and_bleed_dont_overlap():
+    bleed = 2
+    list_packed = pack_residual_rects(RECTS, bleed)
+    width, height = get_packed_image_size(list_packed, bleed)
+
+    used = np.zeros((height, width), dtype=int)
+    for _, _, x_2, y_2, rect_width, rect_height in unpack(list_packed):
+        assert x_2 >= bleed and y_2 >= bleed
+        used[y_2 - bleed:y_2 + rect_height + bleed, x_2 - bleed:x_2 + rect_width + bleed] += 1
+
+    assert used.max() == 1
+
+
+def test_packing_nothing():
+    assert pack_residual_rects([], bleed=2) == []
+    assert get_packed_image_size([], bleed=2) == (1, 1)
+
+
+@pytest.mark.parametrize("scale_factor", [1, 2])
+def test_residual_image_round_trip(scale_factor):
+    """ Every packed rect makes it through the residual image, and back into place by merge.py's pframe_image. """
+    context = make_context(scale_factor=scale_factor)
+    frame_next = random_frame(90, 60, seed=0)
+    list_packed = pack_residual_rects(RECTS, context.bleed)
+
+    residual_image = Residual.make_residual_image(context, frame_next, list_packed, [0, 0, 0, 0])
+    assert (residual_image.width, residual_image.height) == get_packed_image_size(list_packed, context.bleed)
+
+    # Stand in for the upscaler with a nearest neighbour upscale.
+    upscaled = make_frame(residual_image.frame.repeat(scale_factor, axis=0).repeat(scale_factor, axis=1))
+    frame_previous = make_frame(np.zeros((60 * scale_factor, 90 * scale_factor, 3), dtype=np.uint8))
+
+    merged = Frame()
+    merged.create_new(frame_previous.width, frame_previous.height)
+    merged = pframe_image(context, merged, frame_previous, upscaled, list_packed, [])
+
+    expected = frame_next.frame.repeat(scale_factor, axis=0).repeat(scale_factor, axis=1)
+    for x, y, width, height in RECTS:
+        region = np.s_[y * scale_factor:(y + height) * scale_factor, x * scale_factor:(x + width) * scale_factor]
+        assert (merged.frame[region] == expected[region]).all()
+
+
+def test_quadtree_only_keeps_changed_quadrants():
+    context = make_context()
+    frame_previous = random_frame(60, 60, seed=0)
+    frame_next = make_frame(frame_previous.frame.copy())
+    # 15 pixel blocks split into overlapping 8 pixel quadrants, so this only changes the top-left one.
+    frame_next.frame[0:7, 0:7] = 255 - frame_next.frame[0:7, 0:7]
+
+    # Compressing frame_next at quality_minimum, as far as the quadtree is concerned, costs a little everywhere.
+    frame_compressed = make_frame(np.clip(frame_next.frame.astype(int) + 3, 0, 255).astype(np.uint8))
+
+    rects = quadtree_residuals(context, frame_next, frame_previous, frame_compressed, [0, 0, 0, 0, 30, 30, 1, 0])
+    assert rects == [(0, 0, 8, 8)]
+
+
+def test_reconstruct_frame():
+    context = make_context(block_size=4)
+    frame_previous = random_frame(8, 8, seed=0)
+    frame_next = random_frame(8, 8, seed=1)
+
+    # The block at (0, 0) moved from (4, 4), and a 2x2 rect at (4, 0) is a residual.
+    list_packed = pack_residual_rects([(4, 0, 2, 2)], bleed=1)
+    reconstructed = reconstruct_frame(context, frame_previous, frame_next, [0, 0, 4, 4], list_packed)
+
+    assert (reconstructed.frame[0:4, 0:4] == frame_previous.frame[4:8, 4:8]).all()
+    assert (reconstructed.frame[0:2, 4:6] == frame_next.frame[0:2, 4:6]).all()
+    assert (reconstructed.frame[2:8, 4:8] == frame_previous.frame[2:8, 4:8]).all()
+
+    # Without predictive vectors, the whole frame's a residual.
+    assert reconstruct_frame(context, frame_previous, frame_next, [], []) is frame_next
+
+
+def test_moving_vectors_skip_only_identity_vectors():
+    list_predictive = [0, 0, 0, 0,  # identity
+                       0, 0, 4, 4,  # moved diagonally, (x, x) -> (y, y)
+                       4, 0, 4, 0,  # identity, with x != y
+                       0, 4, 4, 4,  # moved along x
+                       4, 0, 4, 4]  # moved along y
+
+    moving = [(vector.x_1, vector.y_1, vector.x_2, vector.y_2) for vector in get_moving_vectors(list_predictive)]
+    assert moving == [(0, 0, 4, 4), (0, 4, 4, 4), (4, 0, 4, 4)]
+
+
+@pytest.mark.parametrize("residual_packing", ["quadtree", "region"])
+@pytest.mark.parametrize("scale_factor", [1, 2])
+def test_merge_rebuilds_a_hand_built_frame(residual_packing, scale_factor):
+    """
+    A 12x8 frame of 4x4 blocks: block (0, 0) moved diagonally from (4, 4), block (8, 0) is new, and the rest didn't
+    change. merge.py's pframe_image, and quadtree.py's reconstruct_frame, should both rebuild it exactly.
+    """
+    context = make_context(block_size=4, bleed=1, scale_factor=scale_factor, residual_packing=residual_packing,
+                           width=12, height=8)
+    frame_previous = random_frame(12, 8, seed=0)
+    frame_next = make_frame(frame_previous.frame.copy())
+    frame_next.frame[0:4, 0:4] = frame_previous.frame[4:8, 4:8]
+    frame_next.frame[0:4, 8:12] = random_frame(4, 4, seed=1).frame
+
+    list_predictive = [0, 0, 4, 4, 4, 0, 4, 0, 0, 4, 0, 4, 4, 4, 4, 4, 8, 4, 8, 4]
+    list_residual = [8, 0, 1, 0]
+
+    if residual_packing == "region":
+        rects = region_residuals(context, list_residual)
+    else:
+        frame_compressed = make_frame(np.clip(frame_next.frame.astype(int) + 3, 0, 255).astype(np.uint8))
+        rects = quadtree_residuals(context, frame_next, frame_previous, frame_compressed, list_residual)
+    assert rects == [(8, 0, 4, 4)]
+    list_packed = pack_residual_rects(rects, context.bleed)
+
+    reconstructed = reconstruct_frame(context, frame_previous, frame_next, list_predictive, list_packed)
+    assert (reconstructed.frame == frame_next.frame).all()
+
+    # Stand in for the upscaler with a nearest neighbour upscale.
+    def upscale(frame: Frame) -> Frame:
+        return make_frame(frame.frame.repeat(scale_factor, axis=0).repeat(scale_factor, axis=1))
+
+    residual_image = Residual.make_residual_image(context, frame_next, list_packed, list_predictive)
+    upscaled_previous = upscale(frame_previous)
+
+    merged = Frame()
+    merged.create_new(upscaled_previous.width, upscaled_previous.height)
+    merged.copy_image(upscaled_previous)
+    merged = pframe_image(context, merged, upscaled_previous, upscale(residual_image), list_packed, list_predictive)
+
+    assert (merged.frame == upscale(frame_next).frame).all()
@@ -0,0 +1,76 @@
+import os
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from dandere2x.dandere2x_service.core.residual_statistics import ResidualStatistics
+from dandere2x.dandere2xlib.wrappers.frame.frame import Frame
+
+BLOCK_SIZE = 10
+
+
+def make_statistics(frame_count: int = 4) -> ResidualStatistics:
+    # 3 blocks wide (the extra 5 pixels aren't a block) and 2 high.
+    context = SimpleNamespace(service_request=SimpleNamespace(input_file="test_residual_statistics",
+                                                              block_size=BLOCK_SIZE),
+                              frame_count=frame_count, width=35, height=20)
+    return ResidualStatistics(context)
+
+
+def test_the_first_frame_is_a_full_frame():
+    statistics = make_statistics()
+    first = statistics.time_series[0]
+
+    assert (first["frame"], first["predictive"], first["identity"], first["residual"]) == (1, 0, 0, 6)
+    assert first["residual_fraction"] == 1.0
+    assert first["upscaled_pixels"] == 35 * 20
+    assert (statistics.heatmap == 1).all()
+    assert statistics.time_series["frame"].tolist() == [1, 2, 3, 4]
+
+
+def test_recording_a_frame():
+    statistics = make_statistics()
+
+    # Two stationary blocks, a moving one, and three residual blocks (in residual image slots).
+    predictive = [0, 0, 0, 0, 10, 0, 10, 0, 20, 10, 24, 13]
+    residual = [20, 0, 1, 0, 0, 10, 0, 1, 10, 10, 1, 1]
+    statistics.record(2, predictive, residual)
+    statistics.record_upscaled_pixels(2, 1234)
+
+    row = statistics.time_series[1]
+    assert (row["predictive"], row["identity"], row["residual"]) == (1, 2, 3)
+    assert row["residual_fraction"] == pytest.approx(0.5)
+    assert row["upscaled_pixels"] == 1234
+    assert statistics.heatmap.tolist() == [[1, 1, 2], [2, 2, 1]]
+
+
+def test_frames_with_no_vectors_are_full_frames():
+    """ A scene cut (or a frame nothing matched in) is upscaled in full. """
+    statistics = make_statistics()
+    statistics.record(3, [], [])
+
+    assert statistics.time_series[2]["residual"] == 6
+    assert statistics.time_series[2]["residual_fraction"] == 1.0
+    assert (statistics.heatmap == 2).all()
+
+
+def test_save(tmp_path):
+    statistics = make_statistics(frame_count=2)
+    statistics.record(2, [0, 0, 0, 0], [20, 10, 1, 0])
+    statistics.save(str(tmp_path))
+
+    assert (np.load(str(tmp_path / "residual_statistics.npy")) == statistics.time_series).all()
+    assert (np.load(str(tmp_path / "residual_heatmap.npy")) == statistics.heatmap).all()
+
+    with open(str(tmp_path / "residual_statistics.csv")) as file:
+        lines = file.read().splitlines()
+    assert lines[0] == "frame,predictive,identity,residual,residual_fraction,upscaled_pixels"
+    assert lines[2] == "2,0,1,1,0.1667,0"
+
+    # Each block is BLOCK_SIZE pixels, brightest where a block was a residual most often.
+    heatmap = Frame()
+    heatmap.load_from_string(os.path.join(str(tmp_path), "residual_heatmap.png"))
+    assert heatmap.frame.shape == (20, 30, 3)
+    assert heatmap.frame[15, 25, 0] == 255
+    assert heatmap.frame[5, 5, 0] == 127
@@ -0,0 +1,107 @@
+import subprocess
+import sys
+
+import psutil
+import pytest
+
+from dandere2x.dandere2xlib.utils.resource_policy import ResourcePolicy, SessionResourcePolicy, parse_cores, \
+    parse_ionice
+
+linux_only = pytest.mark.skipif(not sys.platform.startswith("linux"), reason="resource policies only apply on linux")
+
+
+@pytest.mark.parametrize("cores, expected", [
+    (2, {2}),
+    ([0, 1, 4], {0, 1, 4}),
+    (("3", "1"), {1, 3}),
+    ("0-3,6", {0, 1, 2, 3, 6}),
+    (" 1 , 4-5 ", {1, 4, 5}),
+    ("2,", {2}),
+    ("", set()),
+])
+def test_parse_cores(cores, expected):
+    assert parse_cores(cores) == expected
+
+
+@pytest.mark.parametrize("cores", ["a", "1-", "1-2-3", "0,x"])
+def test_parse_cores_rejects_garbage(cores):
+    with pytest.raises(ValueError):
+        parse_cores(cores)
+
+
+@pytest.mark.parametrize("ionice, expected", [
+    ("idle", (3, None)),
+    ("best_effort", (2, None)),
+    ("best_effort:4", (2, 4)),
+    ("realtime:0", (1, 0)),
+])
+def test_parse_ionice(ionice, expected):
+    assert parse_ionice(ionice) == expected
+
+
+@pytest.mark.parametrize("ionice", ["fast", "", "best_effort:high", 2])
+def test_parse_ionice_rejects_garbage(ionice):
+    with pytest.raises(ValueError):
+        parse_ionice(ionice)
+
+
+def test_policy_from_yaml():
+    policy = ResourcePolicy.from_yaml({"cpu_affinity": "0-1", "nice": "5", "ionice": "best_effort:0"})
+
+    assert policy == ResourcePolicy(cpu_affinity={0, 1}, nice=5, ionice=(2, 0))
+    assert policy.describe() == "cores 0,1, nice 5, ionice best_effort:0"
+
+
+def test_empty_policy():
+    for section in (None, {}, {"nice": None}):
+        assert ResourcePolicy.from_yaml(section).is_empty()
+
+    assert ResourcePolicy().describe() == "none"
+
+
+def test_policy_rejects_unknown_settings():
+    with pytest.raises(ValueError, match="priority"):
+        ResourcePolicy.from_yaml({"priority": 5})
+
+
+def test_session_policy_from_yaml():
+    policy = SessionResourcePolicy.from_yaml({"stages": {"encode": {"nice": 5}},
+                                              "processes": {"upscaler": {"ionice": "idle"}}})
+
+    assert policy.stage("encode").nice == 5
+    assert policy.process("upscaler").ionice == (3, None)
+
+    # Anything without a policy gets an empty one.
+    assert policy.stage("merge").is_empty()
+    assert policy.process("ffmpeg_pipe").is_empty()
+    assert SessionResourcePolicy.from_yaml(None).stage("encode").is_empty()
+
+
+@pytest.mark.parametrize("section", [{"stages": {"decode": {}}}, {"processes": {"waifu2x": {}}}])
+def test_session_policy_rejects_unknown_names(section):
+    with pytest.raises(ValueError, match="Unknown"):
+        SessionResourcePolicy.from_yaml(section)
+
+
+@linux_only
+def test_apply_to_process():
+    process = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(30)"])
+    try:
+        core = min(psutil.Process().cpu_affinity())
+        ResourcePolicy(cpu_affinity={core}, nice=5).apply_to_process(process.pid, "sleeper")
+
+        assert psutil.Process(process.pid).cpu_affinity() == [core]
+        assert psutil.Process(process.pid).nice() == 5
+    finally:
+        process.kill()
+        process.wait()
+
+
+@linux_only
+def test_policies_that_cant_be_applied_are_skipped(caplog):
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+
+    # The process already exited, which is logged rather than raised.
+    ResourcePolicy(nice=5).apply_to_process(process.pid, "exited")
+    assert "Couldn't apply" in caplog.text
@@ -0,0 +1,86 @@
+import os
+
+import cv2
+import numpy as np
+import pytest
+
+from dandere2x.dandere2xlib.utils.scene_cuts import SceneCutDetector, is_scene_cut, mark_scene_cut
+from dandere2x.dandere2xlib.wrappers.cv2.progressive_frame_extractor import ProgressiveFramesExtractorCV2
+
+# Dandere2xServiceContext's default.
+THRESHOLD = 40
+
+
+def gray(value: int, width: int = 320, height: int = 180) -> np.ndarray:
+    return np.full((height, width, 3), value, dtype=np.uint8)
+
+
+@pytest.mark.parametrize("value, cut", [(140, False), (141, True), (60, False), (59, True)])
+def test_cuts_are_differences_above_the_threshold(value, cut):
+    """ A difference of exactly the threshold isn't a cut, one more is - in either direction. """
+    detector = SceneCutDetector(THRESHOLD)
+
+    assert not detector.is_cut(gray(100))
+    assert detector.is_cut(gray(value)) == cut
+
+
+def test_the_first_frame_is_never_a_cut():
+    assert not SceneCutDetector(THRESHOLD).is_cut(gray(255))
+
+
+def test_frames_are_compared_to_the_frame_before():
+    """ A fade changes a lot overall, but never much from one frame to the next. """
+    detector = SceneCutDetector(THRESHOLD)
+
+    assert not any(detector.is_cut(gray(value)) for value in range(0, 256, 30))
+    assert detector.is_cut(gray(0))
+
+
+def test_a_threshold_of_0_disables_detection():
+    detector = SceneCutDetector(0)
+
+    assert not detector.is_cut(gray(0))
+    assert not detector.is_cut(gray(255))
+
+
+def test_frames_are_compared_in_grayscale():
+    """ Red to gray of the same brightness is a large change in color, but not a cut. """
+    detector = SceneCutDetector(THRESHOLD)
+    red = gray(0)
+    red[:, :, 2] = 255
+
+    assert not detector.is_cut(red)
+    assert not detector.is_cut(gray(int(cv2.cvtColor(red, cv2.COLOR_BGR2GRAY)[0, 0])))
+
+
+def test_markers(tmp_path):
+    scene_cuts_dir = str(tmp_path) + os.sep
+
+    mark_scene_cut(scene_cuts_dir, 5)
+
+    assert is_scene_cut(scene_cuts_dir, 5)
+    assert not is_scene_cut(scene_cuts_dir, 4)
+    assert not is_scene_cut(scene_cuts_dir, 50)
+
+
+def test_extracting_marks_cut_frames(tmp_path):
+    directories = []
+    for name in ["input_frames", "compressed", "scene_cuts"]:
+        os.makedirs(str(tmp_path / name))
+        directories.append(str(tmp_path / name) + os.sep)
+    input_frames_dir, compressed_dir, scene_cuts_dir = directories
+
+    # Frames 1 - 3 are one scene, 4 - 6 another.
+    video = str(tmp_path / "input.avi")
+    writer = cv2.VideoWriter(video, cv2.VideoWriter_fourcc(*"MJPG"), 24, (64, 48))
+    for value in [30, 35, 40, 200, 205, 210]:
+        writer.write(gray(value, 64, 48))
+    writer.release()
+
+    extractor = ProgressiveFramesExtractorCV2(video, input_frames_dir, compressed_dir, 85, scene_cuts_dir, THRESHOLD)
+    for _ in range(6):
+        extractor.next_frame()
+    extractor.release_capture()
+
+    assert [frame for frame in range(1, 7) if is_scene_cut(scene_cuts_dir, frame)] == [4]
+    assert all(os.path.isfile(input_frames_dir + "frame%d.jpg" % frame) for frame in range(1, 7))
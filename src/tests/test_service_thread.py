@@ -0,0 +1,102 @@
+import logging
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from dandere2x.dandere2x_service import Dandere2xServiceThread
+from dandere2x.dandere2x_service.dandere2x_service_controller import Dandere2xController, SessionFailedError
+from dandere2x.dandere2xlib.utils.channel import Channel
+from dandere2x.dandere2xlib.utils.resource_policy import SessionResourcePolicy
+from dandere2x.dandere2xlib.utils.session_executor import SessionExecutor
+from dandere2x.dandere2xlib.utils.thread_utils import cancel_on_error
+from dandere2x.dandere2xlib.wrappers.frame.frame import Frame
+
+CHILD_THREADS = ["min_disk_demon", "dandere2x_cpp_thread", "residual_thread", "waifu2x", "merge_thread",
+                 "pipe_thread", "status_thread"]
+
+
+class StandInStage(threading.Thread):
+    """ Waits for the session to stop, as a stage waiting on frames that never come would - or fails right away. """
+
+    def __init__(self, controller: Dandere2xController, error: Exception = None):
+        super().__init__(name="StandInStage")
+        self.controller = controller
+        self.error = error
+
+    @cancel_on_error
+    def run(self):
+        if self.error is not None:
+            raise self.error
+        self.controller.cancellation_token.raise_if_cancelled()
+        self.controller.cancellation_token.wait(10)
+
+
+def make_service(failing_thread: str = None, error: Exception = None) -> Dandere2xServiceThread:
+    """
+    A Dandere2xServiceThread with stand-ins for it's child-threads. Only _run_child_threads is tested, as making the
+    session's context needs a real video (and ffprobe).
+    """
+    service = Dandere2xServiceThread.__new__(Dandere2xServiceThread)
+    threading.Thread.__init__(service, name="test_session")
+    service.log = logging.getLogger("test_session")
+    service.context = SimpleNamespace(resource_policy=SessionResourcePolicy({}, {}))
+    service.controller = Dandere2xController()
+    service.controller.executor = SessionExecutor(io_workers=1, cpu_workers=1)
+    service.merged_frames = Channel("merged frames", Frame, 1, service.controller.cancellation_token)
+
+    for name in CHILD_THREADS:
+        setattr(service, name, StandInStage(service.controller, error if name == failing_thread else None))
+
+    service.run = service._run_child_threads
+    return service
+
+
+def test_a_failed_stage_is_raised_from_run():
+    error = RuntimeError("upscaler crashed")
+    service = make_service("waifu2x", error)
+
+    with pytest.raises(SessionFailedError) as raised:
+        service.run()
+
+    assert raised.value.failure is error
+    assert raised.value.__cause__ is error
+    assert not any(getattr(service, name).is_alive() for name in CHILD_THREADS)
+
+
+def test_a_failed_stage_is_raised_from_join():
+    """ Started as a thread, the failure reaches whoever joins the session (i.e SingleProcessService). """
+    error = RuntimeError("dandere2x_cpp exited with 1")
+    service = make_service("dandere2x_cpp_thread", error)
+
+    service.start()
+    with pytest.raises(SessionFailedError, match="dandere2x_cpp exited with 1"):
+        service.join(timeout=10)
+
+
+def test_a_killed_session_doesnt_raise():
+    service = make_service()
+
+    service.start()
+    service.kill()
+    service.join(timeout=10)
+
+    assert not service.is_alive()
+    assert service.controller.is_killed()
+
+
+def test_a_failure_that_isnt_an_exception():
+    controller = Dandere2xController()
+    controller.fail("a frame never showed up")
+
+    with pytest.raises(SessionFailedError, match="a frame never showed up") as raised:
+        controller.raise_if_failed()
+    assert raised.value.__cause__ is None
+
+
+def test_raise_if_failed_does_nothing_until_failed():
+    controller = Dandere2xController()
+    controller.raise_if_failed()
+
+    controller.kill()
+    controller.raise_if_failed()
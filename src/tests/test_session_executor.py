@@ -0,0 +1,104 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from dandere2x.dandere2xlib.utils import session_executor
+from dandere2x.dandere2xlib.utils.session_executor import SessionExecutor
+
+
+@pytest.fixture
+def python_38_shutdown(monkeypatch):
+    """ ThreadPoolExecutor.shutdown as python 3.8 has it, without cancel_futures. """
+    shutdown = ThreadPoolExecutor.shutdown
+
+    def shutdown_38(self, wait=True):
+        shutdown(self, wait=wait)
+
+    monkeypatch.setattr(ThreadPoolExecutor, "shutdown", shutdown_38)
+
+
+def test_results_and_errors():
+    executor = SessionExecutor(io_workers=1, cpu_workers=1)
+
+    assert executor.submit_io(sum, [1, 2]).result() == 3
+    assert executor.submit_cpu(max, 1, 5).result() == 5
+    assert executor.submit_wait(min, 1, 5).result() == 1
+
+    with pytest.raises(ZeroDivisionError):
+        executor.submit_cpu(lambda: 1 / 0).result()
+
+    executor.shutdown()
+    assert not executor.pending
+
+
+def test_cancelling_pending_tasks(python_38_shutdown):
+    executor = SessionExecutor(io_workers=1, cpu_workers=1)
+    started, release = threading.Event(), threading.Event()
+
+    def block():
+        started.set()
+        release.wait(5)
+        return "finished"
+
+    running = executor.submit_io(block)
+    started.wait(5)
+    queued = [executor.submit_io(time.sleep, 0) for _ in range(3)]
+
+    threading.Timer(0.1, release.set).start()
+    executor.shutdown(wait=True, cancel_pending=True)
+
+    # The running task carries on, the ones that hadn't started are dropped.
+    assert running.result() == "finished"
+    assert all(future.cancelled() for future in queued)
+
+
+def test_shutdown_without_waiting(python_38_shutdown):
+    executor = SessionExecutor(io_workers=1, cpu_workers=1)
+    release = threading.Event()
+    running = executor.submit_io(release.wait, 5)
+
+    executor.shutdown(wait=False, cancel_pending=True)
+    assert not running.done()
+
+    release.set()
+    assert running.result(5)
+
+
+def test_submit_thread_is_joined_on_shutdown():
+    executor = SessionExecutor(io_workers=1, cpu_workers=1)
+    finished = []
+
+    def run():
+        time.sleep(0.1)
+        finished.append(threading.current_thread().name)
+        return "done"
+
+    future = executor.submit_thread(run)
+    executor.shutdown()
+
+    assert finished and finished[0].startswith("session ")
+    assert future.result() == "done"
+
+
+def test_submit_thread_errors():
+    executor = SessionExecutor(io_workers=1, cpu_workers=1)
+
+    with pytest.raises(ValueError):
+        executor.submit_thread(int, "x").result(5)
+    executor.shutdown()
+
+
+def test_wait_pool_holds_no_process_slots(monkeypatch):
+    monkeypatch.setattr(session_executor, "_process_cpu_slots", threading.BoundedSemaphore(1))
+    executor = SessionExecutor(io_workers=1, cpu_workers=1, wait_workers=2)
+    release = threading.Event()
+
+    # A task blocked on the wait pool doesn't keep the (single) process cpu slot from being used.
+    waiting = executor.submit_wait(release.wait, 5)
+    assert executor.submit_cpu(sum, [1, 1]).result(5) == 2
+
+    release.set()
+    assert waiting.result(5)
+    executor.shutdown()
@@ -0,0 +1,101 @@
+import numpy as np
+
+from dandere2x.dandere2x_service.core.block_matcher.pframe import get_block_positions, match_blocks, \
+    match_from_seeds, seed_offsets
+
+BLOCK_SIZE = 30
+WIDTH, HEIGHT = 150, 90
+PAN = (4, 6)
+
+
+def panned_frames():
+    """
+    Two frames of a noise texture panned by PAN - frame_next's block at p is frame_previous's block at p + PAN.
+    Noise never matches anywhere else, so only a block searched for at exactly p + PAN is found.
+    """
+    texture = np.random.default_rng(0).integers(0, 256, (HEIGHT + PAN[1], WIDTH + PAN[0], 3), dtype=np.uint8)
+    image_previous = texture[:HEIGHT, :WIDTH].copy()
+    image_next = texture[PAN[1]:, PAN[0]:].copy()
+    return image_previous, image_next
+
+
+def any_score(positions):
+    """
+    A threshold every score meets. Seeds (as dandere2x_cpp's) are scored against the block at the seed's end in
+    frame_next, rather than the block they were found as, which noise scores about 0 on - so only MIN_MSE decides.
+    """
+    return np.full(len(positions), -np.inf)
+
+
+def fits(positions, offset):
+    """ Which blocks moved by 'offset' are still within the frame. """
+    ends = positions + offset
+    return (ends >= 0).all(axis=1) & (ends[:, 0] + BLOCK_SIZE <= WIDTH) & (ends[:, 1] + BLOCK_SIZE <= HEIGHT)
+
+
+def test_seed_offsets_are_how_far_matched_blocks_moved():
+    positions = np.array([[0, 0], [30, 0], [60, 0]])
+    ends = np.array([[4, 6], [30, 0], [70, 10]])
+    matched = np.array([True, True, False])
+
+    assert seed_offsets(positions, ends, matched).tolist() == [[4, 6], [0, 0], [0, 0]]
+
+
+def test_seeds_find_a_pan():
+    image_previous, image_next = panned_frames()
+    positions = get_block_positions(WIDTH, HEIGHT, BLOCK_SIZE)
+    ends, matched = positions.copy(), np.zeros(len(positions), dtype=bool)
+
+    seeds = np.tile(PAN, (len(positions), 1))
+    match_from_seeds(image_previous, image_next, positions, ends, matched, any_score(positions), seeds,
+                     BLOCK_SIZE)
+
+    assert (matched == fits(positions, PAN)).all()
+    assert (ends[matched] == positions[matched] + PAN).all()
+    assert (ends[~matched] == positions[~matched]).all()
+
+
+def test_neighbours_seeds_are_tried():
+    """ Only one block moved last frame, but it's neighbours (which didn't match) move the same way this frame. """
+    image_previous, image_next = panned_frames()
+    positions = get_block_positions(WIDTH, HEIGHT, BLOCK_SIZE)
+    ends, matched = positions.copy(), np.zeros(len(positions), dtype=bool)
+
+    seeds = np.zeros_like(positions)
+    seeded = positions.tolist().index([30, 30])
+    seeds[seeded] = PAN
+    match_from_seeds(image_previous, image_next, positions, ends, matched, any_score(positions), seeds,
+                     BLOCK_SIZE)
+
+    # The bottom neighbour, [30, 60], moved by PAN would be past the bottom of the frame.
+    neighbours = [[30, 30], [0, 30], [60, 30], [30, 0]]
+    assert sorted(positions[matched].tolist()) == sorted(neighbours)
+
+
+def test_wrong_seeds_are_ignored():
+    image_previous, image_next = panned_frames()
+    positions = get_block_positions(WIDTH, HEIGHT, BLOCK_SIZE)
+    ends, matched = positions.copy(), np.zeros(len(positions), dtype=bool)
+
+    # Off by a pixel (too far off to be within MIN_MSE), only along one axis, or out of the frame.
+    seeds = np.tile([PAN[0] + 1, PAN[1]], (len(positions), 1))
+    seeds[1] = [0, PAN[1]]
+    seeds[2] = [-40, -40]
+    match_from_seeds(image_previous, image_next, positions, ends, matched, any_score(positions), seeds,
+                     BLOCK_SIZE)
+
+    assert not matched.any()
+    assert (ends == positions).all()
+
+
+def test_seeds_that_dont_meet_the_threshold_arent_used():
+    image_previous, image_next = panned_frames()
+    positions = get_block_positions(WIDTH, HEIGHT, BLOCK_SIZE)
+    ends, matched = positions.copy(), np.zeros(len(positions), dtype=bool)
+
+    seeds = np.tile(PAN, (len(positions), 1))
+    match_from_seeds(image_previous, image_next, positions, ends, matched, np.full(len(positions), np.inf), seeds,
+                     BLOCK_SIZE)
+
+    assert not matched.any()
+
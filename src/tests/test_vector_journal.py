@@ -0,0 +1,128 @@
+import threading
+
+import pytest
+
+from dandere2x.dandere2xlib.utils.thread_utils import CancellationToken, CancelledError
+from dandere2x.dandere2xlib.utils.vector_journal import JOURNAL_HEADER, JOURNAL_MAGIC, VectorJournal
+
+
+@pytest.fixture
+def journal_file(tmp_path):
+    return str(tmp_path / "pframe.d2xj")
+
+
+def test_round_trip(journal_file):
+    writer = VectorJournal(journal_file, frame_count=10)
+    writer.append(1, [1, 2, 3, 4])
+    writer.append(3, [])
+    writer.append(2, [-5, 6])
+
+    reader = VectorJournal(journal_file, frame_count=10)
+    assert reader.read(1).tolist() == [1, 2, 3, 4]
+    assert reader.read(2).tolist() == [-5, 6]
+    assert reader.read(3).tolist() == []
+
+    writer.close()
+    reader.close()
+
+
+def test_unwritten_frames_read_as_none(journal_file):
+    reader = VectorJournal(journal_file, frame_count=10)
+    assert reader.read(1) is None
+
+    writer = VectorJournal(journal_file, frame_count=10)
+    writer.append(1, [1])
+    assert reader.read(1).tolist() == [1]
+    assert reader.read(2) is None
+
+    writer.close()
+    reader.close()
+
+
+def test_reader_remaps_as_the_journal_grows(journal_file):
+    writer = VectorJournal(journal_file, frame_count=10)
+    writer.append(1, [1])
+
+    reader = VectorJournal(journal_file, frame_count=10)
+    first = reader.read(1)
+
+    writer.append(2, list(range(100000)))
+    assert reader.read(2).tolist() == list(range(100000))
+
+    # Arrays from the previous map are still valid.
+    assert first.tolist() == [1]
+
+    writer.close()
+    reader.close()
+
+
+def test_resuming_keeps_written_frames(journal_file):
+    writer = VectorJournal(journal_file, frame_count=10)
+    writer.append(1, [1, 2])
+    writer.close()
+
+    writer = VectorJournal(journal_file, frame_count=10)
+    writer.append(2, [3])
+    writer.close()
+
+    reader = VectorJournal(journal_file, frame_count=10)
+    assert reader.read(1).tolist() == [1, 2]
+    assert reader.read(2).tolist() == [3]
+    reader.close()
+
+
+def test_journal_of_another_session_is_replaced(journal_file):
+    writer = VectorJournal(journal_file, frame_count=10)
+    writer.append(1, [1, 2])
+    writer.close()
+
+    # A different frame count isn't a valid journal for this session, so it's not read, and writing starts over.
+    reader = VectorJournal(journal_file, frame_count=20)
+    assert reader.read(1) is None
+
+    writer = VectorJournal(journal_file, frame_count=20)
+    writer.append(2, [3])
+    writer.close()
+
+    reader = VectorJournal(journal_file, frame_count=20)
+    assert reader.read(1) is None
+    assert reader.read(2).tolist() == [3]
+    reader.close()
+
+
+def test_bad_magic_is_not_read(journal_file):
+    writer = VectorJournal(journal_file, frame_count=10)
+    writer.append(1, [1])
+    writer.close()
+
+    with open(journal_file, "r+b") as file:
+        file.write(JOURNAL_HEADER.pack(b"NOPE", 1, 0, 10, 0))
+
+    assert VectorJournal(journal_file, frame_count=10).read(1) is None
+
+    with open(journal_file, "rb") as file:
+        assert file.read(4) != JOURNAL_MAGIC
+
+
+def test_read_and_wait(journal_file):
+    writer = VectorJournal(journal_file, frame_count=10)
+    timer = threading.Timer(0.1, writer.append, args=(1, [7, 8]))
+    timer.start()
+
+    reader = VectorJournal(journal_file, frame_count=10)
+    assert reader.read_and_wait(1).tolist() == [7, 8]
+
+    timer.join()
+    writer.close()
+    reader.close()
+
+
+def test_read_and_wait_is_cancelled(journal_file):
+    token = CancellationToken()
+    timer = threading.Timer(0.1, token.cancel)
+    timer.start()
+
+    with pytest.raises(CancelledError):
+        VectorJournal(journal_file, frame_count=10).read_and_wait(1, token)
+
+    timer.join()
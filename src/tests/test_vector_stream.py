@@ -0,0 +1,156 @@
+import os
+import threading
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from dandere2x.dandere2x_service.core.block_matcher.block_matcher import BlockMatcher
+from dandere2x.dandere2x_service.core.merge import Merge
+from dandere2x.dandere2x_service.core.residual import Residual
+from dandere2x.dandere2x_service.core.vector_store import VectorStore
+from dandere2x.dandere2x_service.dandere2x_service_controller import Dandere2xController
+from dandere2x.dandere2xlib.utils.channel import Channel
+from dandere2x.dandere2xlib.utils.dandere2x_utils import get_lexicon_value, wait_on_either_file
+from dandere2x.dandere2xlib.utils.session_executor import SessionExecutor
+from dandere2x.dandere2xlib.utils.vector_stream import RECORD_TYPES, VectorStream
+from dandere2x.dandere2xlib.wrappers.frame.frame import Frame
+
+FRAME_COUNT = 5
+BLOCK_SIZE = 10
+
+
+def test_put_and_get():
+    stream = VectorStream({"pframe": 2})
+    stream.put("pframe", 1, np.array([1, 2, 3, 4]))
+
+    # Records are dropped once every reader's taken them.
+    assert stream.get("pframe", 1).tolist() == [1, 2, 3, 4]
+    assert stream.get("pframe", 1).tolist() == [1, 2, 3, 4]
+    with pytest.raises(TimeoutError):
+        stream.get("pframe", 1, timeout=0.01)
+
+
+def test_closing_a_data_type_leaves_the_others_open():
+    stream = VectorStream({})
+    stream.close(RECORD_TYPES.values())
+
+    with pytest.raises(EOFError):
+        stream.get("pframe", 1)
+
+    threading.Timer(0.1, stream.put, args=("packed", 1, np.array([5]))).start()
+    assert stream.get("packed", 1).tolist() == [5]
+
+    stream.close(["packed"])
+    with pytest.raises(EOFError):
+        stream.get("packed", 2)
+
+
+def test_closing_every_data_type():
+    stream = VectorStream({})
+    threading.Timer(0.1, stream.close).start()
+
+    with pytest.raises(EOFError):
+        stream.get("packed", 1)
+
+
+def test_records_already_put_outlive_closing():
+    stream = VectorStream({})
+    stream.put("pframe", 1, np.array([1]))
+    stream.close()
+
+    assert stream.get("pframe", 1).tolist() == [1]
+
+
+class Upscaler(threading.Thread):
+    """ Stands in for waifu2x at scale 1, "upscaling" every residual image by converting it to a png. """
+
+    def __init__(self, context, controller):
+        super().__init__(name="Upscaler")
+        self.context = context
+        self.controller = controller
+
+    def run(self):
+        for x in range(1, self.context.frame_count):
+            name = "output_" + get_lexicon_value(6, x)
+            residual_image = self.context.residual_images_dir + name + ".jpg"
+            upscaled_image = self.context.residual_upscaled_dir + name + ".png"
+
+            # residual.py writes frames with nothing to upscale straight to the upscaled directory.
+            wait_on_either_file(residual_image, upscaled_image, self.controller.cancellation_token)
+            if os.path.isfile(residual_image):
+                frame = Frame()
+                frame.load_from_string(residual_image)
+                frame.save_image(upscaled_image)
+
+
+def make_frames(width: int, height: int) -> list:
+    """ A noisy background with a square moving diagonally across it, and a few blocks changing in place. """
+    rng = np.random.default_rng(0)
+    background = rng.integers(0, 256, (height, width, 3), dtype=np.uint8)
+
+    frames = []
+    for x in range(FRAME_COUNT):
+        image = background.copy()
+        image[x * 10:x * 10 + 20, x * 10:x * 10 + 20] = 255
+        image[40:50, 0:10] = rng.integers(0, 256, (10, 10, 3), dtype=np.uint8)
+        frames.append(image)
+    return frames
+
+
+def make_context(workspace, residual_packing: str):
+    directories = {}
+    for name in ["input_frames", "compressed_static", "residual_images", "residual_upscaled", "merged", "pframe_data",
+                 "residual_data", "correction_data", "fade_data", "scene_cuts", "debug", "statistics"]:
+        os.makedirs(os.path.join(workspace, name))
+        directories[name + "_dir"] = os.path.join(workspace, name) + os.sep
+
+    return SimpleNamespace(
+        service_request=SimpleNamespace(input_file="test_session", block_size=BLOCK_SIZE, scale_factor=1),
+        frame_count=FRAME_COUNT, width=60, height=60, bleed=1, step_size=4, block_search="diamond",
+        temporal_seeding=False, residual_packing=residual_packing, quadtree_min_block_size=4, vector_storage="pipe",
+        vector_format="text", debug=0, temp_image=os.path.join(workspace, "temp_image.jpg"), **directories)
+
+
+@pytest.mark.parametrize("residual_packing", ["quadtree", "region", "block"])
+def test_pipe_session(tmp_path, residual_packing):
+    """ Block matching, residual (packing residuals) and merge, with every vector going through the vector stream. """
+    context = make_context(str(tmp_path), residual_packing)
+    frames = make_frames(context.width, context.height)
+
+    for x, image in enumerate(frames, start=1):
+        frame = Frame()
+        frame.create_new(context.width, context.height)
+        frame.frame[:] = image
+        frame.save_image(context.input_frames_dir + "frame%d.jpg" % x)
+        frame.save_image_quality(context.compressed_static_dir + "compressed_%d.jpg" % x, 95)
+        if x == 1:
+            frame.save_image(context.merged_dir + "merged_1.jpg")
+
+    controller = Dandere2xController()
+    controller.executor = SessionExecutor(io_workers=2, cpu_workers=2, wait_workers=2)
+    controller.vector_stream = VectorStore.create_stream(context)
+    controller.cancellation_token.add_callback(controller.vector_stream.close)
+
+    # Block matching finishes (closing dandere2x_cpp's data types) before residual.py's packed a single frame.
+    block_matcher = BlockMatcher(context, controller)
+    block_matcher.start()
+    block_matcher.join(timeout=60)
+
+    merged_frames = Channel("merged frames", Frame, capacity=FRAME_COUNT, token=controller.cancellation_token)
+    stages = [Residual(context, controller), Upscaler(context, controller), Merge(context, controller, merged_frames)]
+
+    for stage in stages:
+        stage.start()
+    for stage in stages:
+        stage.join(timeout=60)
+    controller.executor.shutdown()
+
+    assert controller.get_failure() is None
+    assert not any(stage.is_alive() for stage in stages)
+
+    merged = list(merged_frames)
+    assert len(merged) == FRAME_COUNT
+    for frame, image in zip(merged, frames):
+        # Everything went through jpegs, so only roughly.
+        assert np.abs(frame.frame.astype(int) - image).mean() < 4
@@ -0,0 +1,61 @@
+import struct
+
+import numpy as np
+import pytest
+
+from dandere2x.dandere2xlib.utils.vector_utils import VECTOR_FILE_HEADER, VECTOR_FILE_MAGIC, decode_vectors, \
+    encode_vectors, get_vectors_from_file_and_wait, write_vector_file
+
+VALUES = [0, 1, -1, 30, 1919, -32768, 2 ** 31 - 1]
+
+
+def test_binary_round_trip():
+    data = encode_vectors(VALUES)
+
+    assert data[:4] == VECTOR_FILE_MAGIC
+    assert len(data) == VECTOR_FILE_HEADER.size + len(VALUES) * 4
+    assert decode_vectors(data).tolist() == VALUES
+
+
+def test_binary_int32_is_zero_copy():
+    vectors = decode_vectors(encode_vectors(VALUES))
+
+    assert vectors.dtype == np.dtype("<i4")
+    assert not vectors.flags.owndata
+
+
+def test_binary_int16_is_widened():
+    # dandere2x_cpp writes int16 payloads when every value fits, which are widened so scaling them can't overflow.
+    values = [1, -2, 32767]
+    data = VECTOR_FILE_HEADER.pack(VECTOR_FILE_MAGIC, 1, 1, len(values)) + struct.pack("<3h", *values)
+
+    vectors = decode_vectors(data)
+    assert vectors.dtype == np.int32
+    assert (vectors * 4).tolist() == [4, -8, 131068]
+
+
+def test_empty_round_trip():
+    assert decode_vectors(encode_vectors([])).tolist() == []
+    assert decode_vectors(b"").tolist() == []
+
+
+def test_text_format():
+    # dandere2x_cpp's fade scalars are written as doubles.
+    assert decode_vectors(b"1\n-2\n30\n0.5\n").tolist() == [1, -2, 30, 0]
+
+
+@pytest.mark.parametrize("version, dtype_code", [(2, 2), (1, 3)])
+def test_unsupported_header(version, dtype_code):
+    data = VECTOR_FILE_HEADER.pack(VECTOR_FILE_MAGIC, version, dtype_code, 0)
+
+    with pytest.raises(ValueError):
+        decode_vectors(data)
+
+
+@pytest.mark.parametrize("binary", [True, False])
+def test_file_round_trip(tmp_path, binary):
+    vector_file = str(tmp_path / "pframe_1.txt")
+    write_vector_file(vector_file, VALUES, binary=binary)
+
+    assert not (tmp_path / "pframe_1.txt.temp").exists()
+    assert get_vectors_from_file_and_wait(vector_file).tolist() == VALUES